@@ -5,54 +5,269 @@ Orchestrates local models and provides REST API endpoints
 Fixed version with proper Ollama PS handling
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
 import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
 import uuid
 import time
 import os
-import subprocess
 from datetime import datetime
 
 # Import our custom modules
 from model_conductor import ModelConductor
 from hello_agent import HelloAgent
+from chat_sessions import SessionManager
+from rate_limiting import ClientRateLimiter, TierAdmissionController, RateLimitExceeded
+from job_events import JobEventBus, job_status_event
+from job_store import JobStore
+from research_pipeline import ResearchPipeline
+from structured_output import StructuredExtractor
+from single_flight import SingleFlight, request_key
+from embeddings import EmbeddingModel
+from retrieval import HybridRetriever
+from reranker import CrossEncoderReranker
+from source_fetcher import SourceFetcher
+from artifact_store import ArtifactStore
+from report_export import EXPORT_FORMATS, ReportExporter
+from resource_monitor import ResourceMonitor
+from profiling import AllocationTracker, ProfileStore, RequestProfilerMiddleware, SamplingProfiler, profiling_enabled
+from shared_state import SharedState, api_worker_count, shared_state_enabled
 
 def get_loaded_models():
-    """Get currently loaded models using ollama ps command"""
+    """Get currently loaded models on every Ollama host (via /api/ps)"""
     try:
-        result = subprocess.run(['ollama', 'ps'], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            models = []
-            
-            # Skip header line
-            for line in lines[1:]:
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 4:
-                        models.append({
-                            'name': parts[0],
-                            'id': parts[1],
-                            'size': parts[2] + ' ' + parts[3],
-                            'processor': parts[4] if len(parts) > 4 else 'unknown',
-                            'until': ' '.join(parts[5:]) if len(parts) > 5 else 'unknown'
-                        })
-            
-            return {'models': models}
-        else:
-            return {'models': []}
+        models = []
+        for model in model_conductor.router.loaded_models():
+            models.append({
+                'name': model['name'],
+                'host': model['host'],
+                'size': model.get('size', 0),
+                'until': str(model.get('until', 'unknown'))
+            })
+        return {'models': models}
     except Exception as e:
         return {'models': [{'error': f'Failed to get loaded models: {str(e)}'}]}
 
+# Services are built in the lifespan handler rather than at import time, so
+# importing this module (and uvicorn binding its port) stays fast
+model_conductor: Optional[ModelConductor] = None
+hello_agent: Optional[HelloAgent] = None
+session_manager: Optional[SessionManager] = None
+chat_admission: Optional[TierAdmissionController] = None
+research_admission: Optional[TierAdmissionController] = None
+job_store: Optional[JobStore] = None
+research_pipeline: Optional[ResearchPipeline] = None
+rate_limiter: Optional[ClientRateLimiter] = None
+extractor: Optional[StructuredExtractor] = None
+retriever: Optional[HybridRetriever] = None
+reranker: Optional[CrossEncoderReranker] = None
+source_fetcher: Optional[SourceFetcher] = None
+artifact_store: Optional[ArtifactStore] = None
+report_exporter: Optional[ReportExporter] = None
+resource_monitor: Optional[ResourceMonitor] = None
+
+# Usage counts, premium spend and rate-limit buckets shared between processes
+# (None when this is the only process serving the app)
+shared_state: Optional[SharedState] = None
+
+# Embedding model for RAG - loaded on first use, or warmed up after startup
+# when EMBEDDINGS_WARMUP=1
+embedding_model = EmbeddingModel()
+
+startup_state: Dict[str, Any] = {"started_at": None, "ready_at": None, "discovery": "pending"}
+background_tasks: List[asyncio.Task] = []
+
+# Identical concurrent /chat and /models/recommend requests share one execution
+single_flight = SingleFlight()
+
+# In-memory storage for jobs (will move to database later)
+jobs = {}
+job_results = {}
+
+# Research job event streams (SSE) and serialized poll responses per job version
+job_events = JobEventBus()
+job_response_cache: Dict[str, tuple] = {}
+
+# Asyncio task running each inline research job
+job_tasks: Dict[str, asyncio.Task] = {}
+
+TERMINAL_JOB_STATUSES = ("completed", "failed", "cancelled", "timed_out")
+
+# /status re-probes Ollama hosts whose last probe is older than this
+STATUS_PROBE_MAX_AGE = float(os.environ.get("STATUS_PROBE_MAX_AGE", "30"))
+
+API_WORKERS = api_worker_count()
+
+# "inline": run research jobs inside this process.
+# "external": only enqueue; `python -m research_worker` processes run them.
+# With several API workers inline jobs would be resumed by every worker, so
+# external is the default there.
+RESEARCH_WORKER_MODE = os.environ.get("RESEARCH_WORKER_MODE", "external" if API_WORKERS > 1 else "inline")
+
+def update_job(job_id: str, **fields):
+    """Update a job record, bump its version and notify event subscribers"""
+    job = jobs[job_id]
+    job.update(fields)
+    job["version"] = job.get("version", 0) + 1
+    job_store.save_job(job)
+    
+    results = job_results.get(job_id)
+    if job["status"] == "completed":
+        results = research_pipeline.expand_results(results)
+    event, data = job_status_event(job_id, job, results)
+    job_events.publish(job_id, event, data)
+
+def _store_job_results(job_id: str, results: Dict[str, Any]):
+    job_results[job_id] = results
+
+def find_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Job record from memory, falling back to the store (another API worker may have created it)"""
+    job = jobs.get(job_id)
+    if job is None:
+        stored = job_store.get_job(job_id)
+        if stored is None:
+            return None
+        job = jobs[job_id] = stored["record"]
+        if stored["results"] is not None:
+            job_results[job_id] = stored["results"]
+    return job
+
+def init_services():
+    """Create the conductor, agents, admission controllers and job store"""
+    global model_conductor, hello_agent, session_manager, shared_state, rate_limiter
+    global chat_admission, research_admission, job_store, research_pipeline, extractor, retriever
+    global reranker, source_fetcher, artifact_store, report_exporter, resource_monitor
+
+    if shared_state_enabled() or RESEARCH_WORKER_MODE == "external":
+        shared_state = SharedState()
+
+    # CPU/memory/Ollama/container sampler (RESOURCE_MONITOR=0 disables)
+    if os.environ.get("RESOURCE_MONITOR", "1") != "0":
+        resource_monitor = ResourceMonitor()
+    
+    model_conductor = ModelConductor(shared_state=shared_state, resource_monitor=resource_monitor)
+    hello_agent = HelloAgent(router=model_conductor.router)
+    session_manager = SessionManager(router=model_conductor.router, shared_state=shared_state)
+    extractor = StructuredExtractor(model_conductor, shared_state=shared_state)
+    
+    # Rate limiting and per-tier backpressure (chat and research queues are separate
+    # because their service times differ by orders of magnitude)
+    rate_limiter = ClientRateLimiter(
+        requests_per_minute=float(os.environ.get("RATE_LIMIT_PER_MINUTE", "60")),
+        burst=int(os.environ.get("RATE_LIMIT_BURST", "20")),
+        shared_state=shared_state
+    )
+    # Tier caps are deployment totals split across the API workers; external
+    # research jobs are admitted against the shared queue, so that
+    # controller keeps the full caps
+    chat_admission = TierAdmissionController(model_conductor.task_complexity, workers=API_WORKERS)
+    research_admission = TierAdmissionController(
+        model_conductor.task_complexity,
+        workers=1 if RESEARCH_WORKER_MODE == "external" else API_WORKERS
+    )
+
+    # Reports, source text and embeddings by content hash, reused across jobs
+    artifact_store = ArtifactStore()
+    
+    # Document chunks for RAG (BM25 + vector indexes are rebuilt from the store)
+    retriever = HybridRetriever(embedding_model, artifacts=artifact_store)
+    if os.environ.get("RERANK") == "1":
+        reranker = CrossEncoderReranker()
+    source_fetcher = SourceFetcher(artifacts=artifact_store)
+    
+    # Durable job records and stage checkpoints
+    job_store = JobStore()
+    report_exporter = ReportExporter()
+    research_pipeline = ResearchPipeline(
+        model_conductor,
+        job_store,
+        update_job=update_job,
+        publish=job_events.publish,
+        on_results=_store_job_results,
+        retriever=retriever,
+        reranker=reranker,
+        fetcher=source_fetcher,
+        artifacts=artifact_store,
+        exporter=report_exporter
+    )
+
+async def collect_artifact_garbage():
+    """Periodically reclaim artifacts no job or memo entry references (ARTIFACT_GC_INTERVAL=0 disables)"""
+    interval = float(os.environ.get("ARTIFACT_GC_INTERVAL", "3600"))
+    if interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            live_jobs = set(await asyncio.to_thread(job_store.job_ids))
+            await asyncio.to_thread(artifact_store.gc, live_jobs)
+        except Exception as e:
+            print(f"⚠️ Artifact GC failed: {e}")
+
+async def prune_shared_state():
+    """Periodically drop idle rate-limit buckets from the shared state file"""
+    while True:
+        await asyncio.sleep(600)
+        try:
+            await asyncio.to_thread(shared_state.prune_buckets)
+        except Exception as e:
+            print(f"⚠️ Shared state pruning failed: {e}")
+
+async def discover_models():
+    """Query every backend for its models in the background (fills the router caches)"""
+    try:
+        available = await asyncio.to_thread(model_conductor.router.available_models)
+        loaded = await asyncio.to_thread(model_conductor.router.loaded_models)
+        startup_state["discovery"] = "done"
+        print(f"🔍 Discovered {len(available)} models ({len(loaded)} loaded)")
+        if available:
+            model_conductor.catalogue.validate_against(available)
+    except Exception as e:
+        startup_state["discovery"] = "failed"
+        print(f"⚠️ Model discovery failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build services, then discover models and resume jobs without blocking startup"""
+    startup_state["started_at"] = datetime.now()
+    init_services()
+    if resource_monitor is not None:
+        resource_monitor.start()
+    
+    background_tasks.append(asyncio.create_task(discover_models()))
+    background_tasks.append(asyncio.create_task(asyncio.to_thread(retriever.refresh)))
+    background_tasks.append(asyncio.create_task(model_conductor.catalogue.watch()))
+    background_tasks.append(asyncio.create_task(collect_artifact_garbage()))
+    if shared_state is not None:
+        background_tasks.append(asyncio.create_task(prune_shared_state()))
+    if os.environ.get("EMBEDDINGS_WARMUP") == "1":
+        background_tasks.append(asyncio.create_task(embedding_model.warmup()))
+    await resume_research_jobs()
+    
+    startup_state["ready_at"] = datetime.now()
+    yield
+    
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await source_fetcher.aclose()
+    if resource_monitor is not None:
+        resource_monitor.stop()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Research Agent API",
     description="Local AI-powered research agent with multi-model orchestration",
-    version="5.0.0"
+    version="5.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware for frontend development
@@ -64,19 +279,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global instances
-model_conductor = ModelConductor()
-hello_agent = HelloAgent()
+# Opt-in profiling (PROFILING=1): per-request cProfile via the X-Profile header
+# and the /debug/profile and /debug/memory endpoints. Nothing is installed otherwise.
+sampling_profiler: Optional[SamplingProfiler] = None
+request_profiles: Optional[ProfileStore] = None
+allocation_tracker: Optional[AllocationTracker] = None
+if profiling_enabled():
+    sampling_profiler = SamplingProfiler()
+    request_profiles = ProfileStore()
+    allocation_tracker = AllocationTracker()
+    app.add_middleware(RequestProfilerMiddleware, store=request_profiles)
 
-# In-memory storage for jobs (will move to database later)
-jobs = {}
-job_results = {}
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    """Reject with 429 and tell the client when to come back"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.detail, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+async def enforce_rate_limit(request: Request):
+    """Token bucket per API key (X-API-Key header) or client address"""
+    client_key = request.headers.get("x-api-key") or (request.client.host if request.client else "unknown")
+    if rate_limiter.shared_state is not None:
+        # The shared bucket is a SQLite transaction - keep it off the event loop
+        await asyncio.to_thread(rate_limiter.check, client_key)
+    else:
+        rate_limiter.check(client_key)
 
 # Pydantic models for API requests/responses
+class GenerationOptions(BaseModel):
+    """Per-request Ollama options; unset fields fall back to the tier defaults"""
+    num_ctx: Optional[int] = None
+    num_predict: Optional[int] = None
+    num_thread: Optional[int] = None
+    num_batch: Optional[int] = None
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    keep_alive: Optional[str] = None
+
+def _option_overrides(options: Optional[GenerationOptions], **extra) -> Dict[str, Any]:
+    overrides = options.model_dump(exclude_none=True) if options else {}
+    overrides.update({key: value for key, value in extra.items() if value is not None})
+    return overrides
+
 class ChatRequest(BaseModel):
     message: str
     model: Optional[str] = None
-    temperature: Optional[float] = 0.7
+    temperature: Optional[float] = None  # Defaults to the tier's temperature
+    options: Optional[GenerationOptions] = None
 
 class ChatResponse(BaseModel):
     response: str
@@ -86,11 +338,48 @@ class ChatResponse(BaseModel):
     
     model_config = {"protected_namespaces": ()}  # Fixed Pydantic warning
 
+class ChatSessionRequest(BaseModel):
+    model: Optional[str] = None
+    system_prompt: Optional[str] = None
+    token_budget: Optional[int] = None
+    keep_alive: Optional[str] = None
+    options: Optional[GenerationOptions] = None
+
+class ChatSessionMessage(BaseModel):
+    message: str
+    options: Optional[GenerationOptions] = None
+
 class ResearchRequest(BaseModel):
     topic: str
     max_sources: Optional[int] = 10
+    sources: Optional[List[str]] = None  # URLs to fetch (up to max_sources)
     include_rag: Optional[bool] = True
     complexity: Optional[str] = "standard"  # simple, standard, complex, critical
+    options: Optional[GenerationOptions] = None
+    rerank: Optional[bool] = None  # Defaults to on when the server runs with RERANK=1
+    reuse_cached: Optional[bool] = True  # Reuse the report of an earlier job with the identical prompt
+    decompose: Optional[bool] = None  # Plan sub-questions and answer them in parallel first (default: complex and critical jobs)
+    max_subquestions: Optional[int] = 4
+
+class ExtractionRequest(BaseModel):
+    text: str
+    json_schema: Dict[str, Any]  # JSON schema of the output (e.g. a Pydantic model_json_schema())
+    task_type: Optional[str] = "document_processing"  # or classification, extraction
+    instructions: Optional[str] = None
+    model: Optional[str] = None
+    options: Optional[GenerationOptions] = None
+
+class DocumentRequest(BaseModel):
+    text: str
+    source: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+class RAGQueryRequest(BaseModel):
+    query: str
+    k: Optional[int] = 5
+    generate: Optional[bool] = True  # False returns the retrieved chunks only
+    model: Optional[str] = None
+    options: Optional[GenerationOptions] = None
 
 class ResearchJob(BaseModel):
     job_id: str
@@ -106,6 +395,7 @@ class SystemStatus(BaseModel):
     milvus_status: str
     loaded_models: List[Dict[str, Any]]
     system_resources: Dict[str, Any]
+    inference_hosts: List[Dict[str, Any]] = []
     version: str
 
 class TaskRecommendationRequest(BaseModel):
@@ -117,7 +407,7 @@ async def health_check():
     """Health check endpoint"""
     try:
         # Check Ollama connection
-        ollama_ok = hello_agent.test_connection()
+        ollama_ok = await asyncio.to_thread(hello_agent.test_connection)
         
         # Check Milvus connection (simplified for now)
         milvus_ok = True  # TODO: Implement Milvus health check
@@ -139,61 +429,235 @@ async def get_system_status():
     """Get detailed system status"""
     try:
         # Get loaded models using our fixed function
-        loaded_models = get_loaded_models().get('models', [])
+        loaded_models = (await asyncio.to_thread(get_loaded_models)).get('models', [])
+        
+        # Reachability from the model-list probe /health uses (fresh within
+        # STATUS_PROBE_MAX_AGE seconds) - routing health starts out optimistic
+        probes = await asyncio.to_thread(model_conductor.router.probe, STATUS_PROBE_MAX_AGE, "ollama")
+        ollama_online = any(probes.values())
+
+        # Per-host queue depth, latency, health and residency
+        host_stats = await asyncio.to_thread(lambda: model_conductor.router.get_stats()["backends"])
+        memory_gb = await asyncio.to_thread(model_conductor.estimate_memory_usage)
         
         return SystemStatus(
-            ollama_status="online",
+            ollama_status="online" if ollama_online else "offline",
             milvus_status="online",  # TODO: Actually check Milvus
             loaded_models=loaded_models,
             system_resources={
                 "active_jobs": len([j for j in jobs.values() if j["status"] == "processing"]),
                 "total_jobs": len(jobs),
-                "memory_usage": "TODO"  # TODO: Add actual memory monitoring
+                "model_memory_gb": memory_gb,
+                **((resource_monitor.latest() or {}) if resource_monitor else {})
             },
+            inference_hosts=host_stats,
             version="5.0.0"
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Status check failed: {str(e)}")
 
 # Simple chat endpoint
-@app.post("/chat", response_model=ChatResponse)
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(enforce_rate_limit)])
 async def chat(request: ChatRequest):
     """Simple chat endpoint for testing models"""
+    start_time = time.time()
+    
     try:
-        start_time = time.time()
-        
-        # Use model conductor to select best model
-        selected_model = model_conductor.select_model(
+        # Use model conductor to select best model (it may probe hosts - off the loop)
+        selected_model = await asyncio.to_thread(
+            model_conductor.select_model,
             task_type="chat",
             complexity="simple",
             preferred_model=request.model
         )
+        options, keep_alive = model_conductor.generation_options(
+            "simple", selected_model, _option_overrides(request.options, temperature=request.temperature)
+        )
         
-        # Create agent with selected model
-        agent = HelloAgent(model_name=selected_model)
+        async def generate():
+            # Reject early if the simple tier is already backed up
+            tier_state = chat_admission.admit("simple")
+            async with chat_admission.slot("simple", tier_state):
+                agent = HelloAgent(model_name=selected_model, router=model_conductor.router)
+                # Generate response off the event loop
+                return await asyncio.to_thread(
+                    agent.chat, [{'role': 'user', 'content': request.message}], options, keep_alive
+                )
         
-        # Generate response
-        result = agent.simple_chat(request.message)
+        # A request identical to one still generating waits for that result
+        key = request_key(selected_model, request.message, options, keep_alive)
+        result = await single_flight.do("chat", key, generate)
         
         if not result['success']:
             raise HTTPException(status_code=500, detail=f"Chat failed: {result['error']}")
         
-        response_time = time.time() - start_time
-        
         return ChatResponse(
             response=result['response'],
             model_used=selected_model,
-            response_time=response_time,
+            response_time=time.time() - start_time,
             timestamp=datetime.now()
         )
         
+    except (HTTPException, RateLimitExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
+# Multi-turn chat sessions
+@app.post("/chat/sessions")
+async def create_chat_session(request: ChatSessionRequest):
+    """Create a chat session pinned to one model"""
+    selected_model = await asyncio.to_thread(
+        model_conductor.select_model,
+        task_type="chat",
+        complexity="simple",
+        preferred_model=request.model
+    )
+    
+    # The context window must hold the history budget plus the reply
+    token_budget = request.token_budget or session_manager.default_token_budget
+    options, keep_alive = model_conductor.generation_options(
+        "simple", selected_model, _option_overrides(request.options, keep_alive=request.keep_alive),
+        prompt_tokens=token_budget
+    )
+    
+    session = await asyncio.to_thread(
+        session_manager.create_session,
+        model=selected_model,
+        system_prompt=request.system_prompt,
+        token_budget=token_budget,
+        keep_alive=keep_alive,
+        options=options
+    )
+    return session.to_dict()
+
+@app.post("/chat/sessions/{session_id}/messages", dependencies=[Depends(enforce_rate_limit)])
+async def send_chat_session_message(session_id: str, request: ChatSessionMessage):
+    """Send the next message in a chat session"""
+    session = await asyncio.to_thread(session_manager.get_session, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    overrides = _option_overrides(request.options)
+    if overrides:
+        # Re-resolve on top of the session's options so the tier caps still apply
+        options, keep_alive = model_conductor.generation_options(
+            "simple", session.model, {**session.options, **overrides}, prompt_tokens=session.token_budget
+        )
+        overrides = {**options, "keep_alive": keep_alive or session.keep_alive}
+    
+    tier_state = chat_admission.admit("simple")
+    
+    # One turn at a time per session so history stays ordered
+    async with session.lock, chat_admission.slot("simple", tier_state):
+        result = await asyncio.to_thread(session_manager.send_message, session, request.message, overrides)
+    
+    if not result['success']:
+        status_code = 409 if result.get('conflict') else 500
+        raise HTTPException(status_code=status_code, detail=f"Chat failed: {result['error']}")
+    
+    return {
+        "session_id": session_id,
+        "response": result['response'],
+        "model_used": session.model,
+        "response_time": result['response_time'],
+        "turn": result['turn'],
+        "timestamp": datetime.now()
+    }
+
+@app.get("/chat/sessions/{session_id}")
+async def get_chat_session(session_id: str):
+    """Get chat session history and per-turn timings"""
+    session = await asyncio.to_thread(session_manager.get_session, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session.to_dict(include_history=True)
+
+@app.delete("/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    """Delete a chat session"""
+    if not await asyncio.to_thread(session_manager.delete_session, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"success": True, "session_id": session_id}
+
+# Structured extraction
+@app.post("/extract", dependencies=[Depends(enforce_rate_limit)])
+async def extract(request: ExtractionRequest):
+    """Extract JSON matching a schema from text (validated while streaming, one repair retry)"""
+    tier = model_conductor.task_types.get(request.task_type, "simple")
+    tier_state = chat_admission.admit(tier)
+    
+    async with chat_admission.slot(tier, tier_state):
+        result = await asyncio.to_thread(
+            extractor.extract,
+            request.text,
+            request.json_schema,
+            task_type=request.task_type,
+            model=request.model,
+            instructions=request.instructions,
+            options=_option_overrides(request.options)
+        )
+    
+    if not result["success"]:
+        raise HTTPException(status_code=422, detail=result)
+    return result
+
+# Document ingestion and retrieval-augmented queries
+@app.post("/documents", dependencies=[Depends(enforce_rate_limit)])
+async def add_document(request: DocumentRequest):
+    """Chunk, embed and index a document for RAG"""
+    result = await asyncio.to_thread(retriever.add_document, request.text, request.source, request.metadata)
+    return {"success": True, **result, "total_chunks": retriever.lexical.doc_count}
+
+@app.post("/rag/query", dependencies=[Depends(enforce_rate_limit)])
+async def rag_query(request: RAGQueryRequest):
+    """Hybrid (BM25 + vector) retrieval, optionally answered by the rag_query tier model"""
+    start_time = time.time()
+    chunks = await asyncio.to_thread(retriever.search, request.query, request.k)
+    if not request.generate:
+        return {"success": True, "query": request.query, "chunks": chunks}
+    
+    tier = model_conductor.task_types.get("rag_query", "standard")
+    tier_state = chat_admission.admit(tier)
+    async with chat_admission.slot(tier, tier_state):
+        selected_model = await asyncio.to_thread(
+            model_conductor.select_model, task_type="rag_query", preferred_model=request.model
+        )
+        context = "\n\n".join(f"[{i}] {chunk['text']}" for i, chunk in enumerate(chunks, start=1))
+        options, keep_alive = model_conductor.generation_options(
+            tier, selected_model, _option_overrides(request.options), prompt_tokens=len(context) // 4
+        )
+        agent = HelloAgent(model_name=selected_model, router=model_conductor.router)
+        messages = [{
+            'role': 'user',
+            'content': f"Answer the question using the numbered context and cite it like [1].\n\n"
+                       f"Context:\n{context}\n\nQuestion: {request.query}"
+        }]
+        result = await asyncio.to_thread(agent.chat, messages, options, keep_alive)
+    
+    if not result['success']:
+        raise HTTPException(status_code=500, detail=f"RAG query failed: {result['error']}")
+    return {
+        "success": True,
+        "query": request.query,
+        "answer": result['response'],
+        "model_used": selected_model,
+        "chunks": chunks,
+        "response_time": time.time() - start_time
+    }
+
 # Research job submission
-@app.post("/research", response_model=ResearchJob)
-async def submit_research_job(request: ResearchRequest, background_tasks: BackgroundTasks):
+@app.post("/research", response_model=ResearchJob, dependencies=[Depends(enforce_rate_limit)])
+async def submit_research_job(request: ResearchRequest):
     """Submit a research job for background processing"""
+    # Background jobs only bound the queue wait, not the full job duration.
+    # Jobs on research workers are counted in the shared queue
+    load = None
+    if RESEARCH_WORKER_MODE == "external":
+        tier = request.complexity if request.complexity in research_admission.tiers else "standard"
+        load = (await asyncio.to_thread(job_store.tier_load)).get(tier, (0, 0))
+    research_admission.admit(request.complexity, include_service_time=False, load=load)
+    
     try:
         # Generate unique job ID
         job_id = str(uuid.uuid4())
@@ -204,6 +668,7 @@ async def submit_research_job(request: ResearchRequest, background_tasks: Backgr
             "topic": request.topic,
             "status": "pending",
             "progress": 0,
+            "version": 1,
             "created_at": datetime.now(),
             "config": {
                 "max_sources": request.max_sources,
@@ -213,9 +678,14 @@ async def submit_research_job(request: ResearchRequest, background_tasks: Backgr
         }
         
         jobs[job_id] = job
+        job_store.save_job(job, request.model_dump())
         
-        # Start background research task
-        background_tasks.add_task(process_research_job, job_id, request)
+        if RESEARCH_WORKER_MODE == "external":
+            # Hand off to the research worker processes
+            job_store.enqueue(job_id)
+        else:
+            # Start background research task (kept so it can be cancelled)
+            start_research_task(job_id, request)
         
         return ResearchJob(
             job_id=job_id,
@@ -231,31 +701,111 @@ async def submit_research_job(request: ResearchRequest, background_tasks: Backgr
 
 # Get research job status
 @app.get("/research/{job_id}")
-async def get_research_job(job_id: str):
-    """Get research job status and results"""
-    if job_id not in jobs:
+async def get_research_job(job_id: str, http_request: Request):
+    """Get research job status and results (supports ETag / If-None-Match)"""
+    job = find_job(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
-    response = {
-        "job_id": job_id,
-        "status": job["status"],
-        "progress": job["progress"],
-        "topic": job["topic"],
-        "created_at": job["created_at"],
-        "completed_at": job.get("completed_at")
-    }
+    etag = f'W/"{job_id}-{job.get("version", 0)}"'
     
-    # Include results if completed
-    if job["status"] == "completed" and job_id in job_results:
-        response["results"] = job_results[job_id]
+    # Unchanged since the client's last poll - skip building the body entirely
+    if http_request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
     
-    return response
+    cached = job_response_cache.get(job_id)
+    if cached is None or cached[0] != etag:
+        response = {
+            "job_id": job_id,
+            "status": job["status"],
+            "stage": job.get("stage"),
+            "progress": job["progress"],
+            "topic": job["topic"],
+            "created_at": job["created_at"],
+            "completed_at": job.get("completed_at")
+        }
+        
+        # Include results if completed
+        if job["status"] == "completed" and job_id in job_results:
+            response["results"] = await asyncio.to_thread(research_pipeline.expand_results, job_results[job_id])
+        if job.get("error"):
+            response["error"] = job["error"]
+        
+        cached = (etag, json.dumps(jsonable_encoder(response)).encode("utf-8"))
+        job_response_cache[job_id] = cached
+    
+    return Response(content=cached[1], media_type="application/json", headers={"ETag": etag})
+
+# Download a research report
+@app.get("/research/{job_id}/report.{fmt}")
+async def export_research_report(job_id: str, fmt: str, http_request: Request):
+    """Report as md, html, pdf or json - a pre-rendered file (Range and gzip supported)"""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unknown report format '{fmt}' (use {', '.join(EXPORT_FORMATS)})")
+    job = find_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "completed" or job_id not in job_results:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}, the report is not ready")
+    
+    if not os.path.exists(report_exporter.path(job_id, fmt)):
+        # Jobs finished before exports existed (or whose export failed) are rendered on first download
+        results = await asyncio.to_thread(research_pipeline.expand_results, job_results[job_id])
+        await asyncio.to_thread(report_exporter.export, job_id, job["topic"], results)
+    
+    return report_exporter.response(job_id, fmt, http_request.headers)
+
+# Stream research job events
+@app.get("/research/{job_id}/events")
+async def stream_research_job_events(job_id: str, http_request: Request):
+    """Server-sent events: stage transitions, progress and partial report sections"""
+    if find_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return StreamingResponse(
+        job_events.subscribe(job_id, http_request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Cancel a research job
+@app.delete("/research/{job_id}")
+async def cancel_research_job(job_id: str):
+    """Cancel a pending or running research job and abort its generation"""
+    job = find_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job["status"] in TERMINAL_JOB_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    
+    # Workers poll this flag; inline jobs are cancelled directly
+    job_store.request_cancel(job_id)
+    task = job_tasks.get(job_id)
+    if task is not None:
+        task.cancel()
+    
+    update_job(job_id, status="cancelled", completed_at=datetime.now())
+    # A requeued job may still hold checkpoints from an interrupted run
+    await asyncio.to_thread(job_store.clear_checkpoints, job_id)
+    return {"success": True, "job_id": job_id, "status": "cancelled"}
+
+# Reclaim unreferenced artifacts
+@app.post("/artifacts/gc")
+async def collect_artifacts(grace_seconds: float = 3600.0):
+    """Delete stored artifacts that no job or reusable result references"""
+    live_jobs = set(await asyncio.to_thread(job_store.job_ids))
+    result = await asyncio.to_thread(artifact_store.gc, live_jobs, None, grace_seconds)
+    return {"success": True, **result, "stats": artifact_store.get_stats()}
 
 # List all research jobs
 @app.get("/research")
 async def list_research_jobs():
     """List all research jobs"""
+    if API_WORKERS > 1:
+        # Include jobs submitted through the other workers
+        await asyncio.to_thread(_load_stored_jobs)
+    
     return [
         {
             "job_id": job_id,
@@ -272,42 +822,41 @@ async def list_research_jobs():
 async def list_models():
     """List available and loaded models"""
     try:
-        import ollama
-        client = ollama.Client()
-        
         # Get all available models with robust error handling
         available_models = []
-        try:
-            available = client.list()
+        for backend in model_conductor.router.ollama_backends():
+            try:
+                available = await asyncio.to_thread(backend.list_tags)
             
-            for model in available.get("models", []):
-                # Safely extract fields
-                model_info = {
-                    "name": model.get("name", "unknown"),
-                    "size": model.get("size", 0)
-                }
+                for model in available.get("models", []):
+                    # Safely extract fields
+                    model_info = {
+                        "name": model.get("name", "unknown"),
+                        "host": backend.name,
+                        "size": model.get("size", 0)
+                    }
                 
-                # Try different field names for modification time
-                for time_field in ["modified_at", "modified", "updated_at", "created_at"]:
-                    if time_field in model:
-                        model_info["modified"] = str(model[time_field])
-                        break
-                else:
-                    model_info["modified"] = "unknown"
+                    # Try different field names for modification time
+                    for time_field in ["modified_at", "modified", "updated_at", "created_at"]:
+                        if time_field in model:
+                            model_info["modified"] = str(model[time_field])
+                            break
+                    else:
+                        model_info["modified"] = "unknown"
                     
-                available_models.append(model_info)
+                    available_models.append(model_info)
                 
-        except Exception as e:
-            available_models = [{"error": f"Failed to get available models: {str(e)}"}]
+            except Exception as e:
+                available_models.append({"host": backend.name, "error": f"Failed to get available models: {str(e)}"})
         
         # Get currently loaded models using our fixed function
-        loaded_models_result = get_loaded_models()
+        loaded_models_result = await asyncio.to_thread(get_loaded_models)
         loaded_models = loaded_models_result.get('models', [])
         
         # Get model conductor analytics
         analytics = {}
         try:
-            analytics = model_conductor.get_usage_analytics()
+            analytics = await asyncio.to_thread(model_conductor.get_usage_analytics)
         except Exception as e:
             analytics = {"error": f"Analytics failed: {str(e)}"}
         
@@ -336,26 +885,28 @@ async def load_model(model_name: str):
     """Load a specific model into memory"""
     try:
         # Use model conductor to check if we can load this model
-        can_load = model_conductor.can_load_model(model_name)
+        can_load = await asyncio.to_thread(model_conductor.can_load_model, model_name)
         
         if not can_load:
+            memory_gb = await asyncio.to_thread(model_conductor.estimate_memory_usage)
             return {
                 "success": False,
                 "message": f"Cannot load model {model_name} - insufficient resources",
-                "current_memory_usage": f"{model_conductor.estimate_memory_usage():.1f}GB",
-                "max_memory": f"{model_conductor.max_memory_gb}GB"
+                "current_memory_usage": f"{memory_gb:.1f}GB",
+                "max_memory": f"{model_conductor.max_memory_gb:.1f}GB"
             }
         
         # Load the model by making a simple request
-        agent = HelloAgent(model_name=model_name)
-        result = agent.simple_chat("Hello")
+        agent = HelloAgent(model_name=model_name, router=model_conductor.router)
+        result = await asyncio.to_thread(agent.simple_chat, "Hello")
         
         if result['success']:
+            memory_gb = await asyncio.to_thread(model_conductor.estimate_memory_usage)
             return {
                 "success": True,
                 "message": f"Model {model_name} loaded successfully",
                 "response_time": result['response_time'],
-                "memory_usage": f"{model_conductor.estimate_memory_usage():.1f}GB"
+                "memory_usage": f"{memory_gb:.1f}GB"
             }
         else:
             return {
@@ -375,7 +926,11 @@ async def load_model(model_name: str):
 async def get_model_recommendations(request: TaskRecommendationRequest):
     """Get model recommendations for a task"""
     try:
-        recommendations = model_conductor.get_model_recommendations(request.task_description)
+        recommendations = await single_flight.do(
+            "recommend",
+            request_key(request.task_description),
+            lambda: asyncio.to_thread(model_conductor.get_model_recommendations, request.task_description)
+        )
         return {
             "success": True,
             "task_description": request.task_description,
@@ -393,13 +948,36 @@ async def get_model_recommendations(request: TaskRecommendationRequest):
 async def get_analytics():
     """Get usage analytics and system performance"""
     try:
-        analytics = model_conductor.get_usage_analytics()
+        analytics = await asyncio.to_thread(model_conductor.get_usage_analytics)
         
         # Get current loaded models using our fixed function
-        loaded_models_result = get_loaded_models()
+        loaded_models_result = await asyncio.to_thread(get_loaded_models)
         current_models = [model.get('name', 'unknown') for model in loaded_models_result.get('models', []) if 'error' not in model]
         
         analytics.update({
+            "rate_limiting": {
+                "clients": rate_limiter.get_stats(),
+                "chat_tiers": chat_admission.get_stats(),
+                "research_tiers": research_admission.get_stats()
+            },
+            "structured_output": extractor.get_stats(),
+            "request_coalescing": single_flight.get_stats(),
+            "retrieval": retriever.get_stats(),
+            "reranker": reranker.get_stats() if reranker else None,
+            "source_fetching": source_fetcher.get_stats(),
+            "artifacts": artifact_store.get_stats(),
+            "report_exports": report_exporter.get_stats(),
+            "resources": resource_monitor.get_stats() if resource_monitor else None,
+            "research_queue": {
+                "mode": RESEARCH_WORKER_MODE,
+                "queue": job_store.queue_stats()
+            },
+            "startup": {
+                **startup_state,
+                "startup_seconds": (startup_state["ready_at"] - startup_state["started_at"]).total_seconds()
+                                   if startup_state["ready_at"] else None,
+                "embeddings": embedding_model.get_stats()
+            },
             "system_info": {
                 "currently_loaded_models": current_models,
                 "total_jobs_processed": len(jobs),
@@ -434,97 +1012,146 @@ async def debug_routes():
         "server_version": "5.0.0"
     }
 
+def require_profiling():
+    if not profiling_enabled():
+        raise HTTPException(status_code=404, detail="Profiling is disabled (start the server with PROFILING=1)")
+
+@app.get("/debug/profile", dependencies=[Depends(require_profiling)])
+async def debug_profile(seconds: float = 10.0, interval_ms: float = 5.0, threads: str = "all"):
+    """Sample stacks for N seconds; returns collapsed stacks for flamegraph.pl / speedscope"""
+    # threads=loop samples only the event loop thread (where endpoint code runs)
+    thread_ids = [threading.get_ident()] if threads == "loop" else None
+    try:
+        result = await asyncio.to_thread(sampling_profiler.capture, seconds, interval_ms / 1000, thread_ids)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        result["collapsed"],
+        headers={"X-Profile-Samples": str(result["samples"]), "X-Profile-Seconds": str(result["seconds"])}
+    )
+
+@app.get("/debug/profile/requests", dependencies=[Depends(require_profiling)])
+async def list_request_profiles():
+    """Requests profiled via the X-Profile header, newest first"""
+    return request_profiles.list()
+
+@app.get("/debug/profile/requests/{profile_id}", dependencies=[Depends(require_profiling)])
+async def get_request_profile(profile_id: str, format: str = "text"):
+    """cProfile of one request as text (by cumulative time) or a pstats dump (format=pstats)"""
+    entry = request_profiles.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        return Response(content=entry["stats"], media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'})
+    return PlainTextResponse(f"{entry['method']} {entry['path']} ({entry['elapsed_ms']}ms)\n{entry['text']}")
+
+@app.post("/debug/memory/start", dependencies=[Depends(require_profiling)])
+async def start_allocation_tracking(frames: int = 10):
+    """Start tracemalloc (or move the baseline to now if it is running)"""
+    return await asyncio.to_thread(allocation_tracker.start, frames)
+
+@app.get("/debug/memory/diff", dependencies=[Depends(require_profiling)])
+async def allocation_diff(top: int = 25, group_by: str = "lineno"):
+    """Allocations that grew the most since the baseline"""
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+    try:
+        return await asyncio.to_thread(allocation_tracker.diff, top, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/debug/memory/stop", dependencies=[Depends(require_profiling)])
+async def stop_allocation_tracking():
+    """Stop tracemalloc and free its traces"""
+    return await asyncio.to_thread(allocation_tracker.stop)
+
 # Fixed test endpoint
 @app.get("/test/ollama")
 async def test_ollama():
-    """Test Ollama connection and return raw response"""
-    try:
-        import ollama
-        client = ollama.Client()
-        
-        # Test basic connection
-        models_result = client.list()
-        
-        # Test loaded models using our fixed function
-        loaded_models_result = get_loaded_models()
-        
-        return {
-            "success": True,
-            "models_response": models_result,
-            "loaded_models_response": loaded_models_result,
-            "connection_status": "healthy",
-            "available_client_methods": [method for method in dir(client) if not method.startswith('_')]
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "error_type": type(e).__name__,
-            "connection_status": "failed"
-        }
+    """Test Ollama connection on every host and return raw responses"""
+    hosts = {}
+    for backend in model_conductor.router.ollama_backends():
+        try:
+            hosts[backend.name] = {
+                "success": True,
+                "models_response": await asyncio.to_thread(backend.list_tags),
+                "resident_models": await asyncio.to_thread(backend.resident_models, True),
+                "connection_status": "healthy"
+            }
+        except Exception as e:
+            hosts[backend.name] = {
+                "success": False,
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "connection_status": "failed"
+            }
+    
+    return {
+        "success": any(h["success"] for h in hosts.values()),
+        "hosts": hosts,
+        "loaded_models_response": await asyncio.to_thread(get_loaded_models)
+    }
 
 # Background task for processing research jobs
+def start_research_task(job_id: str, request: ResearchRequest):
+    """Run a research job as a tracked asyncio task"""
+    task = asyncio.create_task(process_research_job(job_id, request))
+    job_tasks[job_id] = task
+    task.add_done_callback(lambda _: job_tasks.pop(job_id, None))
+
 async def process_research_job(job_id: str, request: ResearchRequest):
     """Background task to process research jobs"""
-    try:
-        # Update job status
-        jobs[job_id]["status"] = "processing"
-        jobs[job_id]["progress"] = 10
-        
-        # Simulate research process (we'll implement real research later)
-        await asyncio.sleep(2)  # Simulate web research
-        jobs[job_id]["progress"] = 30
-        
-        await asyncio.sleep(2)  # Simulate document analysis
-        jobs[job_id]["progress"] = 60
-        
-        await asyncio.sleep(2)  # Simulate report generation
-        jobs[job_id]["progress"] = 90
-        
-        # Generate research result using model conductor
-        selected_model = model_conductor.select_model(
-            task_type="research",
-            complexity=request.complexity
-        )
-        
-        agent = HelloAgent(model_name=selected_model)
-        research_prompt = f"""
-        Conduct research on the topic: {request.topic}
-        
-        Please provide:
-        1. Executive Summary
-        2. Key Findings
-        3. Important Sources (mock for now)
-        4. Recommendations
-        
-        Keep it concise but informative.
-        """
-        
-        result = agent.simple_chat(research_prompt)
+    # Wait for a slot in the job's tier (admission was checked at submission)
+    tier = request.complexity if request.complexity in research_admission.tiers else "standard"
+    async with research_admission.slot(tier, research_admission.tiers[tier]):
+        await research_pipeline.execute(job_id, request.model_dump())
+
+def _load_stored_jobs():
+    """Load job records and results from the job store into memory"""
+    stored_jobs = job_store.load_jobs()
+    for stored in stored_jobs:
+        job = stored["record"]
+        jobs[job["job_id"]] = job
+        if stored["results"] is not None:
+            job_results[job["job_id"]] = stored["results"]
+    return stored_jobs
+
+async def relay_worker_events():
+    """Mirror job updates written by research workers into memory and SSE streams"""
+    last_event_id = await asyncio.to_thread(job_store.last_event_id)
+    while True:
+        events = []
+        try:
+            events = await asyncio.to_thread(job_store.events_since, last_event_id)
+            for event_id, job_id, event, data in events:
+                last_event_id = event_id
+                if event != "section":
+                    stored = await asyncio.to_thread(job_store.get_job, job_id)
+                    if stored is not None:
+                        jobs[job_id] = stored["record"]
+                        if stored["results"] is not None:
+                            job_results[job_id] = stored["results"]
+                job_events.publish(job_id, event, data)
+        except Exception as e:
+            print(f"Error relaying worker events: {e}")
         
-        if result['success']:
-            # Store results
-            job_results[job_id] = {
-                "report": result['response'],
-                "model_used": selected_model,
-                "sources": ["https://example.com/source1", "https://example.com/source2"],  # Mock sources
-                "processing_time": result['response_time'],
-                "timestamp": datetime.now(),
-                "complexity": request.complexity,
-                "config": jobs[job_id]["config"]
-            }
-            
-            # Mark job as completed
-            jobs[job_id]["status"] = "completed"
-            jobs[job_id]["progress"] = 100
-            jobs[job_id]["completed_at"] = datetime.now()
-        else:
-            jobs[job_id]["status"] = "failed"
-            jobs[job_id]["error"] = result['error']
-            
-    except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
+        if not events:
+            await asyncio.sleep(0.5)
+
+async def resume_research_jobs():
+    """Reload stored jobs; resume interrupted ones (inline) or relay worker events (external)"""
+    stored_jobs = await asyncio.to_thread(_load_stored_jobs)
+    
+    if RESEARCH_WORKER_MODE == "external":
+        background_tasks.append(asyncio.create_task(relay_worker_events()))
+        return
+    
+    for stored in stored_jobs:
+        job = stored["record"]
+        if job["status"] in ("pending", "processing") and stored["request"] is not None:
+            print(f"🔁 Resuming research job {job['job_id']} (last stage: {job.get('stage')})")
+            start_research_task(job["job_id"], ResearchRequest(**stored["request"]))
 
 # Development endpoints
 @app.get("/")
@@ -548,7 +1175,9 @@ async def root():
             "health": "/health",
             "status": "/status", 
             "chat": "/chat",
+            "chat_sessions": "/chat/sessions",
             "research": "/research",
+            "research_events": "/research/{job_id}/events",
             "models": "/models",
             "analytics": "/analytics",
             "debug": "/debug/routes",
@@ -564,19 +1193,63 @@ async def root():
     }
 
 if __name__ == "__main__":
+    import argparse
+    import subprocess
+    import sys
     import uvicorn
+    
+    parser = argparse.ArgumentParser(description="Research Agent API server")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("API_WORKERS", "1")),
+                        help="API worker processes; more than 1 enables production mode")
+    parser.add_argument("--research-workers", type=int, default=None,
+                        help="Research worker processes to start alongside (production mode, default 2)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)  # Using port 8001 to avoid conflicts
+    args = parser.parse_args()
+    
     print("🚀 Starting Research Agent API Server v5...")
-    print("📖 API Documentation: http://localhost:8001/docs")
-    print("🔍 Health Check: http://localhost:8001/health")
-    print("💬 Chat Test: http://localhost:8001/")
-    print("📊 Analytics: http://localhost:8001/analytics")
-    print("🔧 Debug Routes: http://localhost:8001/debug/routes")
-    print("🧪 Test Ollama: http://localhost:8001/test/ollama")
-    
-    uvicorn.run(
-        "api_server:app", 
-        host="0.0.0.0", 
-        port=8001,  # Using port 8001 to avoid conflicts
-        reload=True,
-        log_level="info"
-    )
+    print(f"📖 API Documentation: http://localhost:{args.port}/docs")
+    print(f"🔍 Health Check: http://localhost:{args.port}/health")
+    print(f"💬 Chat Test: http://localhost:{args.port}/")
+    print(f"📊 Analytics: http://localhost:{args.port}/analytics")
+    print(f"🔧 Debug Routes: http://localhost:{args.port}/debug/routes")
+    print(f"🧪 Test Ollama: http://localhost:{args.port}/test/ollama")
+    
+    if args.workers <= 1:
+        # Development mode: single process with auto-reload
+        uvicorn.run(
+            "api_server:app", 
+            host=args.host, 
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
+        sys.exit(0)
+    
+    # Production mode: N API workers sharing state through SQLite, research
+    # jobs in separate worker processes. Settings reach the workers via the
+    # environment.
+    os.environ["API_WORKERS"] = str(args.workers)
+    os.environ.setdefault("RESEARCH_WORKER_MODE", "external")
+    print(f"🏭 Production mode: {args.workers} API workers, research jobs: {os.environ['RESEARCH_WORKER_MODE']}")
+    
+    research_workers = None
+    research_worker_count = 2 if args.research_workers is None else args.research_workers
+    if os.environ["RESEARCH_WORKER_MODE"] == "external" and research_worker_count > 0:
+        research_workers = subprocess.Popen(
+            [sys.executable, "-m", "research_worker", "--workers", str(research_worker_count)],
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+    
+    try:
+        uvicorn.run(
+            "api_server:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level="warning"
+        )
+    finally:
+        if research_workers is not None:
+            research_workers.terminate()
+            research_workers.wait()
@@ -0,0 +1,228 @@
+# src/artifact_store.py
+"""
+Content-addressed artifact store
+Reports, extracted source text, embeddings and other intermediate results
+are stored once on disk under the SHA-256 of their content (zstd when the
+zstandard package is installed, gzip otherwise). Jobs reference artifacts by
+hash, memo entries map an input key to the artifact computed from it so new
+jobs reuse earlier work, and gc() reclaims artifacts nothing points to
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def memo_key(*parts: Any) -> str:
+    """Key for a memoized result from its inputs (kind, model, input hashes...)"""
+    return content_hash(json.dumps(parts, sort_keys=True, default=str).encode())
+
+
+class ArtifactStore:
+    """Compressed blobs on disk addressed by hash, with a SQLite index of references"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.environ.get("ARTIFACT_STORE_DIR", os.path.join("data", "artifacts"))
+        os.makedirs(self.directory, exist_ok=True)
+        self.codec = "zst" if zstandard is not None else "gz"
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                hash TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS refs (
+                owner TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (owner, hash)
+            );
+            CREATE INDEX IF NOT EXISTS refs_hash ON refs (hash);
+            CREATE TABLE IF NOT EXISTS memo (
+                key TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS memo_hash ON memo (hash);
+        """)
+        self.stats = {"puts": 0, "dedup_hits": 0, "memo_hits": 0, "memo_misses": 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "index.db"), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _path(self, digest: str, codec: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}.{codec}")
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zst":
+            return zstandard.ZstdCompressor(level=6).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _decompress(data: bytes, codec: str) -> bytes:
+        if codec == "zst":
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    # Blobs
+
+    def put(self, data: bytes, kind: str = "blob") -> str:
+        """Store bytes (once) and return their hash"""
+        digest = content_hash(data)
+        self.stats["puts"] += 1
+        if self._conn().execute("SELECT 1 FROM artifacts WHERE hash = ?", (digest,)).fetchone():
+            self.stats["dedup_hits"] += 1
+            return digest
+
+        path = self._path(digest, self.codec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = self._compress(data)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        self._conn().execute(
+            "INSERT OR IGNORE INTO artifacts (hash, kind, codec, size, stored_size, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (digest, kind, self.codec, len(data), len(compressed), time.time())
+        )
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        row = self._conn().execute("SELECT codec FROM artifacts WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._path(digest, row[0]), "rb") as f:
+                return self._decompress(f.read(), row[0])
+        except OSError:
+            return None
+
+    def put_text(self, text: str, kind: str = "text") -> str:
+        return self.put(text.encode("utf-8"), kind)
+
+    def get_text(self, digest: str) -> Optional[str]:
+        data = self.get(digest)
+        return data.decode("utf-8") if data is not None else None
+
+    def put_json(self, value: Any, kind: str = "json") -> str:
+        # Canonical encoding, so equal values share one artifact
+        return self.put(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8"), kind)
+
+    def get_json(self, digest: str) -> Any:
+        data = self.get(digest)
+        return json.loads(data) if data is not None else None
+
+    # References and memoized results
+
+    def add_refs(self, owner: str, digests: Iterable[str]):
+        """Record that `owner` (e.g. a job id) uses these artifacts"""
+        self._conn().executemany(
+            "INSERT OR IGNORE INTO refs (owner, hash) VALUES (?, ?)", [(owner, d) for d in digests if d]
+        )
+
+    def drop_refs(self, owner: str):
+        self._conn().execute("DELETE FROM refs WHERE owner = ?", (owner,))
+
+    def memo_get(self, key: str) -> Optional[str]:
+        """Hash of the artifact computed for `key` earlier, if it is still stored"""
+        row = self._conn().execute("SELECT hash FROM memo WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats["memo_misses"] += 1
+            return None
+        self.stats["memo_hits"] += 1
+        self._conn().execute("UPDATE memo SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def memo_put(self, key: str, digest: str):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO memo (key, hash, last_used) VALUES (?, ?, ?)", (key, digest, time.time())
+        )
+
+    def gc(self,
+           live_owners: Optional[Set[str]] = None,
+           memo_ttl: Optional[float] = None,
+           grace_seconds: float = 3600.0) -> Dict[str, Any]:
+        """
+        Reclaim unreferenced artifacts
+
+        Refs of owners not in `live_owners` are dropped first and memo entries
+        unused for `memo_ttl` seconds expire. Artifacts younger than
+        grace_seconds are kept, since a writer may be about to reference them.
+        """
+        conn = self._conn()
+        now = time.time()
+        memo_ttl = memo_ttl if memo_ttl is not None else float(os.environ.get("ARTIFACT_MEMO_TTL_DAYS", "30")) * 86400
+
+        dropped_refs = 0
+        if live_owners is not None:
+            owners = [row[0] for row in conn.execute("SELECT DISTINCT owner FROM refs")]
+            for owner in owners:
+                if owner not in live_owners:
+                    dropped_refs += conn.execute("DELETE FROM refs WHERE owner = ?", (owner,)).rowcount
+        expired_memo = conn.execute("DELETE FROM memo WHERE last_used < ?", (now - memo_ttl,)).rowcount
+
+        garbage = conn.execute(
+            """
+            SELECT hash, codec, stored_size FROM artifacts
+            WHERE created_at < ?
+              AND hash NOT IN (SELECT hash FROM refs)
+              AND hash NOT IN (SELECT hash FROM memo)
+            """,
+            (now - grace_seconds,)
+        ).fetchall()
+        reclaimed = 0
+        for digest, codec, stored_size in garbage:
+            conn.execute("DELETE FROM artifacts WHERE hash = ?", (digest,))
+            try:
+                os.remove(self._path(digest, codec))
+            except OSError:
+                pass
+            reclaimed += stored_size
+
+        result = {"deleted": len(garbage), "reclaimed_bytes": reclaimed,
+                  "dropped_refs": dropped_refs, "expired_memo": expired_memo}
+        print(f"🧹 Artifact GC: {result}")
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        count, size, stored = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM artifacts"
+        ).fetchone()
+        by_kind = {kind: n for kind, n in conn.execute("SELECT kind, COUNT(*) FROM artifacts GROUP BY kind")}
+        lookups = self.stats["memo_hits"] + self.stats["memo_misses"]
+        return {
+            "codec": self.codec,
+            "artifacts": count,
+            "by_kind": by_kind,
+            "bytes": size,
+            "stored_bytes": stored,
+            "compression_ratio": round(size / stored, 2) if stored else None,
+            "memo_entries": conn.execute("SELECT COUNT(*) FROM memo").fetchone()[0],
+            **self.stats,
+            "memo_hit_rate": round(self.stats["memo_hits"] / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,408 @@
+# src/chat_sessions.py
+"""
+Multi-turn chat sessions with prompt-prefix reuse
+Keeps message history server-side, pins each session to one model and keeps
+that model resident so Ollama can reuse the KV cache for the shared prefix.
+With shared state (several API workers) sessions are stored in SQLite so any
+worker can serve the next turn
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from hello_agent import HelloAgent
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful research assistant. Answer clearly and concisely, "
+    "and say so when you are unsure."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English text)"""
+    return max(1, len(text) // 4)
+
+
+class ChatSession:
+    """A single conversation pinned to one model"""
+
+    def __init__(self,
+                 session_id: str,
+                 model: str,
+                 system_message: Dict[str, str],
+                 token_budget: int,
+                 keep_alive: str,
+                 options: Optional[Dict[str, Any]] = None):
+        self.session_id = session_id
+        self.model = model
+        # Shared (interned) system message - identical prefixes across sessions
+        self.system_message = system_message
+        self.token_budget = token_budget
+        self.keep_alive = keep_alive
+        # Generation options for every turn (num_ctx sized for the token budget)
+        self.options = options or {}
+        # Backend that served the last turn - later turns stick to it
+        self.backend: Optional[str] = None
+        self.history: List[Dict[str, str]] = []
+        self.turns: List[Dict[str, Any]] = []
+        self.trim_count = 0
+        self.created_at = datetime.now()
+        self.last_used = time.time()
+        # Version of the shared-state copy this object was loaded from (0 = unsaved)
+        self.version = 0
+        self.lock = asyncio.Lock()
+
+    def history_tokens(self) -> int:
+        """Estimated tokens for system prompt plus history"""
+        total = estimate_tokens(self.system_message["content"])
+        for message in self.history:
+            total += estimate_tokens(message["content"])
+        return total
+
+    def trim_history(self, low_water: float = 0.6) -> int:
+        """
+        Drop the oldest turns once the history exceeds the token budget.
+
+        Trimming goes down to a low-water mark rather than just under the
+        budget, so the cached prefix is invalidated once every few turns
+        instead of on every turn.
+        """
+        if self.history_tokens() <= self.token_budget:
+            return 0
+
+        target = int(self.token_budget * low_water)
+        dropped = 0
+        # Always drop whole user/assistant pairs and keep the latest message
+        while len(self.history) > 1 and self.history_tokens() > target:
+            self.history.pop(0)
+            dropped += 1
+            if self.history and self.history[0]["role"] == "assistant":
+                self.history.pop(0)
+                dropped += 1
+
+        if dropped:
+            self.trim_count += 1
+        return dropped
+
+    def turn_count(self) -> int:
+        """Turns so far (only the latest turns are kept)"""
+        return self.turns[-1]["turn"] if self.turns else 0
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Full message list sent to the model"""
+        return [self.system_message] + self.history
+
+    def to_dict(self, include_history: bool = False) -> Dict[str, Any]:
+        """Serializable session summary"""
+        data = {
+            "session_id": self.session_id,
+            "model": self.model,
+            "backend": self.backend,
+            "keep_alive": self.keep_alive,
+            "options": self.options,
+            "token_budget": self.token_budget,
+            "history_tokens": self.history_tokens(),
+            "message_count": len(self.history),
+            "turn_count": self.turn_count(),
+            "trim_count": self.trim_count,
+            "created_at": self.created_at,
+            "turns": self.turns[-20:]
+        }
+        if include_history:
+            data["history"] = self.history
+        return data
+
+    def to_record(self) -> Dict[str, Any]:
+        """Everything needed to rebuild the session in another worker"""
+        return {
+            "model": self.model,
+            "system_prompt": self.system_message["content"],
+            "token_budget": self.token_budget,
+            "keep_alive": self.keep_alive,
+            "options": self.options,
+            "backend": self.backend,
+            "history": self.history,
+            "turns": self.turns[-20:],
+            "trim_count": self.trim_count,
+            "created_at": self.created_at.isoformat()
+        }
+
+
+class SessionManager:
+    """Creates, looks up and expires chat sessions"""
+
+    def __init__(self,
+                 default_token_budget: int = 3072,
+                 default_keep_alive: str = "30m",
+                 idle_timeout: int = 3600,
+                 max_sessions: int = 500,
+                 router=None,
+                 shared_state=None):
+        self.router = router
+        # SharedState: sessions are stored there and `sessions` is a per-worker cache
+        self.shared_state = shared_state
+        self.default_token_budget = default_token_budget
+        self.default_keep_alive = default_keep_alive
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions: Dict[str, ChatSession] = {}
+        # system prompt hash -> shared message dict
+        self._system_messages: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def _intern_system_message(self, system_prompt: str) -> Dict[str, str]:
+        """Return one shared message object per distinct system prompt"""
+        key = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            message = self._system_messages.get(key)
+            if message is None:
+                message = {"role": "system", "content": system_prompt}
+                self._system_messages[key] = message
+            return message
+
+    def _save(self, session: ChatSession) -> bool:
+        """Persist a session to shared state; False if another worker changed it first"""
+        if self.shared_state is None:
+            return True
+        saved = self.shared_state.save_session(
+            session.session_id, session.to_record(), session.version, session.last_used
+        )
+        if saved:
+            session.version += 1
+        return saved
+
+    def _load(self, session_id: str) -> Optional[ChatSession]:
+        """Refresh the cached session from shared state"""
+        stored = self.shared_state.load_session(session_id)
+        with self._lock:
+            if stored is None:
+                self.sessions.pop(session_id, None)
+                return None
+            record, version = stored
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = ChatSession(
+                    session_id=session_id,
+                    model=record["model"],
+                    system_message=self._intern_system_message(record["system_prompt"]),
+                    token_budget=record["token_budget"],
+                    keep_alive=record["keep_alive"],
+                    options=record["options"]
+                )
+                session.created_at = datetime.fromisoformat(record["created_at"])
+                self.sessions[session_id] = session
+            if session.version != version:
+                session.backend = record["backend"]
+                session.history = record["history"]
+                session.turns = record["turns"]
+                session.trim_count = record["trim_count"]
+                session.version = version
+            session.last_used = time.time()
+            return session
+
+    def create_session(self,
+                       model: str,
+                       system_prompt: Optional[str] = None,
+                       token_budget: Optional[int] = None,
+                       keep_alive: Optional[str] = None,
+                       options: Optional[Dict[str, Any]] = None) -> ChatSession:
+        """Create a session pinned to `model`"""
+        self.expire_idle_sessions()
+
+        with self._lock:
+            if len(self.sessions) >= self.max_sessions:
+                # Evict the least recently used session
+                oldest = min(self.sessions.values(), key=lambda s: s.last_used)
+                del self.sessions[oldest.session_id]
+        if self.shared_state is not None:
+            self.shared_state.evict_sessions(self.max_sessions - 1)
+
+        session = ChatSession(
+            session_id=str(uuid.uuid4()),
+            model=model,
+            system_message=self._intern_system_message(system_prompt or DEFAULT_SYSTEM_PROMPT),
+            token_budget=token_budget or self.default_token_budget,
+            keep_alive=keep_alive or self.default_keep_alive,
+            options=options
+        )
+        self._save(session)
+        with self._lock:
+            self.sessions[session.session_id] = session
+        return session
+
+    def get_session(self, session_id: str) -> Optional[ChatSession]:
+        """Look up a session, refreshing its idle timer"""
+        if self.shared_state is not None:
+            return self._load(session_id)
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.time()
+        return session
+
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a session"""
+        with self._lock:
+            deleted = self.sessions.pop(session_id, None) is not None
+        if self.shared_state is not None:
+            deleted = self.shared_state.delete_session(session_id)
+        return deleted
+
+    def expire_idle_sessions(self) -> int:
+        """Drop sessions idle for longer than idle_timeout"""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            expired = [sid for sid, s in self.sessions.items() if s.last_used < cutoff]
+            for sid in expired:
+                del self.sessions[sid]
+        if self.shared_state is not None:
+            return self.shared_state.expire_sessions(self.idle_timeout)
+        return len(expired)
+
+    def send_message(self,
+                     session: ChatSession,
+                     message: str,
+                     options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Append a user message, run one turn on the pinned model and record it"""
+        options = {**session.options, **(options or {})}
+        keep_alive = options.pop("keep_alive", session.keep_alive)
+        # Trimming may drop old turns; a failed turn must not lose them
+        snapshot = (list(session.history), session.trim_count)
+        session.history.append({"role": "user", "content": message})
+        dropped = session.trim_history()
+
+        agent = HelloAgent(model_name=session.model, router=self.router)
+        result = agent.chat(
+            session.messages(),
+            options=options,
+            keep_alive=keep_alive,
+            prefer_backend=session.backend
+        )
+
+        if not result['success']:
+            # Restore the history as it was so the session can be retried
+            session.history, session.trim_count = snapshot
+            return result
+
+        session.history.append({"role": "assistant", "content": result['response']})
+        session.backend = result.get('backend', session.backend)
+        session.last_used = time.time()
+
+        turn = {
+            "turn": session.turn_count() + 1,
+            "response_time": result['response_time'],
+            "prompt_eval_count": result.get('prompt_eval_count'),
+            "prompt_eval_ms": result.get('prompt_eval_ms'),
+            "eval_ms": result.get('eval_ms'),
+            "history_tokens": session.history_tokens(),
+            "dropped_messages": dropped
+        }
+        session.turns.append(turn)
+
+        if not self._save(session):
+            # Another worker ran a turn on this session meanwhile; the next
+            # lookup reloads its history
+            return {
+                "success": False,
+                "conflict": True,
+                "error": "Session was updated by another request, retry"
+            }
+
+        result['turn'] = turn
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aggregate session statistics"""
+        return {
+            "active_sessions": (self.shared_state.session_count()
+                                if self.shared_state is not None else len(self.sessions)),
+            "distinct_system_prompts": len(self._system_messages),
+            "total_turns": sum(s.turn_count() for s in self.sessions.values())
+        }
+
+
+def benchmark_session_turns(model: str = "llama3.1:8b", turns: int = 8) -> Dict[str, List[Dict]]:
+    """
+    Compare per-turn latency for a pinned session vs. a stateless client.
+
+    Both arms use the same model, options and keep_alive, and the model is
+    loaded before either starts, so only the prompt layout differs: the
+    session sends a stable system prompt + history prefix, the stateless
+    client packs the new question and the transcript into one message, so
+    its prefix changes every turn and the whole history is prefilled again.
+    """
+    questions = [
+        "Give me a one-paragraph overview of retrieval-augmented generation.",
+        "What are the main failure modes of that approach?",
+        "How would you evaluate retrieval quality?",
+        "Which of those metrics is cheapest to compute?",
+        "Summarize our conversation so far in three bullets.",
+        "What should I read next on this topic?",
+    ]
+
+    manager = SessionManager()
+    session = manager.create_session(model)
+    agent = HelloAgent(model_name=model)
+
+    # Load the model once so neither arm pays for it
+    warmup = agent.chat([session.system_message, {"role": "user", "content": "Hi"}],
+                        options={**session.options, "num_predict": 1}, keep_alive=session.keep_alive)
+    if not warmup['success']:
+        print(f"❌ Warm-up failed: {warmup['error']}")
+        return {"session": [], "baseline": []}
+
+    session_results = []
+    for i in range(turns):
+        result = manager.send_message(session, questions[i % len(questions)])
+        if not result['success']:
+            print(f"❌ Session turn {i + 1} failed: {result['error']}")
+            break
+        session_results.append(result['turn'])
+
+    history: List[Dict[str, str]] = []
+    baseline_results = []
+    for i in range(turns):
+        question = questions[i % len(questions)]
+        transcript = "\n\n".join(f"{m['role']}: {m['content']}" for m in history)
+        messages = [
+            session.system_message,
+            {"role": "user", "content": f"Question: {question}\n\nConversation so far:\n{transcript}"}
+        ]
+        result = agent.chat(messages, options=session.options, keep_alive=session.keep_alive)
+        if not result['success']:
+            print(f"❌ Baseline turn {i + 1} failed: {result['error']}")
+            break
+        history.append({"role": "user", "content": question})
+        history.append({"role": "assistant", "content": result['response']})
+        baseline_results.append({
+            "turn": i + 1,
+            "response_time": result['response_time'],
+            "prompt_eval_count": result.get('prompt_eval_count'),
+            "prompt_eval_ms": result.get('prompt_eval_ms')
+        })
+
+    return {"session": session_results, "baseline": baseline_results}
+
+
+async def main():
+    """Run the per-turn latency benchmark"""
+    print("🚀 Chat Session Benchmark - per-turn latency vs. turn count")
+    print("=" * 60)
+
+    results = benchmark_session_turns()
+
+    print(f"{'turn':>4}  {'session s':>10}  {'prefill ms':>10}  {'baseline s':>10}  {'prefill ms':>10}")
+    for session_turn, baseline_turn in zip(results["session"], results["baseline"]):
+        print(f"{session_turn['turn']:>4}  "
+              f"{session_turn['response_time']:>10.2f}  "
+              f"{session_turn['prompt_eval_ms'] or 0:>10.0f}  "
+              f"{baseline_turn['response_time']:>10.2f}  "
+              f"{baseline_turn['prompt_eval_ms'] or 0:>10.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
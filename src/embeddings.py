@@ -0,0 +1,65 @@
+# src/embeddings.py
+"""
+Lazily loaded sentence-transformers embedding model
+torch/transformers take seconds to import, so nothing is imported until the
+first encode() call or an explicit warmup() scheduled after startup
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+
+class EmbeddingModel:
+    """sentence-transformers model loaded on first use"""
+
+    def __init__(self, model_name: Optional[str] = None, device: Optional[str] = None):
+        self.model_name = model_name or os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+        self.device = device or os.environ.get("EMBEDDING_DEVICE")  # None lets torch pick (mps/cuda/cpu)
+        self.load_time: Optional[float] = None
+        self.error: Optional[str] = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start_time = time.time()
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                        self._model = SentenceTransformer(self.model_name, device=self.device)
+                    except Exception as e:
+                        self.error = str(e)
+                        raise
+                    self.load_time = time.time() - start_time
+                    self.error = None
+                    print(f"🧠 Loaded embedding model {self.model_name} in {self.load_time:.2f}s")
+        return self._model
+
+    def encode(self, texts: Union[str, List[str]], **kwargs) -> Any:
+        """Embed one text or a batch (blocking - call via asyncio.to_thread from handlers)"""
+        return self._get_model().encode(texts, **kwargs)
+
+    async def warmup(self) -> bool:
+        """Load the model in a worker thread; False if it could not be loaded"""
+        try:
+            await asyncio.to_thread(self._get_model)
+            return True
+        except Exception as e:
+            print(f"⚠️ Embedding model warmup failed: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "load_time": round(self.load_time, 3) if self.load_time else None,
+            "error": self.error
+        }
@@ -0,0 +1,405 @@
+# src/fake_ollama.py
+"""
+Deterministic fake Ollama server for tests and load tests
+Serves /api/chat, /api/generate, /api/tags and /api/ps for the models in the
+catalogue with simulated load time (per GB), time to first token, tokens/sec,
+memory limits with LRU eviction, keep_alive expiry and per-model parallelism.
+Output text is derived from a hash of the request, so the same request always
+gets the same answer. Set --time-scale 0 to skip all delays
+
+Usage (from src/):
+    python fake_ollama.py --port 11434 --tokens-per-second 40 --memory-gb 24
+    OLLAMA_HOST=http://127.0.0.1:11434 uvicorn api_server:app
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from model_catalogue import ModelCatalogue
+
+WORDS = (
+    "model memory bandwidth token latency context quantization throughput cache prompt local inference "
+    "apple silicon research source report evidence analysis result benchmark retrieval ranking summary"
+).split()
+SECTIONS = ["Executive Summary", "Key Findings", "Important Sources", "Recommendations"]
+
+
+def parse_keep_alive(value: Union[None, int, float, str], default: float) -> float:
+    """Seconds to keep a model loaded ("5m", "30s", "1h", 300, -1 = forever)"""
+    if value is None or value == "":
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([smh]?)", value.strip())
+    if not match:
+        return default
+    seconds = float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+def example_instance(schema: Dict[str, Any], root: Optional[Dict[str, Any]] = None) -> Any:
+    """Smallest value satisfying the common JSON-schema keywords (for format requests)"""
+    root = root or schema
+    if "$ref" in schema:
+        target = root
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            target = target.get(part, {})
+        return example_instance(target, root)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if schema.get(key):
+            return example_instance(schema[key][0], root)
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        return {name: example_instance(properties.get(name, {}), root) for name in schema.get("required", properties)}
+    if kind == "array":
+        return [example_instance(schema.get("items", {}), root) for _ in range(schema.get("minItems", 0))]
+    if kind in ("integer", "number"):
+        value = schema.get("minimum", schema.get("exclusiveMinimum", -1) + 1)
+        return int(value) if kind == "integer" else float(value)
+    if kind == "boolean":
+        return False
+    if kind == "null":
+        return None
+    return "x" * schema.get("minLength", 4)
+
+
+class FakeOllama:
+    """Model residency, timing and text generation behind the HTTP handler"""
+
+    def __init__(self,
+                 models: Dict[str, Dict[str, Any]],
+                 load_seconds_per_gb: float = 0.2,
+                 ttft_ms: float = 50.0,
+                 tokens_per_second: float = 40.0,
+                 prefill_tokens_per_second: float = 800.0,
+                 memory_gb: float = 24.0,
+                 parallel: int = 1,
+                 keep_alive: float = 300.0,
+                 num_predict: int = 128,
+                 time_scale: float = 1.0):
+        # name -> {"size_gb", "speed_score"}; tokens/sec scales with speed_score / 10
+        self.models = models
+        self.load_seconds_per_gb = load_seconds_per_gb
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.memory_gb = memory_gb
+        self.parallel = parallel
+        self.keep_alive = keep_alive
+        self.num_predict = num_predict
+        self.time_scale = time_scale
+
+        self._lock = threading.Lock()
+        # name -> {"expires_at", "last_used", "active"}
+        self._loaded: Dict[str, Dict[str, Any]] = {}
+        self._load_locks = {name: threading.Lock() for name in models}
+        # Like OLLAMA_NUM_PARALLEL: requests beyond this queue per model
+        self._slots = {name: threading.BoundedSemaphore(parallel) for name in models}
+        self.stats = {"requests": 0, "loads": 0, "evictions": 0, "expired": 0, "tokens": 0, "active": 0}
+
+    def _sleep(self, seconds: float):
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _expire(self):
+        now = time.time()
+        with self._lock:
+            for name, state in list(self._loaded.items()):
+                if not state["active"] and state["expires_at"] <= now:
+                    del self._loaded[name]
+                    self.stats["expired"] += 1
+
+    def _load(self, model: str) -> int:
+        """Make `model` resident (evicting idle models LRU-first) and return the load time in ns"""
+        self._expire()
+        with self._load_locks[model]:
+            with self._lock:
+                if model in self._loaded:
+                    return 0
+            size = self.models[model]["size_gb"]
+            with self._lock:
+                idle = sorted((s["last_used"], n) for n, s in self._loaded.items() if not s["active"])
+                used = sum(self.models[n]["size_gb"] for n in self._loaded)
+                while used + size > self.memory_gb and idle:
+                    _, victim = idle.pop(0)
+                    used -= self.models[victim]["size_gb"]
+                    del self._loaded[victim]
+                    self.stats["evictions"] += 1
+
+            load_seconds = size * self.load_seconds_per_gb
+            self._sleep(load_seconds)
+            with self._lock:
+                self._loaded[model] = {"expires_at": float("inf"), "last_used": time.time(), "active": 0}
+                self.stats["loads"] += 1
+            return int(load_seconds * 1e9)
+
+    def _text(self, model: str, prompt: str, count: int, format: Union[None, str, Dict[str, Any]]) -> List[str]:
+        """Deterministic output tokens for this model and prompt"""
+        if format:
+            value = example_instance(format) if isinstance(format, dict) else {"response": "ok"}
+            text = json.dumps(value)
+            return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+        seed = hashlib.sha256(f"{model}\n{prompt}".encode()).digest()
+        tokens = []
+        sections = SECTIONS if "Executive Summary" in prompt else []
+        per_section = max(1, count // max(1, len(sections)))
+        for i in range(count):
+            if sections and i % per_section == 0 and i // per_section < len(sections):
+                tokens.append(("\n\n" if i else "") + f"## {sections[i // per_section]}\n")
+            word = WORDS[seed[i % len(seed)] * (i + 1) % len(WORDS)]
+            tokens.append(word + ("\n" if i % 12 == 11 else " "))
+        return tokens
+
+    def generate(self,
+                 model: str,
+                 prompt: str,
+                 options: Optional[Dict[str, Any]],
+                 keep_alive: Union[None, int, float, str],
+                 format: Union[None, str, Dict[str, Any]]) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Yield (token, None) pairs, then ("", final stats) - sleeping like a real model would"""
+        options = options or {}
+        start = time.time()
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["active"] += 1
+        try:
+            with self._slots[model]:
+                load_ns = self._load(model)
+                with self._lock:
+                    self._loaded[model]["active"] += 1
+                try:
+                    prompt_tokens = len(prompt) // 4 + 1
+                    prefill = self.ttft_ms / 1000 + prompt_tokens / self.prefill_tokens_per_second
+                    self._sleep(prefill)
+
+                    num_predict = options.get("num_predict") or self.num_predict
+                    count = self.num_predict if num_predict < 0 else num_predict
+                    tokens = self._text(model, prompt, count, format)
+                    rate = self.tokens_per_second * self.models[model]["speed_score"] / 10
+                    eval_start = time.time()
+                    for token in tokens:
+                        self._sleep(1 / rate)
+                        yield token, None
+                    eval_ns = int((time.time() - eval_start) * 1e9)
+                finally:
+                    with self._lock:
+                        state = self._loaded.get(model)
+                        if state is not None:
+                            state["active"] -= 1
+                            state["last_used"] = time.time()
+                            state["expires_at"] = time.time() + parse_keep_alive(keep_alive, self.keep_alive)
+            with self._lock:
+                self.stats["tokens"] += len(tokens)
+            yield "", {
+                "total_duration": int((time.time() - start) * 1e9),
+                "load_duration": load_ns,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": eval_ns
+            }
+        finally:
+            with self._lock:
+                self.stats["active"] -= 1
+            self._expire()
+
+    def tags(self) -> Dict[str, Any]:
+        return {"models": [self._describe(name) for name in self.models]}
+
+    def ps(self) -> Dict[str, Any]:
+        self._expire()
+        with self._lock:
+            loaded = dict(self._loaded)
+        models = []
+        for name, state in loaded.items():
+            entry = self._describe(name)
+            entry["size_vram"] = entry["size"]
+            expires = state["expires_at"]
+            entry["expires_at"] = (datetime.fromtimestamp(expires, timezone.utc).isoformat()
+                                   if expires != float("inf") else "2318-01-01T00:00:00Z")
+            models.append(entry)
+        return {"models": models}
+
+    def _describe(self, name: str) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "model": name,
+            "modified_at": "2024-01-01T00:00:00Z",
+            "size": int(self.models[name]["size_gb"] * 1e9),
+            "digest": hashlib.sha256(name.encode()).hexdigest(),
+            "details": {"format": "gguf", "family": name.split(":")[0]}
+        }
+
+
+def make_handler(fake: FakeOllama):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, value: Any):
+            body = json.dumps(value).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json(200, fake.tags())
+            elif self.path == "/api/ps":
+                self._json(200, fake.ps())
+            elif self.path == "/api/version":
+                self._json(200, {"version": "0.0.0-fake"})
+            elif self.path == "/fake/stats":
+                self._json(200, fake.stats)
+            elif self.path == "/":
+                self.send_response(200)
+                self.send_header("Content-Length", "17")
+                self.end_headers()
+                self.wfile.write(b"Ollama is running")
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError:
+                self._json(400, {"error": "invalid JSON"})
+                return
+            if self.path not in ("/api/chat", "/api/generate"):
+                self._json(404, {"error": "not found"})
+                return
+
+            model = request.get("model")
+            if model not in fake.models:
+                self._json(404, {"error": f"model '{model}' not found, try pulling it first"})
+                return
+
+            if fake.models[model]["size_gb"] > fake.memory_gb:
+                # What Ollama answers when a model can never fit
+                self._json(500, {"error": f"model requires more system memory ({fake.models[model]['size_gb']:.1f} GiB) "
+                                          f"than is available ({fake.memory_gb:.1f} GiB)"})
+                return
+
+            chat = self.path == "/api/chat"
+            if chat:
+                prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages") or [])
+            else:
+                prompt = request.get("prompt", "")
+            stream = fake.generate(model, prompt, request.get("options"), request.get("keep_alive"),
+                                   request.get("format") or None)
+
+            def frame(token: str, final: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+                payload = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": final is not None}
+                if chat:
+                    payload["message"] = {"role": "assistant", "content": token}
+                else:
+                    payload["response"] = token
+                if final is not None:
+                    payload.update(final, done_reason="stop")
+                return payload
+
+            if request.get("stream") is False:
+                parts = []
+                for token, final in stream:
+                    parts.append(token)
+                    if final is not None:
+                        response = frame("".join(parts), final)
+                self._json(200, response)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for token, final in stream:
+                    data = (json.dumps(frame(token, final)) + "\n").encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client went away (e.g. a cancelled job) - stop generating like Ollama does
+                stream.close()
+
+    return FakeOllamaHandler
+
+
+def catalogue_models(path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Every catalogue tag (variants included) with its size and speed score"""
+    profiles = ModelCatalogue(path).current.model_profiles
+    return {name: {"size_gb": p["size_gb"], "speed_score": p["speed_score"]} for name, p in profiles.items()}
+
+
+def start_server(fake: FakeOllama, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve in a background thread (port 0 picks a free port: server.server_address[1])"""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--catalogue", default=None, help="Model catalogue to serve (default: MODEL_CATALOGUE or config/)")
+    parser.add_argument("--load-seconds-per-gb", type=float, default=0.2, help="Simulated model load time")
+    parser.add_argument("--ttft-ms", type=float, default=50.0, help="Time to first token before prompt processing")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="Decode speed of a speed_score 10 model")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=800.0)
+    parser.add_argument("--memory-gb", type=float, default=24.0, help="Memory for resident models (LRU eviction)")
+    parser.add_argument("--parallel", type=int, default=1, help="Concurrent requests per model (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--keep-alive", type=float, default=300.0, help="Default seconds a model stays loaded")
+    parser.add_argument("--num-predict", type=int, default=128, help="Tokens generated when the request sets none")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier for every delay (0 = instant)")
+    args = parser.parse_args()
+
+    fake = FakeOllama(
+        catalogue_models(args.catalogue),
+        load_seconds_per_gb=args.load_seconds_per_gb,
+        ttft_ms=args.ttft_ms,
+        tokens_per_second=args.tokens_per_second,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        memory_gb=args.memory_gb,
+        parallel=args.parallel,
+        keep_alive=args.keep_alive,
+        num_predict=args.num_predict,
+        time_scale=args.time_scale
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    server.daemon_threads = True
+    print(f"🦙 Fake Ollama serving {len(fake.models)} models on http://{args.host}:{args.port} "
+          f"({args.tokens_per_second} tok/s, {args.memory_gb} GB, time scale {args.time_scale})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
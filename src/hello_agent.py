@@ -5,24 +5,40 @@ This validates your M4 Pro setup before building the full system
 """
 
 import asyncio
-import ollama
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional, Union
 import time
 import json
 
+from lazy_imports import lazy_import
+
+ollama = lazy_import("ollama")
+
 
 class HelloAgent:
     """Simple agent to test local model integration"""
     
-    def __init__(self, model_name: str = "llama3.1:8b"):
+    def __init__(self, model_name: str = "llama3.1:8b", router=None, host: Optional[str] = None):
         self.model_name = model_name
-        self.client = ollama.Client()
+        self.host = host
+        self._client = None
+        # Optional BackendRouter - when set, chats are dispatched across backends
+        self.router = router
         
+    @property
+    def client(self):
+        """Ollama client, created on first use"""
+        if self._client is None:
+            self._client = ollama.Client(host=self.host)
+        return self._client
+
     def test_connection(self) -> bool:
         """Test if Ollama is running and model is available"""
         try:
-            models = self.client.list()
-            available_models = [model['name'] for model in models['models']]
+            if self.router is not None:
+                available_models = self.router.available_models()
+            else:
+                models = self.client.list()
+                available_models = [model['name'] for model in models['models']]
             
             if self.model_name not in available_models:
                 print(f"Model {self.model_name} not found. Available models: {available_models}")
@@ -37,17 +53,40 @@ class HelloAgent:
     
     def simple_chat(self, message: str) -> Dict[str, Any]:
         """Send a simple message to the model"""
+        return self.chat([
+            {
+                'role': 'user',
+                'content': message
+            }
+        ])
+    
+    def chat(self,
+             messages: List[Dict[str, str]],
+             options: Optional[Dict[str, Any]] = None,
+             keep_alive: Optional[Union[float, str]] = None,
+             prefer_backend: Optional[str] = None,
+             format: Optional[Union[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Send a full message history to the model (format: "json" or a JSON schema)"""
+        if self.router is not None:
+            try:
+                return self.router.chat(self.model_name, messages, options, keep_alive,
+                                        prefer_backend=prefer_backend, format=format)
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'model': self.model_name
+                }
+        
         try:
             start_time = time.time()
             
             response = self.client.chat(
                 model=self.model_name,
-                messages=[
-                    {
-                        'role': 'user',
-                        'content': message
-                    }
-                ]
+                messages=messages,
+                format=format or '',
+                options=options,
+                keep_alive=keep_alive
             )
             
             end_time = time.time()
@@ -56,7 +95,13 @@ class HelloAgent:
                 'success': True,
                 'response': response['message']['content'],
                 'response_time': end_time - start_time,
-                'model': self.model_name
+                'model': self.model_name,
+                # Ollama reports durations in nanoseconds
+                'prompt_eval_count': response.get('prompt_eval_count'),
+                'prompt_eval_ms': response.get('prompt_eval_duration', 0) / 1e6,
+                'eval_count': response.get('eval_count'),
+                'eval_ms': response.get('eval_duration', 0) / 1e6,
+                'load_ms': response.get('load_duration', 0) / 1e6
             }
             
         except Exception as e:
@@ -66,6 +111,34 @@ class HelloAgent:
                 'model': self.model_name
             }
     
+    def stream_chat(self,
+                    messages: List[Dict[str, str]],
+                    options: Optional[Dict[str, Any]] = None,
+                    keep_alive: Optional[Union[float, str]] = None,
+                    format: Optional[Union[str, Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """Stream a response as {'content', 'done'} chunks (errors are raised)"""
+        if self.router is not None:
+            yield from self.router.stream_chat(self.model_name, messages, options, keep_alive, format=format)
+            return
+        
+        stream = self.client.chat(
+            model=self.model_name,
+            messages=messages,
+            format=format or '',
+            options=options,
+            keep_alive=keep_alive,
+            stream=True
+        )
+        try:
+            for part in stream:
+                yield {
+                    'content': part.get('message', {}).get('content', ''),
+                    'done': part.get('done', False),
+                    'eval_count': part.get('eval_count')
+                }
+        finally:
+            stream.close()
+    
     def test_agent_capabilities(self) -> Dict[str, Any]:
         """Test different agent capabilities"""
         tests = [
@@ -169,8 +242,7 @@ async def main():
     # Optional: Benchmark available models
     print("\n🏃 Available for model benchmarking...")
     try:
-        client = ollama.Client()
-        models = client.list()
+        models = agent.client.list()
         model_names = [model['name'] for model in models['models']]
         print(f"Found models: {model_names}")
         
@@ -0,0 +1,897 @@
+# src/inference_backends.py
+"""
+Pluggable inference backends - local Ollama hosts and OpenAI-compatible servers
+(llama.cpp server, vLLM, hosted APIs) behind one routing layer that looks at
+queue depth, observed latency and the premium API budget
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from lazy_imports import lazy_import
+
+# Deferred until first use so importing the server stays fast
+httpx = lazy_import("httpx")
+ollama = lazy_import("ollama")
+requests = lazy_import("requests")
+
+
+class BudgetExceededError(Exception):
+    """Raised when a premium backend would exceed the daily/monthly spend cap"""
+
+
+class NoBackendAvailableError(Exception):
+    """Raised when no healthy backend can serve the requested model"""
+
+
+# Ollama/llama.cpp/CUDA wording for a model that could not be loaded for lack of memory
+MEMORY_ERROR_MARKERS = (
+    "requires more system memory",
+    "out of memory",
+    "insufficient memory",
+    "cudamalloc failed",
+    "unable to allocate",
+    "signal: killed"
+)
+
+
+def is_memory_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in MEMORY_ERROR_MARKERS)
+
+
+class InferenceBackend:
+    """Base class: tracks queue depth, latency and health for one endpoint"""
+
+    kind = "base"
+
+    def __init__(self,
+                 name: str,
+                 premium: bool = False,
+                 input_cost_per_1k: float = 0.0,
+                 output_cost_per_1k: float = 0.0,
+                 max_concurrency: int = 4,
+                 models: Optional[List[str]] = None,
+                 model_cache_ttl: float = 30.0):
+        self.name = name
+        self.premium = premium
+        self.input_cost_per_1k = input_cost_per_1k
+        self.output_cost_per_1k = output_cost_per_1k
+        self.max_concurrency = max_concurrency
+        self.static_models = models
+        self.model_cache_ttl = model_cache_ttl
+
+        self.in_flight = 0
+        self.total_requests = 0
+        self.total_errors = 0
+        self.consecutive_errors = 0
+        self.ewma_latency = 2.0  # seconds, optimistic prior until we observe
+        self.healthy = True
+        self.unhealthy_since = 0.0
+        self.retry_after = 15.0  # seconds before an unhealthy backend is probed again
+        self.last_error: Optional[str] = None
+        # Outcome of the last time the endpoint was asked for its models
+        # ({"ok", "at", "error"}); None until it has been probed
+        self.last_probe: Optional[Dict[str, Any]] = None
+        self._models_cache: List[str] = []
+        self._models_cached_at = 0.0
+        self._lock = threading.Lock()
+
+    # Subclasses implement these two
+    def _fetch_models(self) -> List[str]:
+        raise NotImplementedError
+
+    # `format` is "json" or a JSON schema for constrained decoding
+    def _chat(self,
+              model: str,
+              messages: List[Dict[str, str]],
+              options: Optional[Dict[str, Any]],
+              keep_alive: Optional[Union[float, str]],
+              format: Optional[Union[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _stream_chat(self,
+                     model: str,
+                     messages: List[Dict[str, str]],
+                     options: Optional[Dict[str, Any]],
+                     keep_alive: Optional[Union[float, str]],
+                     format: Optional[Union[str, Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def list_models(self, force: bool = False) -> List[str]:
+        """Models served by this backend (cached for model_cache_ttl seconds)"""
+        if self.static_models is not None:
+            return list(self.static_models)
+
+        now = time.time()
+        if not force and now - self._models_cached_at < self.model_cache_ttl:
+            return self._models_cache
+
+        self.probe()
+        self._models_cached_at = now
+        return self._models_cache
+
+    def probe(self) -> bool:
+        """Ask the endpoint for its models now; the outcome is kept in last_probe"""
+        try:
+            models = self._fetch_models()
+        except Exception as e:
+            # The endpoint didn't answer a trivial request - stop routing to
+            # it until retry_after rather than waiting for three failures
+            self._mark_down(e)
+            self.last_probe = {"ok": False, "at": time.time(), "error": str(e)}
+            return False
+        if self.static_models is None:
+            self._models_cache = models
+            self._models_cached_at = time.time()
+        self._mark_healthy()
+        self.last_probe = {"ok": True, "at": time.time(), "error": None}
+        return True
+
+    def resident_models(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Models currently loaded in memory (only Ollama hosts report this)"""
+        return {}
+
+    def is_resident(self, model: str) -> bool:
+        return model in self.resident_models()
+
+    def is_available(self) -> bool:
+        """Healthy, or unhealthy long enough that it deserves another try"""
+        return self.healthy or time.time() - self.unhealthy_since >= self.retry_after
+
+    def estimate_cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """Dollar cost of a request on this backend"""
+        return (prompt_tokens / 1000) * self.input_cost_per_1k + \
+               (completion_tokens / 1000) * self.output_cost_per_1k
+
+    def expected_wait(self) -> float:
+        """Expected seconds until a new request would complete"""
+        # Requests beyond max_concurrency queue behind the ones running
+        queued_rounds = self.in_flight // max(1, self.max_concurrency)
+        return (queued_rounds + 1) * self.ewma_latency
+
+    def chat(self,
+             model: str,
+             messages: List[Dict[str, str]],
+             options: Optional[Dict[str, Any]] = None,
+             keep_alive: Optional[Union[float, str]] = None,
+             format: Optional[Union[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Run one chat completion, tracking queue depth and latency"""
+        with self._lock:
+            self.in_flight += 1
+            self.total_requests += 1
+
+        start_time = time.time()
+        try:
+            result = self._chat(model, messages, options, keep_alive, format)
+            elapsed = time.time() - start_time
+            with self._lock:
+                self.ewma_latency = 0.7 * self.ewma_latency + 0.3 * elapsed
+            self._mark_healthy()
+            result['response_time'] = elapsed
+            result['backend'] = self.name
+            return result
+        except Exception as e:
+            self._mark_error(e)
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stream_chat(self,
+                    model: str,
+                    messages: List[Dict[str, str]],
+                    options: Optional[Dict[str, Any]] = None,
+                    keep_alive: Optional[Union[float, str]] = None,
+                    format: Optional[Union[str, Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a chat completion as {'content': str, 'done': bool} chunks.
+
+        The final chunk has done=True and carries token counts. Closing the
+        generator early closes the HTTP stream, which aborts the generation
+        on the server.
+        """
+        with self._lock:
+            self.in_flight += 1
+            self.total_requests += 1
+
+        start_time = time.time()
+        try:
+            for chunk in self._stream_chat(model, messages, options, keep_alive, format):
+                if chunk.get('done'):
+                    elapsed = time.time() - start_time
+                    with self._lock:
+                        self.ewma_latency = 0.7 * self.ewma_latency + 0.3 * elapsed
+                    chunk['response_time'] = elapsed
+                    chunk['backend'] = self.name
+                yield chunk
+            self._mark_healthy()
+        except GeneratorExit:
+            # Consumer stopped reading (cancelled job) - not a backend failure
+            raise
+        except Exception as e:
+            self._mark_error(e)
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _mark_healthy(self):
+        self.consecutive_errors = 0
+        self.healthy = True
+
+    def _mark_error(self, error: Exception):
+        with self._lock:
+            self.total_errors += 1
+            self.consecutive_errors += 1
+            self.last_error = str(error)
+            if self.consecutive_errors >= 3:
+                self.healthy = False
+                self.unhealthy_since = time.time()
+
+    def _mark_down(self, error: Exception):
+        with self._lock:
+            self.total_errors += 1
+            self.consecutive_errors += 1
+            self.last_error = str(error)
+            self.healthy = False
+            self.unhealthy_since = time.time()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-backend metrics"""
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "premium": self.premium,
+            "healthy": self.healthy,
+            "last_probe": self.last_probe,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "ewma_latency": round(self.ewma_latency, 3),
+            "total_requests": self.total_requests,
+            "total_errors": self.total_errors,
+            "last_error": self.last_error,
+            "models": self._models_cache if self.static_models is None else self.static_models,
+            "resident_models": list(self.resident_models().keys())
+        }
+
+
+class OllamaBackend(InferenceBackend):
+    """A single Ollama host"""
+
+    kind = "ollama"
+
+    def __init__(self,
+                 host: Optional[str] = None,
+                 name: Optional[str] = None,
+                 residency_ttl: float = 5.0,
+                 probe_timeout: Optional[float] = None,
+                 timeout: Optional[float] = None,
+                 **kwargs):
+        self.host = (host or os.environ.get("OLLAMA_HOST", "http://localhost:11434")).rstrip("/")
+        if not self.host.startswith("http"):
+            self.host = f"http://{self.host}"
+        super().__init__(name=name or self.host, **kwargs)
+        # Model list and /api/ps must answer quickly - a host that doesn't is
+        # treated as down. Generation may legitimately take minutes.
+        self.probe_timeout = probe_timeout if probe_timeout is not None else float(
+            os.environ.get("OLLAMA_PROBE_TIMEOUT", "3"))
+        self.timeout = timeout if timeout is not None else float(os.environ.get("OLLAMA_TIMEOUT", "600"))
+        self._client = None
+        self.residency_ttl = residency_ttl
+        self._resident: Dict[str, Dict[str, Any]] = {}
+        self._resident_checked_at = 0.0
+
+    @property
+    def client(self):
+        """Ollama client, created on first use"""
+        if self._client is None:
+            # ollama.Client has no timeout by default; connecting must still be quick
+            self._client = ollama.Client(host=self.host, timeout=httpx.Timeout(self.timeout, connect=self.probe_timeout))
+        return self._client
+
+    def list_tags(self) -> Dict[str, Any]:
+        """Raw /api/tags response (short timeout - a host that hangs here is down)"""
+        response = requests.get(f"{self.host}/api/tags", timeout=self.probe_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _fetch_models(self) -> List[str]:
+        return [model['name'] for model in self.list_tags().get('models', [])]
+
+    def resident_models(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Models loaded on this host, from /api/ps (cached for residency_ttl seconds)"""
+        now = time.time()
+        if not force and now - self._resident_checked_at < self.residency_ttl:
+            return self._resident
+
+        self._resident_checked_at = now
+        try:
+            response = requests.get(f"{self.host}/api/ps", timeout=self.probe_timeout)
+            response.raise_for_status()
+            self._resident = {
+                model.get('name', 'unknown'): {
+                    'size': model.get('size', 0),
+                    'size_vram': model.get('size_vram', 0),
+                    'until': model.get('expires_at', 'unknown')
+                }
+                for model in response.json().get('models', [])
+            }
+        except requests.Timeout as e:
+            # Keep the last known residency, but a host that hangs is down
+            self._mark_down(e)
+        except Exception as e:
+            # Keep the last known residency; chat failures drive health
+            self.last_error = f"ps failed: {e}"
+        return self._resident
+
+    def note_resident(self, model: str):
+        """A successful request means the model is now loaded here"""
+        if model not in self._resident:
+            self._resident = dict(self._resident)
+            self._resident[model] = {'size': 0, 'size_vram': 0, 'until': 'unknown'}
+
+    def _chat(self, model, messages, options, keep_alive, format=None) -> Dict[str, Any]:
+        response = self.client.chat(
+            model=model,
+            messages=messages,
+            format=format or '',
+            options=options,
+            keep_alive=keep_alive
+        )
+        self.note_resident(model)
+        # Ollama reports durations in nanoseconds
+        return {
+            'success': True,
+            'response': response['message']['content'],
+            'model': model,
+            'prompt_eval_count': response.get('prompt_eval_count'),
+            'prompt_eval_ms': response.get('prompt_eval_duration', 0) / 1e6,
+            'eval_count': response.get('eval_count'),
+            'eval_ms': response.get('eval_duration', 0) / 1e6,
+            'load_ms': response.get('load_duration', 0) / 1e6
+        }
+
+
+    def _stream_chat(self, model, messages, options, keep_alive, format=None) -> Iterator[Dict[str, Any]]:
+        stream = self.client.chat(
+            model=model,
+            messages=messages,
+            format=format or '',
+            options=options,
+            keep_alive=keep_alive,
+            stream=True
+        )
+        try:
+            for part in stream:
+                chunk = {'content': part.get('message', {}).get('content', ''), 'done': part.get('done', False)}
+                if chunk['done']:
+                    self.note_resident(model)
+                    chunk.update({
+                        'prompt_eval_count': part.get('prompt_eval_count'),
+                        'prompt_eval_ms': part.get('prompt_eval_duration', 0) / 1e6,
+                        'eval_count': part.get('eval_count'),
+                        'eval_ms': part.get('eval_duration', 0) / 1e6,
+                        'load_ms': part.get('load_duration', 0) / 1e6
+                    })
+                yield chunk
+        finally:
+            stream.close()
+
+
+class OpenAICompatibleBackend(InferenceBackend):
+    """Any server speaking the OpenAI /v1/chat/completions protocol"""
+
+    kind = "openai"
+
+    def __init__(self,
+                 base_url: str,
+                 name: Optional[str] = None,
+                 api_key: Optional[str] = None,
+                 timeout: float = 120.0,
+                 **kwargs):
+        self.base_url = base_url.rstrip("/")
+        super().__init__(name=name or self.base_url, **kwargs)
+        self.timeout = timeout
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    @staticmethod
+    def _payload(model: str,
+                 messages: List[Dict[str, str]],
+                 options: Optional[Dict[str, Any]],
+                 format: Optional[Union[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"model": model, "messages": messages}
+        options = options or {}
+        # Map the Ollama option names we use onto their OpenAI equivalents
+        if "temperature" in options:
+            payload["temperature"] = options["temperature"]
+        if "num_predict" in options:
+            payload["max_tokens"] = options["num_predict"]
+        if format == "json":
+            payload["response_format"] = {"type": "json_object"}
+        elif isinstance(format, dict):
+            payload["response_format"] = {"type": "json_schema", "json_schema": {"name": "extraction", "schema": format}}
+        return payload
+
+    def _fetch_models(self) -> List[str]:
+        response = self.session.get(f"{self.base_url}/v1/models", timeout=10)
+        response.raise_for_status()
+        return [model["id"] for model in response.json().get("data", [])]
+
+    def _chat(self, model, messages, options, keep_alive, format=None) -> Dict[str, Any]:
+        payload = self._payload(model, messages, options, format)
+
+        response = self.session.post(
+            f"{self.base_url}/v1/chat/completions",
+            json=payload,
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        usage = data.get("usage", {})
+        return {
+            'success': True,
+            'response': data["choices"][0]["message"]["content"],
+            'model': model,
+            'prompt_eval_count': usage.get("prompt_tokens"),
+            'eval_count': usage.get("completion_tokens")
+        }
+
+
+    def _stream_chat(self, model, messages, options, keep_alive, format=None) -> Iterator[Dict[str, Any]]:
+        payload = self._payload(model, messages, options, format)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+
+        response = self.session.post(
+            f"{self.base_url}/v1/chat/completions",
+            json=payload,
+            timeout=self.timeout,
+            stream=True
+        )
+        try:
+            response.raise_for_status()
+            usage: Dict[str, Any] = {}
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                usage = event.get("usage") or usage
+                for choice in event.get("choices", []):
+                    content = choice.get("delta", {}).get("content")
+                    if content:
+                        yield {'content': content, 'done': False}
+            yield {
+                'content': '',
+                'done': True,
+                'prompt_eval_count': usage.get("prompt_tokens"),
+                'eval_count': usage.get("completion_tokens")
+            }
+        finally:
+            response.close()
+
+
+class CostMeter:
+    """
+    Meters premium backend spend against daily and monthly hard caps.
+
+    A request reserves its worst-case cost before it is sent and settles it
+    with the actual cost afterwards, so concurrent requests can't all pass
+    the check and overshoot the cap together. With a SharedState, spend and
+    reservations are kept in SQLite so the caps hold across all API worker
+    and research worker processes.
+    """
+
+    def __init__(self, cost_tracking: Dict[str, float], shared_state=None):
+        # Shared with ModelConductor.cost_tracking so analytics see live numbers
+        self.cost_tracking = cost_tracking
+        self.shared_state = shared_state
+        self.daily_spend: Dict[str, float] = {}
+        self.monthly_spend: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _spent(self, day: str, month: str) -> Tuple[float, float]:
+        if self.shared_state is not None:
+            return self.shared_state.get("spend", day), self.shared_state.get("spend", month)
+        return self.daily_spend.get(day, 0.0), self.monthly_spend.get(month, 0.0)
+
+    @staticmethod
+    def _keys() -> Tuple[str, str]:
+        now = datetime.now()
+        return now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+
+    def can_spend(self, amount: float) -> bool:
+        """Would spending `amount` stay within both caps?"""
+        day, month = self._keys()
+        with self._lock:
+            daily, monthly = self._spent(day, month)
+            return (daily + amount <= self.cost_tracking["daily_limit"] and
+                    monthly + amount <= self.cost_tracking["monthly_limit"])
+
+    def reserve(self, amount: float) -> Optional[Tuple[str, str, float]]:
+        """
+        Count `amount` as spent if both caps allow it; returns the reservation
+        to settle() once the actual cost is known, or None when over budget
+        """
+        day, month = self._keys()
+        limits = {day: self.cost_tracking["daily_limit"], month: self.cost_tracking["monthly_limit"]}
+        with self._lock:
+            if self.shared_state is not None:
+                if not self.shared_state.add_within("spend", limits, amount):
+                    return None
+            else:
+                daily, monthly = self._spent(day, month)
+                if daily + amount > limits[day] or monthly + amount > limits[month]:
+                    return None
+                self.daily_spend[day] = daily + amount
+                self.monthly_spend[month] = monthly + amount
+        self.refresh()
+        return day, month, amount
+
+    def settle(self, reservation: Tuple[str, str, float], actual: float):
+        """Replace a reservation with the actual cost (0 releases it)"""
+        day, month, reserved = reservation
+        self._add(day, month, actual - reserved)
+
+    def record(self, amount: float):
+        """Record actual spend that was not reserved"""
+        if amount > 0:
+            day, month = self._keys()
+            self._add(day, month, amount)
+
+    def _add(self, day: str, month: str, amount: float):
+        if amount == 0:
+            return
+        with self._lock:
+            if self.shared_state is not None:
+                self.shared_state.incr("spend", day, amount)
+                self.shared_state.incr("spend", month, amount)
+            else:
+                self.daily_spend[day] = self.daily_spend.get(day, 0.0) + amount
+                self.monthly_spend[month] = self.monthly_spend.get(month, 0.0) + amount
+        self.refresh()
+
+    def refresh(self):
+        """Pull spend recorded by other processes into cost_tracking"""
+        day, month = self._keys()
+        daily, monthly = self._spent(day, month)
+        self.cost_tracking["current_spend"] = round(monthly, 6)
+        self.cost_tracking["daily_spend"] = round(daily, 6)
+
+    def remaining(self) -> Dict[str, float]:
+        """Remaining daily and monthly budget"""
+        day, month = self._keys()
+        daily, monthly = self._spent(day, month)
+        return {
+            "daily": self.cost_tracking["daily_limit"] - daily,
+            "monthly": self.cost_tracking["monthly_limit"] - monthly
+        }
+
+
+class BackendRouter:
+    """
+    Routes each request across backends.
+
+    Ollama hosts that already have the model resident are preferred (no load
+    time), using least-outstanding-requests among them; failures fail over
+    to the next candidate. When every candidate fails to load the model for
+    lack of memory, on_memory_error may name a smaller model to retry with.
+    """
+
+    def __init__(self, backends: List[InferenceBackend], cost_meter: CostMeter):
+        self.backends = backends
+        self.cost_meter = cost_meter
+        # (backend, model, error) -> replacement model or None; set by the conductor
+        self.on_memory_error: Optional[Callable[[InferenceBackend, str, Exception], Optional[str]]] = None
+        self.memory_retries = int(os.environ.get("MEMORY_RETRIES", "2"))
+
+    def _reserve(self, backend: InferenceBackend, model: str, prompt_tokens: int, max_output: int):
+        """Reserve a premium request's worst-case cost (None for free backends); raises when over budget"""
+        if not backend.premium:
+            return None
+        worst_case = backend.estimate_cost(prompt_tokens, max_output if max_output > 0 else 4096)
+        reservation = self.cost_meter.reserve(worst_case)
+        if reservation is None:
+            raise BudgetExceededError(f"Premium budget exhausted for model {model}")
+        return reservation
+
+    def _memory_fallback(self, backend: InferenceBackend, model: str, error: Exception) -> Optional[str]:
+        if self.on_memory_error is None or not is_memory_error(error):
+            return None
+        return self.on_memory_error(backend, model, error)
+
+    def available_models(self) -> List[str]:
+        """Union of models across available backends"""
+        models: List[str] = []
+        for backend in self.backends:
+            if not backend.is_available():
+                continue
+            for model in backend.list_models():
+                if model not in models:
+                    models.append(model)
+        return models
+
+    def candidates_for(self,
+                       model: str,
+                       estimated_cost_tokens: int = 0,
+                       prefer_backend: Optional[str] = None) -> List[InferenceBackend]:
+        """Backends able to serve `model`, best first"""
+        candidates = []
+        for backend in self.backends:
+            if not backend.is_available() or model not in backend.list_models():
+                continue
+            if backend.premium:
+                estimate = backend.estimate_cost(estimated_cost_tokens, estimated_cost_tokens)
+                if not self.cost_meter.can_spend(estimate):
+                    continue
+            candidates.append(backend)
+
+        # Tiers: free hosts with the model resident and spare slots, then free
+        # hosts that would have to load it, then premium overflow, then
+        # saturated free hosts (queueing). Within a tier: least outstanding
+        # requests, then observed latency.
+        def sort_key(backend: InferenceBackend):
+            saturated = backend.in_flight >= backend.max_concurrency
+            if backend.name == prefer_backend and not saturated:
+                tier = -1  # session affinity keeps the KV cache warm
+            elif backend.premium:
+                tier = 2
+            elif saturated:
+                tier = 3
+            elif backend.is_resident(model):
+                tier = 0
+            else:
+                tier = 1
+            return (tier, backend.in_flight, backend.expected_wait())
+
+        candidates.sort(key=sort_key)
+        return candidates
+
+    def chat(self,
+             model: str,
+             messages: List[Dict[str, str]],
+             options: Optional[Dict[str, Any]] = None,
+             keep_alive: Optional[Union[float, str]] = None,
+             prefer_backend: Optional[str] = None,
+             format: Optional[Union[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Dispatch a chat request, failing over to the next backend on error"""
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        max_output = (options or {}).get("num_predict", 1024)
+        requested = model
+
+        for attempt in range(self.memory_retries + 1):
+            candidates = self.candidates_for(model, prompt_tokens + max_output, prefer_backend)
+
+            if not candidates:
+                if any(b.premium and model in b.list_models() for b in self.backends):
+                    raise BudgetExceededError(f"Premium budget exhausted for model {model}")
+                raise NoBackendAvailableError(f"No healthy backend serves model {model}")
+
+            last_error: Optional[Exception] = None
+            replacement = None
+            for backend in candidates:
+                try:
+                    reservation = self._reserve(backend, model, prompt_tokens, max_output)
+                except BudgetExceededError as e:
+                    last_error = e
+                    continue
+                try:
+                    result = backend.chat(model, messages, options, keep_alive, format)
+                except Exception as e:
+                    if reservation is not None:
+                        self.cost_meter.settle(reservation, 0.0)
+                    last_error = e
+                    replacement = self._memory_fallback(backend, model, e) or replacement
+                    continue
+
+                if reservation is not None:
+                    cost = backend.estimate_cost(result.get('prompt_eval_count') or prompt_tokens,
+                                                 result.get('eval_count') or 0)
+                    self.cost_meter.settle(reservation, cost)
+                    result['cost'] = cost
+                if model != requested:
+                    result['downshifted_from'] = requested
+                return result
+
+            if replacement is None or attempt == self.memory_retries:
+                break
+            model = replacement
+
+        if isinstance(last_error, BudgetExceededError):
+            raise last_error
+        raise NoBackendAvailableError(f"All backends failed for model {model}: {last_error}")
+
+    def stream_chat(self,
+                    model: str,
+                    messages: List[Dict[str, str]],
+                    options: Optional[Dict[str, Any]] = None,
+                    keep_alive: Optional[Union[float, str]] = None,
+                    prefer_backend: Optional[str] = None,
+                    format: Optional[Union[str, Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """Stream a chat request; fails over only if nothing has been streamed yet"""
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        max_output = (options or {}).get("num_predict", 1024)
+        requested = model
+
+        for attempt in range(self.memory_retries + 1):
+            candidates = self.candidates_for(model, prompt_tokens + max_output, prefer_backend)
+
+            if not candidates:
+                if any(b.premium and model in b.list_models() for b in self.backends):
+                    raise BudgetExceededError(f"Premium budget exhausted for model {model}")
+                raise NoBackendAvailableError(f"No healthy backend serves model {model}")
+
+            last_error: Optional[Exception] = None
+            replacement = None
+            for backend in candidates:
+                try:
+                    reservation = self._reserve(backend, model, prompt_tokens, max_output)
+                except BudgetExceededError as e:
+                    last_error = e
+                    continue
+                started = False
+                streamed_chars = 0
+                cost = None
+                try:
+                    for chunk in backend.stream_chat(model, messages, options, keep_alive, format):
+                        started = True
+                        streamed_chars += len(chunk.get('content', ''))
+                        if chunk.get('done'):
+                            chunk['model'] = model
+                            if model != requested:
+                                chunk['downshifted_from'] = requested
+                            if reservation is not None:
+                                cost = backend.estimate_cost(chunk.get('prompt_eval_count') or prompt_tokens,
+                                                             chunk.get('eval_count') or streamed_chars // 4)
+                                chunk['cost'] = cost
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started:
+                        raise
+                    last_error = e
+                    replacement = self._memory_fallback(backend, model, e) or replacement
+                finally:
+                    if reservation is not None:
+                        # A stream cut short is billed for what was generated
+                        if cost is None:
+                            cost = backend.estimate_cost(prompt_tokens, streamed_chars // 4) if started else 0.0
+                        self.cost_meter.settle(reservation, cost)
+
+            if replacement is None or attempt == self.memory_retries:
+                break
+            model = replacement
+
+        if isinstance(last_error, BudgetExceededError):
+            raise last_error
+        raise NoBackendAvailableError(f"All backends failed for model {model}: {last_error}")
+
+    def loaded_models(self) -> List[Dict[str, Any]]:
+        """Resident models across all hosts, one entry per (host, model)"""
+        loaded = []
+        for backend in self.backends:
+            for name, info in backend.resident_models().items():
+                loaded.append({'name': name, 'host': backend.name, **info})
+        return loaded
+
+    def probe(self, max_age: float = 0.0, kind: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Reachability of each backend (of `kind`), probing those not probed
+        in the last `max_age` seconds; backends never probed are probed now
+        """
+        now = time.time()
+        results = {}
+        for backend in self.backends:
+            if kind is not None and backend.kind != kind:
+                continue
+            if backend.last_probe is None or now - backend.last_probe["at"] > max_age:
+                backend.probe()
+            results[backend.name] = backend.last_probe["ok"]
+        return results
+
+    def ollama_backends(self) -> List["OllamaBackend"]:
+        return [b for b in self.backends if isinstance(b, OllamaBackend)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Metrics for every backend plus remaining budget"""
+        return {
+            "backends": [backend.get_stats() for backend in self.backends],
+            "budget_remaining": self.cost_meter.remaining()
+        }
+
+
+async def iterate_in_thread(iterator_factory: Callable[[], Iterator[Any]]) -> AsyncIterator[Any]:
+    """
+    Drive a blocking iterator (e.g. a model stream) from a worker thread.
+
+    If the consuming task is cancelled, the thread stops at the next item and
+    closes the iterator, which closes the underlying HTTP stream.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    finished = object()
+
+    def post(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stop.set()  # event loop already closed
+
+    def worker():
+        iterator = iterator_factory()
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                post(("item", item))
+        except Exception as e:
+            post(("error", e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            post(("finished", finished))
+
+    loop.run_in_executor(None, worker)
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "finished":
+                break
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+
+
+def create_backend(config: Dict[str, Any]) -> InferenceBackend:
+    """Build a backend from one config entry"""
+    config = dict(config)
+    kind = config.pop("kind", "ollama")
+    if kind == "ollama":
+        return OllamaBackend(**config)
+    if kind == "openai":
+        if "api_key_env" in config:
+            config["api_key"] = os.environ.get(config.pop("api_key_env"))
+        return OpenAICompatibleBackend(**config)
+    raise ValueError(f"Unknown backend kind: {kind}")
+
+
+def load_backends(config_path: Optional[str] = None) -> List[InferenceBackend]:
+    """
+    Load backends from a JSON config file (INFERENCE_BACKENDS_CONFIG).
+
+    Example:
+        [
+            {"kind": "ollama", "host": "http://10.0.0.5:11434"},
+            {"kind": "openai", "base_url": "http://localhost:8080", "name": "llama.cpp"},
+            {"kind": "openai", "base_url": "https://api.example.com", "premium": true,
+             "api_key_env": "EXAMPLE_API_KEY", "input_cost_per_1k": 0.0005,
+             "output_cost_per_1k": 0.0015, "models": ["example-large"]}
+        ]
+
+    Without a config file, one Ollama backend is created per host in
+    OLLAMA_HOSTS (comma-separated), falling back to OLLAMA_HOST/localhost.
+    """
+    config_path = config_path or os.environ.get("INFERENCE_BACKENDS_CONFIG")
+    if not config_path:
+        hosts = [h.strip() for h in os.environ.get("OLLAMA_HOSTS", "").split(",") if h.strip()]
+        if not hosts:
+            return [OllamaBackend()]
+        return [OllamaBackend(host=host) for host in hosts]
+
+    with open(config_path) as f:
+        configs = json.load(f)
+    return [create_backend(config) for config in configs]
@@ -0,0 +1,201 @@
+# src/job_events.py
+"""
+Server-sent events for research jobs
+Each event is serialized once when published and the encoded frame is fanned
+out to every subscriber, so streaming clients cost no per-client JSON work
+"""
+
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+TERMINAL_EVENTS = {"completed", "failed", "cancelled", "timed_out"}
+
+
+def format_sse(event_id: int, event: str, data: Any) -> str:
+    """Encode one SSE frame"""
+    payload = json.dumps(jsonable_encoder(data), separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+def job_status_event(job_id: str, job: Dict[str, Any], results: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+    """Event name and payload describing a job's current state"""
+    event = job["status"] if job["status"] in TERMINAL_EVENTS else "status"
+    data = {
+        "job_id": job_id,
+        "status": job["status"],
+        "stage": job.get("stage"),
+        "progress": job["progress"]
+    }
+    if job["status"] == "completed" and results is not None:
+        data["results"] = results
+    if job.get("error"):
+        data["error"] = job["error"]
+    return event, data
+
+
+class JobEventStream:
+    """Event history and live subscribers for one job"""
+
+    def __init__(self, max_history: int):
+        self.max_history = max_history
+        self.history: List[Tuple[int, str]] = []
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.next_id = 1
+        self.closed = False
+        self.closed_at: Optional[float] = None
+
+
+class JobEventBus:
+    """Publishes job events and serves them to SSE subscribers"""
+
+    def __init__(self, max_history: int = 500, max_jobs: int = 1000, keepalive: float = 15.0):
+        self.max_history = max_history
+        self.max_jobs = max_jobs
+        self.keepalive = keepalive
+        self.streams: Dict[str, JobEventStream] = {}
+
+    def _stream(self, job_id: str) -> JobEventStream:
+        stream = self.streams.get(job_id)
+        if stream is None:
+            self._prune()
+            stream = JobEventStream(self.max_history)
+            self.streams[job_id] = stream
+        return stream
+
+    def _prune(self):
+        """Forget the oldest finished streams once we track too many jobs"""
+        if len(self.streams) < self.max_jobs:
+            return
+        finished = sorted(
+            (s.closed_at, job_id) for job_id, s in self.streams.items()
+            if s.closed and not s.subscribers
+        )
+        for _, job_id in finished[:max(1, len(finished) // 4)]:
+            del self.streams[job_id]
+
+    def publish(self, job_id: str, event: str, data: Any):
+        """Publish an event; terminal events close the stream"""
+        stream = self._stream(job_id)
+        if stream.closed:
+            return
+
+        event_id = stream.next_id
+        stream.next_id += 1
+        frame = format_sse(event_id, event, data)
+
+        stream.history.append((event_id, frame))
+        if len(stream.history) > stream.max_history:
+            del stream.history[0]
+
+        for queue in stream.subscribers:
+            queue.put_nowait(frame)
+
+        if event in TERMINAL_EVENTS:
+            stream.closed = True
+            stream.closed_at = time.time()
+            for queue in stream.subscribers:
+                queue.put_nowait(None)
+
+    async def subscribe(self, job_id: str, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield SSE frames: replay history after last_event_id, then live events"""
+        stream = self._stream(job_id)
+        try:
+            after = int(last_event_id) if last_event_id else 0
+        except ValueError:
+            after = 0
+
+        # Tell EventSource clients how long to wait before reconnecting
+        yield "retry: 3000\n\n"
+
+        for event_id, frame in list(stream.history):
+            if event_id > after:
+                yield frame
+        if stream.closed:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        stream.subscribers.add(queue)
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            stream.subscribers.discard(queue)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "tracked_jobs": len(self.streams),
+            "subscribers": sum(len(s.subscribers) for s in self.streams.values())
+        }
+
+
+class ReportSectionTracker:
+    """
+    Splits a streaming report into sections on markdown headings,
+    numbered headings ("1. Executive Summary") or bold headings.
+    """
+
+    HEADING = re.compile(r"^\s*(#{1,6}\s+.+|\d+\.\s+\*{0,2}[A-Z][^\n]{0,80}|\*\*[^*\n]{2,80}\*\*:?)\s*$")
+
+    def __init__(self, min_interval: float = 0.5):
+        self.min_interval = min_interval
+        self.sections: List[Dict[str, Any]] = []
+        self._buffer = ""
+        self._last_emit = 0.0
+
+    def _current(self) -> Dict[str, Any]:
+        if not self.sections:
+            self.sections.append({"index": 0, "title": "", "content": "", "complete": False})
+        return self.sections[-1]
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Add streamed text; return section updates worth publishing"""
+        updates = []
+        self._buffer += text
+
+        # Only complete lines can be classified as headings
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            if self.HEADING.match(line):
+                current = self._current()
+                if current["content"].strip() or current["title"]:
+                    current["complete"] = True
+                    updates.append(dict(current))
+                    self.sections.append({
+                        "index": len(self.sections),
+                        "title": line.strip().strip("#* ").rstrip(":*"),
+                        "content": "",
+                        "complete": False
+                    })
+                else:
+                    current["title"] = line.strip().strip("#* ").rstrip(":*")
+            else:
+                self._current()["content"] += line + "\n"
+
+        # Throttled partial update for the section being written
+        now = time.time()
+        if not updates and now - self._last_emit >= self.min_interval and self.sections:
+            current = self.sections[-1]
+            updates.append(dict(current, content=current["content"] + self._buffer))
+        if updates:
+            self._last_emit = now
+        return updates
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Flush the trailing partial line and close the last section"""
+        current = self._current()
+        current["content"] += self._buffer
+        self._buffer = ""
+        current["complete"] = True
+        return [dict(current)]
@@ -0,0 +1,300 @@
+# src/job_store.py
+"""
+Durable research job store (SQLite)
+Persists job records, results and per-stage checkpoints so a restarted
+server resumes in-flight jobs from the last completed stage. Also holds the
+work queue and event log shared between the API and research workers
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from job_events import job_status_event
+
+DATETIME_FIELDS = ("created_at", "completed_at", "timestamp")
+
+
+def _encode(data: Any) -> str:
+    return json.dumps(jsonable_encoder(data))
+
+
+def _decode(text: Optional[str]) -> Any:
+    if text is None:
+        return None
+    data = json.loads(text)
+    if isinstance(data, dict):
+        for field in DATETIME_FIELDS:
+            if isinstance(data.get(field), str):
+                try:
+                    data[field] = datetime.fromisoformat(data[field])
+                except ValueError:
+                    pass
+    return data
+
+
+class JobStore:
+    """SQLite-backed store for job records, results and stage checkpoints"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("JOB_STORE_PATH", os.path.join("data", "jobs.db"))
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                record TEXT NOT NULL,
+                request TEXT,
+                results TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, stage)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+            CREATE TABLE IF NOT EXISTS job_queue (
+                job_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                claimed_by TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+        """)
+        columns = [row[1] for row in self._conn().execute("PRAGMA table_info(jobs)")]
+        if "cancel_requested" not in columns:
+            self._conn().execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+
+    def save_job(self, job: Dict[str, Any], request: Optional[Dict[str, Any]] = None):
+        """
+        Insert or update a job record (the original request is kept once stored).
+
+        A cancelled job is never overwritten, so a worker finishing a stage
+        cannot resurrect a job the client has just cancelled.
+        """
+        self._conn().execute(
+            """
+            INSERT INTO jobs (job_id, status, record, request, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (job_id) DO UPDATE SET
+                status = excluded.status,
+                record = excluded.record,
+                request = COALESCE(excluded.request, jobs.request),
+                updated_at = excluded.updated_at
+            WHERE jobs.status != 'cancelled'
+            """,
+            (job["job_id"], job["status"], _encode(job),
+             _encode(request) if request is not None else None, time.time())
+        )
+
+    def save_results(self, job_id: str, results: Dict[str, Any]):
+        self._conn().execute(
+            "UPDATE jobs SET results = ?, updated_at = ? WHERE job_id = ?",
+            (_encode(results), time.time(), job_id)
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT record, request, results FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"record": _decode(row[0]), "request": _decode(row[1]), "results": _decode(row[2])}
+
+    def load_jobs(self) -> List[Dict[str, Any]]:
+        """All stored jobs, oldest first"""
+        rows = self._conn().execute(
+            "SELECT record, request, results FROM jobs ORDER BY rowid"
+        ).fetchall()
+        return [{"record": _decode(r[0]), "request": _decode(r[1]), "results": _decode(r[2])} for r in rows]
+
+    def job_ids(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT job_id FROM jobs")]
+
+    def save_checkpoint(self, job_id: str, stage: str, data: Any):
+        """Record that `stage` finished, with whatever later stages need from it"""
+        self._conn().execute(
+            "INSERT OR REPLACE INTO checkpoints (job_id, stage, data, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, stage, _encode(data), time.time())
+        )
+
+    def load_checkpoints(self, job_id: str) -> Dict[str, Any]:
+        rows = self._conn().execute(
+            "SELECT stage, data FROM checkpoints WHERE job_id = ? ORDER BY created_at", (job_id,)
+        ).fetchall()
+        return {stage: _decode(data) for stage, data in rows}
+
+    def clear_checkpoints(self, job_id: str):
+        self._conn().execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+    # Cancellation flag (shared with out-of-process workers)
+    def request_cancel(self, job_id: str):
+        self._conn().execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        row = self._conn().execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    # Work queue
+    def enqueue(self, job_id: str):
+        """Queue a job for the research workers"""
+        self._conn().execute(
+            "INSERT OR REPLACE INTO job_queue (job_id, state, attempts, enqueued_at) VALUES (?, 'queued', 0, ?)",
+            (job_id, time.time())
+        )
+
+    def claim(self, worker_id: str, lease_seconds: float = 60.0, max_attempts: int = 3) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Atomically claim the oldest queued job, or one whose lease expired
+        (its worker died). Returns (job_id, request) or None. Jobs that are
+        due again but have used up max_attempts are marked failed instead.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            exhausted = conn.execute(
+                """
+                SELECT q.job_id, j.record FROM job_queue q JOIN jobs j ON j.job_id = q.job_id
+                WHERE q.attempts >= ?
+                  AND (q.state = 'queued' OR (q.state = 'claimed' AND q.lease_expires < ?))
+                """,
+                (max_attempts, now)
+            ).fetchall()
+            for job_id, record in exhausted:
+                self._fail_exhausted(conn, job_id, _decode(record), max_attempts, now)
+
+            row = conn.execute(
+                """
+                SELECT q.job_id, j.request FROM job_queue q JOIN jobs j ON j.job_id = q.job_id
+                WHERE q.attempts < ?
+                  AND (q.state = 'queued' OR (q.state = 'claimed' AND q.lease_expires < ?))
+                ORDER BY q.enqueued_at
+                LIMIT 1
+                """,
+                (max_attempts, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                """
+                UPDATE job_queue SET state = 'claimed', claimed_by = ?, lease_expires = ?,
+                    attempts = attempts + 1
+                WHERE job_id = ?
+                """,
+                (worker_id, now + lease_seconds, row[0])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row[0], _decode(row[1])
+
+    def _fail_exhausted(self, conn: sqlite3.Connection, job_id: str, job: Dict[str, Any], attempts: int, now: float):
+        """Fail a job every claim of which ended without a result, and tell the API"""
+        job.update(status="failed", error=f"Job abandoned after {attempts} attempts (worker crashed or lost its lease)")
+        job["version"] = job.get("version", 0) + 1
+        updated = conn.execute(
+            "UPDATE jobs SET status = 'failed', record = ?, updated_at = ? WHERE job_id = ? AND status != 'cancelled'",
+            (_encode(job), now, job_id)
+        ).rowcount
+        conn.execute("DELETE FROM job_queue WHERE job_id = ?", (job_id,))
+        if not updated:
+            return
+        event, data = job_status_event(job_id, job)
+        conn.execute(
+            "INSERT INTO job_events (job_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, event, _encode(data), now)
+        )
+
+    def extend_lease(self, job_id: str, worker_id: str, lease_seconds: float = 60.0) -> bool:
+        """Heartbeat: keep the claim alive. False if another worker took it over"""
+        cursor = self._conn().execute(
+            "UPDATE job_queue SET lease_expires = ? WHERE job_id = ? AND claimed_by = ?",
+            (time.time() + lease_seconds, job_id, worker_id)
+        )
+        return cursor.rowcount > 0
+
+    def release(self, job_id: str, worker_id: str):
+        """Give a claimed job back to the queue (graceful worker shutdown)"""
+        self._conn().execute(
+            "UPDATE job_queue SET state = 'queued', claimed_by = NULL, lease_expires = NULL "
+            "WHERE job_id = ? AND claimed_by = ?",
+            (job_id, worker_id)
+        )
+
+    def finish(self, job_id: str):
+        """Remove a job from the queue once it reached a terminal state"""
+        self._conn().execute("DELETE FROM job_queue WHERE job_id = ?", (job_id,))
+
+    def queue_stats(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT state, COUNT(*) FROM job_queue GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+    def tier_load(self) -> Dict[str, Tuple[int, int]]:
+        """(waiting, running) queued jobs per complexity tier; expired leases count as waiting"""
+        rows = self._conn().execute(
+            """
+            SELECT COALESCE(json_extract(j.request, '$.complexity'), 'standard'),
+                   SUM(q.state = 'queued' OR q.lease_expires < ?),
+                   SUM(q.state = 'claimed' AND q.lease_expires >= ?)
+            FROM job_queue q JOIN jobs j ON j.job_id = q.job_id
+            GROUP BY 1
+            """,
+            (time.time(), time.time())
+        ).fetchall()
+        return {tier: (waiting, running) for tier, waiting, running in rows}
+
+    # Event log (workers append, the API tails it for SSE subscribers)
+    def append_event(self, job_id: str, event: str, data: Any):
+        self._conn().execute(
+            "INSERT INTO job_events (job_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, event, _encode(data), time.time())
+        )
+
+    def events_since(self, after_id: int, limit: int = 500) -> List[Tuple[int, str, str, Any]]:
+        rows = self._conn().execute(
+            "SELECT id, job_id, event, data FROM job_events WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit)
+        ).fetchall()
+        return [(row[0], row[1], row[2], json.loads(row[3])) for row in rows]
+
+    def last_event_id(self) -> int:
+        row = self._conn().execute("SELECT MAX(id) FROM job_events").fetchone()
+        return row[0] or 0
+
+    def prune_events(self, older_than: float = 3600.0):
+        self._conn().execute("DELETE FROM job_events WHERE created_at < ?", (time.time() - older_than,))
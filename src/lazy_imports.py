@@ -0,0 +1,38 @@
+# src/lazy_imports.py
+"""
+Deferred imports for heavy modules
+`lazy_import("ollama")` returns a module whose code only runs on first
+attribute access, so importing the API server doesn't pay for clients,
+HTTP stacks or ML frameworks it may never touch
+"""
+
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return `name` as a module that is executed on first attribute access"""
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def is_loaded(name: str) -> bool:
+    """True once a module (lazy or not) has actually been executed"""
+    module = sys.modules.get(name)
+    if module is None:
+        return False
+    # LazyLoader swaps the module class back to ModuleType after loading
+    return type(module) is not importlib.util._LazyModule
@@ -0,0 +1,304 @@
+# src/load_test.py
+"""
+Open-loop load test for the API
+Requests arrive on a Poisson schedule at fixed rates whether or not earlier
+ones have finished (so queueing shows up as latency, not as a slower client).
+Drives /chat, /research (submit, then poll to completion) and /health and
+reports throughput and latency percentiles per endpoint. With --spawn it
+starts the fake Ollama server and the API itself in a temporary directory,
+so it runs on any Linux box without Ollama; --max-p95-ms/--max-error-rate
+turn it into a CI check (exit status 1 on failure)
+
+Usage (from src/):
+    python load_test.py --spawn --duration 30 --chat-rate 2 --research-rate 0.2 --health-rate 5
+    python load_test.py --api http://127.0.0.1:8000 --chat-rate 1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+TERMINAL_STATUSES = ("completed", "failed", "cancelled", "timed_out")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+class Stack:
+    """Fake Ollama plus the API under uvicorn, with all state in a temporary directory"""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="load_test_")
+        self.processes: List[subprocess.Popen] = []
+        self.ollama_url = ""
+        self.api_url = ""
+
+    def start(self) -> str:
+        ollama_port, api_port = _free_port(), _free_port()
+        self.ollama_url = f"http://127.0.0.1:{ollama_port}"
+        self.api_url = f"http://127.0.0.1:{api_port}"
+
+        fake = subprocess.Popen(
+            [sys.executable, os.path.join(SRC_DIR, "fake_ollama.py"), "--port", str(ollama_port),
+             "--tokens-per-second", str(self.args.tokens_per_second), "--ttft-ms", str(self.args.ttft_ms),
+             "--load-seconds-per-gb", str(self.args.load_seconds_per_gb), "--parallel", str(self.args.parallel),
+             "--num-predict", str(self.args.num_predict), "--time-scale", str(self.args.time_scale)],
+            stdout=subprocess.DEVNULL
+        )
+        self.processes.append(fake)
+        _wait_until_up(f"{self.ollama_url}/api/version", fake)
+
+        env = {
+            **os.environ,
+            "OLLAMA_HOST": self.ollama_url,
+            # Every request comes from one client address here
+            "RATE_LIMIT_PER_MINUTE": "1000000",
+            "RATE_LIMIT_BURST": "1000000",
+            "ARTIFACT_GC_INTERVAL": "0"
+        }
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api_server:app", "--app-dir", SRC_DIR,
+             "--port", str(api_port), "--log-level", "warning", "--workers", str(self.args.api_workers)],
+            cwd=self.workdir, env=env, stdout=subprocess.DEVNULL
+        )
+        self.processes.append(api)
+        _wait_until_up(f"{self.api_url}/health", api)
+        return self.api_url
+
+    def fake_stats(self) -> Dict[str, Any]:
+        try:
+            return httpx.get(f"{self.ollama_url}/fake/stats", timeout=2).json()
+        except httpx.HTTPError:
+            return {}
+
+    def stop(self):
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class LoadTest:
+    """Fires requests on independent Poisson schedules and records each outcome"""
+
+    def __init__(self, api_url: str, duration: float, rates: Dict[str, float], seed: int = 0,
+                 research_timeout: float = 300.0, unique_prompts: bool = True):
+        self.api_url = api_url.rstrip("/")
+        self.duration = duration
+        self.rates = rates
+        self.random = random.Random(seed)
+        self.research_timeout = research_timeout
+        self.unique_prompts = unique_prompts
+        # endpoint -> [{"status", "ok", "latency"}]
+        self.results: Dict[str, List[Dict[str, Any]]] = {name: [] for name in rates}
+        self.results["research_submit"] = []
+
+    async def _timed(self, endpoint: str, coroutine):
+        start_time = time.perf_counter()
+        try:
+            status = await coroutine
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        self.results[endpoint].append({
+            "status": status,
+            "ok": status == 200 or status == "completed",
+            "latency": time.perf_counter() - start_time
+        })
+
+    async def _chat(self, client: httpx.AsyncClient, i: int):
+        message = f"Load test question {i if self.unique_prompts else 0}: what limits local inference speed?"
+        response = await client.post("/chat", json={"message": message})
+        return response.status_code
+
+    async def _health(self, client: httpx.AsyncClient, i: int):
+        response = await client.get("/health")
+        return response.status_code
+
+    async def _research(self, client: httpx.AsyncClient, i: int):
+        """Submit a job and poll it to a terminal state; returns the final job status"""
+        start_time = time.perf_counter()
+        response = await client.post("/research", json={
+            "topic": f"Load test topic {i if self.unique_prompts else 0}",
+            "complexity": "simple",
+            "include_rag": False,
+            "reuse_cached": False
+        })
+        self.results["research_submit"].append({
+            "status": response.status_code,
+            "ok": response.status_code == 200,
+            "latency": time.perf_counter() - start_time
+        })
+        if response.status_code != 200:
+            return response.status_code
+
+        job_id = response.json()["job_id"]
+        etag = None
+        while time.perf_counter() - start_time < self.research_timeout:
+            await asyncio.sleep(0.25)
+            poll = await client.get(f"/research/{job_id}", headers={"If-None-Match": etag} if etag else {})
+            if poll.status_code == 304:
+                continue
+            etag = poll.headers.get("etag")
+            status = poll.json().get("status")
+            if status in TERMINAL_STATUSES:
+                return status
+        return "client_timeout"
+
+    async def _arrivals(self, client: httpx.AsyncClient, endpoint: str, rate: float, pending: List[asyncio.Task]):
+        """Open loop: schedule each request at its arrival time without waiting for earlier ones"""
+        handler = {"chat": self._chat, "research": self._research, "health": self._health}[endpoint]
+        start_time = time.perf_counter()
+        at = self.random.expovariate(rate)
+        i = 0
+        while at < self.duration:
+            delay = start_time + at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pending.append(asyncio.create_task(self._timed(endpoint, handler(client, i))))
+            i += 1
+            at += self.random.expovariate(rate)
+
+    async def run(self) -> float:
+        """Run the schedules, then wait for outstanding requests; returns the wall time"""
+        pending: List[asyncio.Task] = []
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+        async with httpx.AsyncClient(base_url=self.api_url, timeout=self.research_timeout, limits=limits) as client:
+            start_time = time.perf_counter()
+            await asyncio.gather(*(
+                self._arrivals(client, endpoint, rate, pending) for endpoint, rate in self.rates.items() if rate > 0
+            ))
+            await asyncio.gather(*pending)
+            return time.perf_counter() - start_time
+
+    def report(self, wall_seconds: float) -> Dict[str, Dict[str, Any]]:
+        summary = {}
+        for endpoint, results in self.results.items():
+            if not results:
+                continue
+            latencies = [r["latency"] * 1000 for r in results if r["ok"]]
+            statuses: Dict[str, int] = {}
+            for r in results:
+                if not r["ok"]:
+                    statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+            summary[endpoint] = {
+                "requests": len(results),
+                "ok": len(latencies),
+                "error_rate": round(1 - len(latencies) / len(results), 4),
+                "errors": statuses,
+                "throughput_per_s": round(len(latencies) / wall_seconds, 3),
+                "p50_ms": _percentile(latencies, 0.50),
+                "p95_ms": _percentile(latencies, 0.95),
+                "p99_ms": _percentile(latencies, 0.99),
+                "max_ms": max(latencies) if latencies else None
+            }
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the Research Agent API")
+    parser.add_argument("--api", default=None, help="API base URL (default: --spawn a local stack)")
+    parser.add_argument("--spawn", action="store_true", help="Start the fake Ollama server and the API")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of arrivals")
+    parser.add_argument("--chat-rate", type=float, default=1.0, help="/chat requests per second")
+    parser.add_argument("--research-rate", type=float, default=0.1, help="/research jobs per second")
+    parser.add_argument("--health-rate", type=float, default=5.0, help="/health requests per second")
+    parser.add_argument("--same-prompt", action="store_true", help="Identical prompts (exercises coalescing and reuse)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    parser.add_argument("--max-p95-ms", type=json.loads, default=None,
+                        help='Fail if a p95 exceeds its limit, e.g. \'{"chat": 5000, "health": 100}\'')
+    parser.add_argument("--max-error-rate", type=float, default=None, help="Fail if any endpoint's error rate exceeds this")
+    fake = parser.add_argument_group("fake Ollama (with --spawn)")
+    fake.add_argument("--tokens-per-second", type=float, default=40.0)
+    fake.add_argument("--ttft-ms", type=float, default=50.0)
+    fake.add_argument("--load-seconds-per-gb", type=float, default=0.2)
+    fake.add_argument("--parallel", type=int, default=1)
+    fake.add_argument("--num-predict", type=int, default=64)
+    fake.add_argument("--time-scale", type=float, default=1.0)
+    fake.add_argument("--api-workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if not args.api and not args.spawn:
+        parser.error("give --api URL or --spawn")
+
+    stack = Stack(args) if args.spawn else None
+    try:
+        api_url = stack.start() if stack else args.api
+        rates = {"chat": args.chat_rate, "research": args.research_rate, "health": args.health_rate}
+        print(f"🚦 Open-loop load test against {api_url} for {args.duration:.0f}s: "
+              + ", ".join(f"{name} {rate}/s" for name, rate in rates.items() if rate > 0))
+        test = LoadTest(api_url, args.duration, rates, seed=args.seed, unique_prompts=not args.same_prompt)
+        wall_seconds = asyncio.run(test.run())
+        summary = test.report(wall_seconds)
+        fake_stats = stack.fake_stats() if stack else None
+    finally:
+        if stack:
+            stack.stop()
+
+    if args.json:
+        print(json.dumps({"wall_seconds": wall_seconds, "endpoints": summary, "fake_ollama": fake_stats}, indent=2))
+    else:
+        print(f"⏱️ {wall_seconds:.1f}s including the drain of outstanding requests")
+        print("=" * 50)
+        for endpoint, s in summary.items():
+            percentiles = " ".join(f"{p} {s[p + '_ms']:8.1f}ms" if s[p + "_ms"] is not None else f"{p}      n/a"
+                                   for p in ("p50", "p95", "p99"))
+            print(f"📊 {endpoint:16s} {s['ok']:5d}/{s['requests']:<5d} ok  {s['throughput_per_s']:7.2f}/s  {percentiles}"
+                  + (f"  errors {s['errors']}" if s["errors"] else ""))
+        if fake_stats:
+            print(f"🦙 Fake Ollama: {fake_stats}")
+
+    failures = []
+    for endpoint, limit in (args.max_p95_ms or {}).items():
+        p95 = summary.get(endpoint, {}).get("p95_ms")
+        if p95 is not None and p95 > limit:
+            failures.append(f"{endpoint} p95 {p95:.1f}ms > {limit}ms")
+    if args.max_error_rate is not None:
+        failures += [f"{endpoint} error rate {s['error_rate']:.2%} > {args.max_error_rate:.2%}"
+                     for endpoint, s in summary.items() if s["error_rate"] > args.max_error_rate]
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# src/memory_budget.py
+"""
+Adaptive model memory budget
+The budget for local Ollama hosts is total memory minus what everything else
+(Milvus containers, the embedding model, API workers, the OS) is measured to
+use, minus a reserve. It shrinks as soon as the target drops, grows only
+after the target has stayed higher for a few samples (hysteresis), and a
+model load that fails for lack of memory caps a host's budget below what
+was attempted for a while
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class MemoryBudget:
+    """Per-host model memory budget in GB"""
+
+    def __init__(self,
+                 monitor=None,
+                 static_gb: Optional[float] = None,
+                 reserve_gb: Optional[float] = None,
+                 hysteresis_gb: float = 1.0,
+                 grow_after: int = 3,
+                 min_gb: float = 2.0,
+                 shrink_factor: float = 0.8,
+                 penalty_seconds: Optional[float] = None):
+        self.monitor = monitor
+        # MODEL_MEMORY_GB pins the budget; remote hosts (and hosts without
+        # samples) always use it
+        pinned = os.environ.get("MODEL_MEMORY_GB")
+        self.pinned = static_gb is not None or pinned is not None
+        self.static_gb = static_gb if static_gb is not None else float(pinned or 20)
+        self.reserve_gb = reserve_gb if reserve_gb is not None else float(os.environ.get("RESOURCE_RESERVE_GB", "2"))
+        self.hysteresis_gb = hysteresis_gb
+        self.grow_after = grow_after
+        self.min_gb = min_gb
+        self.shrink_factor = shrink_factor
+        self.penalty_seconds = penalty_seconds if penalty_seconds is not None else float(
+            os.environ.get("MEMORY_PENALTY_SECONDS", "600"))
+
+        self._lock = threading.Lock()
+        self.current_gb: Optional[float] = None
+        self.target_gb: Optional[float] = None
+        self.breakdown: Dict[str, float] = {}
+        self._higher_samples = 0
+        self._last_sample_at = 0.0
+        # host -> (cap GB, expires at)
+        self._caps: Dict[str, tuple] = {}
+        self.adjustments = {"grown": 0, "shrunk": 0, "memory_errors": 0}
+
+    def _update(self):
+        """Fold in the monitor's latest sample (once per sample)"""
+        if self.pinned or self.monitor is None:
+            return
+        sample = self.monitor.latest(max_age=self.monitor.interval * 3)
+        if sample is None or sample["timestamp"] <= self._last_sample_at:
+            return
+        self._last_sample_at = sample["timestamp"]
+
+        # Everything resident that is not Ollama is a co-resident component
+        used = sample["memory_total_gb"] - sample["memory_available_gb"]
+        others = max(0.0, used - sample["ollama_rss_gb"])
+        containers = sum(c["memory_gb"] or 0 for c in sample["containers"])
+        self.breakdown = {
+            "total_gb": sample["memory_total_gb"],
+            "ollama_gb": sample["ollama_rss_gb"],
+            "containers_gb": round(containers, 2),
+            "api_process_gb": sample["process_rss_gb"],
+            "other_gb": round(max(0.0, others - containers - sample["process_rss_gb"]), 2)
+        }
+        target = max(self.min_gb, sample["memory_total_gb"] - others - self.reserve_gb)
+        self.target_gb = round(target, 2)
+
+        if self.current_gb is None:
+            self.current_gb = self.target_gb
+        elif target < self.current_gb - self.hysteresis_gb:
+            # Pressure shows up before the next load does - shrink at once
+            print(f"📉 Model memory budget {self.current_gb:.1f}GB -> {target:.1f}GB")
+            self.current_gb = self.target_gb
+            self._higher_samples = 0
+            self.adjustments["shrunk"] += 1
+        elif target > self.current_gb + self.hysteresis_gb:
+            self._higher_samples += 1
+            if self._higher_samples >= self.grow_after:
+                print(f"📈 Model memory budget {self.current_gb:.1f}GB -> {target:.1f}GB")
+                self.current_gb = self.target_gb
+                self._higher_samples = 0
+                self.adjustments["grown"] += 1
+        else:
+            self._higher_samples = 0
+
+    def budget_gb(self, host: Optional[str] = None, local: bool = True) -> float:
+        """Model memory a host may use right now"""
+        with self._lock:
+            self._update()
+            budget = self.current_gb if local and self.current_gb is not None else self.static_gb
+            cap = self._caps.get(host)
+            if cap is not None:
+                if cap[1] > time.time():
+                    budget = min(budget, cap[0])
+                else:
+                    del self._caps[host]
+            return budget
+
+    def record_memory_error(self, host: str, attempted_gb: float, resident_gb: float, local: bool = True) -> float:
+        """A load failed for lack of memory: cap the host below what was attempted"""
+        budget = self.budget_gb(host, local)
+        with self._lock:
+            cap = budget
+            if resident_gb + attempted_gb <= budget:
+                # The budget said it would fit, so the budget is too generous
+                cap = max(self.min_gb, (resident_gb + attempted_gb) * self.shrink_factor)
+            self._caps[host] = (cap, time.time() + self.penalty_seconds)
+            self.adjustments["memory_errors"] += 1
+        print(f"📉 Out of memory on {host}: budget capped at {cap:.1f}GB for {self.penalty_seconds:.0f}s")
+        return cap
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._update()
+            now = time.time()
+            return {
+                "mode": "pinned" if self.pinned else ("adaptive" if self.current_gb is not None else "static"),
+                "budget_gb": self.current_gb if self.current_gb is not None else self.static_gb,
+                "target_gb": self.target_gb,
+                "reserve_gb": self.reserve_gb,
+                "co_resident": self.breakdown,
+                "capped_hosts": {
+                    host: {"cap_gb": round(cap, 2), "expires_in_seconds": round(until - now)}
+                    for host, (cap, until) in self._caps.items() if until > now
+                },
+                **self.adjustments
+            }
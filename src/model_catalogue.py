@@ -0,0 +1,259 @@
+# src/model_catalogue.py
+"""
+Declarative model catalogue with hot reload
+Model profiles (with their quantization variants), complexity tiers and
+task types live in a YAML/JSON file.
+Each (re)load is validated and precompiled into lookup structures and the
+scoring matrix, so routing changes apply instantly and cost nothing per request
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from model_scoring import PRIORITY_WEIGHTS, ModelScoringMatrix
+
+DEFAULT_CATALOGUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "model_catalogue.yaml")
+
+REQUIRED_MODEL_FIELDS = ("size_gb", "speed_score", "quality_score", "cost_score", "specialties", "max_context")
+REQUIRED_TIER_FIELDS = ("preferred_models", "max_response_time", "priority")
+REQUIRED_QUANT_FIELDS = ("bits_per_weight", "quality_delta", "speed_delta")
+
+# Ollama generation options a tier may set, plus our own keep_alive and cap
+GENERATION_OPTIONS = {
+    "num_ctx", "num_predict", "num_thread", "num_batch", "num_gpu", "temperature",
+    "top_p", "top_k", "repeat_penalty", "seed", "stop", "keep_alive", "num_predict_cap"
+}
+
+
+class CatalogueError(Exception):
+    """The catalogue file could not be read or failed validation"""
+
+
+def load_catalogue_file(path: str) -> Dict[str, Any]:
+    """Parse a YAML or JSON catalogue file"""
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise CatalogueError("PyYAML is required for YAML catalogues (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    if not isinstance(data, dict):
+        raise CatalogueError(f"{path}: expected a mapping at the top level")
+    return data
+
+
+def validate_catalogue(data: Dict[str, Any]) -> List[str]:
+    """Return a list of problems (empty when the catalogue is usable)"""
+    errors = []
+    models = data.get("models") or {}
+    tiers = data.get("tiers") or {}
+    task_types = data.get("task_types") or {}
+    quantizations = data.get("quantizations") or {}
+
+    for quant, config in quantizations.items():
+        missing = [field for field in REQUIRED_QUANT_FIELDS if field not in (config or {})]
+        if missing:
+            errors.append(f"quantization {quant}: missing {', '.join(missing)}")
+
+    if not models:
+        errors.append("no models defined")
+    for name, profile in models.items():
+        missing = [field for field in REQUIRED_MODEL_FIELDS if field not in (profile or {})]
+        if missing:
+            errors.append(f"model {name}: missing {', '.join(missing)}")
+        elif profile["speed_score"] <= 0:
+            errors.append(f"model {name}: speed_score must be positive")
+
+        variants = (profile or {}).get("variants") or {}
+        if variants and profile.get("quant") not in quantizations:
+            errors.append(f"model {name}: variants need a known 'quant' for the base tag")
+        for quant, spec in variants.items():
+            if quant not in quantizations:
+                errors.append(f"model {name}: unknown quantization '{quant}'")
+            if isinstance(spec, dict) and "tag" not in spec:
+                errors.append(f"model {name}: variant {quant} needs a 'tag'")
+
+    if "standard" not in tiers:
+        errors.append("tier 'standard' is required (it is the fallback tier)")
+    for tier, config in tiers.items():
+        missing = [field for field in REQUIRED_TIER_FIELDS if field not in (config or {})]
+        if missing:
+            errors.append(f"tier {tier}: missing {', '.join(missing)}")
+            continue
+        if config["priority"] not in PRIORITY_WEIGHTS:
+            errors.append(f"tier {tier}: unknown priority '{config['priority']}'")
+        unknown = [m for m in config["preferred_models"] if m not in models]
+        if unknown:
+            errors.append(f"tier {tier}: preferred models without a profile: {', '.join(unknown)}")
+
+    option_sets = [("default_options", data.get("default_options") or {})]
+    option_sets += [(f"tier {tier} options", (config or {}).get("options") or {}) for tier, config in tiers.items()]
+    for label, options in option_sets:
+        unknown = [key for key in options if key not in GENERATION_OPTIONS]
+        if unknown:
+            errors.append(f"{label}: unknown generation options {', '.join(unknown)}")
+
+    for task_type, tier in task_types.items():
+        if tier not in tiers:
+            errors.append(f"task type {task_type}: unknown tier '{tier}'")
+
+    return errors
+
+
+def expand_variants(models: Dict[str, Dict[str, Any]],
+                    quantizations: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    One profile per Ollama tag. A variant inherits its base model's profile;
+    memory scales with bits per weight and quality/speed shift by the
+    quantization's deltas, unless the variant overrides them.
+    """
+    profiles = {}
+    for name, profile in models.items():
+        base = {key: value for key, value in profile.items() if key != "variants"}
+        base["family"] = name
+        profiles[name] = base
+
+        base_quant = quantizations.get(profile.get("quant"))
+        for quant, spec in (profile.get("variants") or {}).items():
+            overrides = dict(spec) if isinstance(spec, dict) else {"tag": spec}
+            tag = overrides.pop("tag")
+            q = quantizations[quant]
+            variant = dict(base, quant=quant)
+            variant["size_gb"] = round(base["size_gb"] * q["bits_per_weight"] / base_quant["bits_per_weight"], 2)
+            variant["quality_score"] = min(10, max(1, base["quality_score"] + q["quality_delta"] - base_quant["quality_delta"]))
+            variant["speed_score"] = min(10, max(1, base["speed_score"] + q["speed_delta"] - base_quant["speed_delta"]))
+            variant.update(overrides)
+            profiles[tag] = variant
+    return profiles
+
+
+class CompiledCatalogue:
+    """An immutable, validated catalogue snapshot with precomputed lookups"""
+
+    def __init__(self, data: Dict[str, Any], source: str, version: int):
+        self.quantizations: Dict[str, Dict[str, Any]] = data.get("quantizations") or {}
+        self.model_profiles: Dict[str, Dict[str, Any]] = expand_variants(data["models"], self.quantizations)
+        self.task_complexity: Dict[str, Dict[str, Any]] = data["tiers"]
+        self.task_types: Dict[str, str] = data.get("task_types") or {}
+        self.source = source
+        self.version = version
+        self.loaded_at = datetime.now()
+
+        self.scoring = ModelScoringMatrix(self.model_profiles, self.task_complexity)
+        # Generation defaults per tier, merged once here rather than per request
+        default_options = data.get("default_options") or {}
+        self.tier_options: Dict[str, Dict[str, Any]] = {
+            tier: {**default_options, **(config.get("options") or {})}
+            for tier, config in self.task_complexity.items()
+        }
+        self.preferred_rank: Dict[str, Dict[str, int]] = {
+            tier: {model: i for i, model in enumerate(config["preferred_models"])}
+            for tier, config in self.task_complexity.items()
+        }
+
+        # Family members largest first, and for each tag the smaller variants
+        # to downshift to under memory pressure (best quality first)
+        self.families: Dict[str, List[str]] = {}
+        for tag, profile in self.model_profiles.items():
+            self.families.setdefault(profile["family"], []).append(tag)
+        for members in self.families.values():
+            members.sort(key=lambda tag: self.model_profiles[tag]["size_gb"], reverse=True)
+        self.smaller_variants: Dict[str, List[str]] = {
+            tag: [m for m in self.families[profile["family"]]
+                  if self.model_profiles[m]["size_gb"] < profile["size_gb"]]
+            for tag, profile in self.model_profiles.items()
+        }
+
+
+class ModelCatalogue:
+    """Loads the catalogue file and swaps in a recompiled snapshot when it changes"""
+
+    def __init__(self, path: Optional[str] = None, reload_interval: float = 2.0):
+        self.path = os.path.abspath(path or os.environ.get("MODEL_CATALOGUE", DEFAULT_CATALOGUE_PATH))
+        self.reload_interval = reload_interval
+        self.version = 0
+        self.last_error: Optional[str] = None
+        self.available_models: Optional[List[str]] = None
+        self._mtime = 0.0
+        self._checked_at = 0.0
+        self.current = self._load()
+
+    def _load(self) -> CompiledCatalogue:
+        mtime = os.path.getmtime(self.path)
+        data = load_catalogue_file(self.path)
+        errors = validate_catalogue(data)
+        if errors:
+            raise CatalogueError(f"{self.path}: " + "; ".join(errors))
+
+        self.version += 1
+        self._mtime = mtime
+        return CompiledCatalogue(data, self.path, self.version)
+
+    def maybe_reload(self, force: bool = False) -> bool:
+        """Reload if the file changed (checked at most every reload_interval seconds)"""
+        now = time.time()
+        if not force and now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+
+        mtime = None
+        try:
+            mtime = os.path.getmtime(self.path)
+            if not force and mtime == self._mtime:
+                return False
+            # Swap the whole snapshot at once - readers never see a half-applied reload
+            self.current = self._load()
+        except Exception as e:
+            # Keep serving the last good catalogue until the file changes again
+            if mtime is not None:
+                self._mtime = mtime
+            print(f"⚠️ Model catalogue reload failed, keeping version {self.current.version}: {e}")
+            self.last_error = str(e)
+            return False
+
+        self.last_error = None
+        print(f"📚 Model catalogue reloaded (version {self.current.version}, {len(self.current.model_profiles)} models)")
+        if self.available_models is not None:
+            self.validate_against(self.available_models)
+        return True
+
+    async def watch(self):
+        """Poll the file for changes until cancelled"""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await asyncio.to_thread(self.maybe_reload)
+
+    def validate_against(self, available_models: List[str]) -> Dict[str, List[str]]:
+        """Compare the catalogue with what the backends actually serve"""
+        self.available_models = list(available_models)
+        available = set(available_models)
+        missing = [m for m in self.current.model_profiles if m not in available]
+        unprofiled = [m for m in available_models if m not in self.current.model_profiles]
+
+        if missing:
+            print(f"⚠️ Catalogue models not available on any backend: {', '.join(missing)}")
+        if unprofiled:
+            print(f"ℹ️ Available models without a catalogue profile (neutral score): {', '.join(unprofiled)}")
+        return {"missing": missing, "unprofiled": unprofiled}
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {
+            "path": self.path,
+            "version": self.current.version,
+            "loaded_at": self.current.loaded_at,
+            "models": len(self.current.model_profiles),
+            "last_error": self.last_error
+        }
+        if self.available_models is not None:
+            available = set(self.available_models)
+            status["missing_models"] = [m for m in self.current.model_profiles if m not in available]
+            status["unprofiled_models"] = [m for m in self.available_models if m not in self.current.model_profiles]
+        return status
@@ -4,160 +4,251 @@ Model Selection Conductor - Intelligent model routing based on task complexity a
 This is the "brain" that decides which model to use for each task
 """
 
-import ollama
 import time
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import os
 import json
+import socket
+from urllib.parse import urlparse
+
+import numpy as np
+
+from inference_backends import BackendRouter, CostMeter, load_backends
+from memory_budget import MemoryBudget
+from model_catalogue import ModelCatalogue
+from model_scoring import ModelScoringMatrix
 
 class ModelConductor:
     """Intelligent model selection and resource management"""
     
-    def __init__(self):
-        self.client = ollama.Client()
-        
-        # Model capabilities and performance data
-        self.model_profiles = {
-            "llama3.1:8b": {
-                "size_gb": 5,
-                "speed_score": 10,  # Based on your 1.85s benchmark
-                "quality_score": 7,
-                "cost_score": 10,   # Free local model
-                "specialties": ["general", "fast_processing", "document_parsing"],
-                "max_context": 4096
-            },
-            "qwen2.5:7b": {
-                "size_gb": 4,
-                "speed_score": 4,   # Based on your 14.56s benchmark
-                "quality_score": 8,
-                "cost_score": 10,   # Free local model
-                "specialties": ["writing", "creative", "report_generation"],
-                "max_context": 8192
-            },
-            "gemma2:9b": {
-                "size_gb": 6,
-                "speed_score": 4,   # Based on your 15.63s benchmark
-                "quality_score": 8,
-                "cost_score": 10,   # Free local model
-                "specialties": ["reasoning", "analysis", "research"],
-                "max_context": 8192
-            },
-            "deepseek-r1:8b": {
-                "size_gb": 5,
-                "speed_score": 2,   # Based on your 24.89s benchmark
-                "quality_score": 9,
-                "cost_score": 10,   # Free local model
-                "specialties": ["complex_reasoning", "math", "coding"],
-                "max_context": 4096
-            },
-            "gemma2:2b": {
-                "size_gb": 1.6,
-                "speed_score": 9,
-                "quality_score": 6,
-                "cost_score": 10,   # Free local model
-                "specialties": ["simple_tasks", "quick_responses"],
-                "max_context": 2048
-            }
-        }
-        
-        # Task complexity definitions
-        self.task_complexity = {
-            "simple": {
-                "examples": ["document_parsing", "quick_questions", "classification"],
-                "preferred_models": ["llama3.1:8b", "gemma2:2b"],
-                "max_response_time": 5,
-                "priority": "speed"
-            },
-            "standard": {
-                "examples": ["research_synthesis", "basic_analysis", "summarization"],
-                "preferred_models": ["llama3.1:8b", "qwen2.5:7b", "gemma2:9b"],
-                "max_response_time": 20,
-                "priority": "balanced"
-            },
-            "complex": {
-                "examples": ["deep_analysis", "creative_writing", "multi_step_reasoning"],
-                "preferred_models": ["gemma2:9b", "qwen2.5:7b", "deepseek-r1:8b"],
-                "max_response_time": 60,
-                "priority": "quality"
-            },
-            "critical": {
-                "examples": ["executive_reports", "final_analysis", "client_deliverables"],
-                "preferred_models": ["deepseek-r1:8b", "gemma2:9b"],
-                "max_response_time": 120,
-                "priority": "quality"
-            }
-        }
-        
-        # Task type to model mapping
-        self.task_types = {
-            "chat": "simple",
-            "document_processing": "simple", 
-            "web_research": "standard",
-            "rag_query": "standard",
-            "analysis": "complex",
-            "writing": "complex",
-            "research": "complex",
-            "executive_report": "critical"
-        }
+    def __init__(self,
+                 shared_state=None,
+                 catalogue: Optional[ModelCatalogue] = None,
+                 resource_monitor=None):
+        # Model profiles, complexity tiers and task types (hot-reloaded from
+        # config/model_catalogue.yaml)
+        self.catalogue = catalogue or ModelCatalogue()
         
         # Resource tracking
-        self.max_memory_gb = 20  # Reserve 20GB for models on your M4 Pro
         self.usage_stats = {}
+        self.downshift_log = deque(maxlen=100)
+        self.downshift_counts: Dict[str, int] = {}
+        self._last_downshift: Dict[str, str] = {}
+        # Optional SharedState - usage counts and spend shared by all worker processes
+        self.shared_state = shared_state
+        # Optional ResourceMonitor - real free memory caps the budget of local hosts
+        self.resource_monitor = resource_monitor
+        self.memory_reserve_gb = float(os.environ.get("RESOURCE_RESERVE_GB", "2"))
+        # Model memory per host: measured on local hosts, MODEL_MEMORY_GB (20) elsewhere
+        self.memory_budget = MemoryBudget(resource_monitor, reserve_gb=self.memory_reserve_gb)
         self.cost_tracking = {
             "daily_limit": 2.0,      # $2/day for premium APIs (if any)
             "monthly_limit": 15.0,   # $15/month budget
-            "current_spend": 0.0     # Track premium API usage
+            "current_spend": 0.0,    # Track premium API usage (this month)
+            "daily_spend": 0.0
         }
         
+        # Inference backends (Ollama hosts, OpenAI-compatible servers)
+        self.cost_meter = CostMeter(self.cost_tracking, shared_state)
+        self.router = BackendRouter(load_backends(), self.cost_meter)
+        self.router.on_memory_error = self._handle_memory_error
+        
+    # Views of the current catalogue snapshot
+    @property
+    def model_profiles(self) -> Dict[str, Dict]:
+        return self.catalogue.current.model_profiles
+    
+    @property
+    def task_complexity(self) -> Dict[str, Dict]:
+        return self.catalogue.current.task_complexity
+    
+    @property
+    def task_types(self) -> Dict[str, str]:
+        return self.catalogue.current.task_types
+    
+    @property
+    def scoring(self) -> ModelScoringMatrix:
+        """Profiles as a feature matrix for vectorized scoring"""
+        return self.catalogue.current.scoring
+    
     def get_available_models(self) -> List[str]:
-        """Get list of available models from Ollama"""
-        try:
-            models = self.client.list()
-            return [model['name'] for model in models['models']]
-        except Exception as e:
-            print(f"Error getting available models: {e}")
-            return list(self.model_profiles.keys())
+        """Get list of available models across all inference backends"""
+        models = self.router.available_models()
+        if not models:
+            print("Error getting available models: no backend responded")
+            # Assume the plain tags, not every quantization variant
+            return [m for m, profile in self.model_profiles.items() if profile["family"] == m]
+        return models
     
     def get_loaded_models(self) -> Dict[str, Dict]:
-        """Get currently loaded models and their status"""
-        try:
-            ps_result = self.client.ps()
-            loaded = {}
-            
-            for model in ps_result.get('models', []):
-                model_name = model.get('name', 'unknown')
-                loaded[model_name] = {
-                    'size': model.get('size', 0),
-                    'processor': model.get('processor', 'unknown'),
-                    'until': model.get('until', 'unknown')
-                }
-            
-            return loaded
-        except Exception as e:
-            print(f"Error getting loaded models: {e}")
-            return {}
+        """Get currently loaded models and their status across all hosts"""
+        loaded = {}
+        
+        for model in self.router.loaded_models():
+            entry = loaded.setdefault(model['name'], {
+                'size': model.get('size', 0),
+                'until': model.get('until', 'unknown'),
+                'hosts': []
+            })
+            entry['hosts'].append(model['host'])
+        
+        return loaded
     
-    def estimate_memory_usage(self) -> float:
-        """Estimate current memory usage by loaded models"""
-        loaded_models = self.get_loaded_models()
+    def estimate_memory_usage(self, host: Optional[str] = None) -> float:
+        """Estimate memory used by loaded models on one host (or summed over all hosts)"""
         total_memory = 0
         
-        for model_name in loaded_models.keys():
-            if model_name in self.model_profiles:
-                total_memory += self.model_profiles[model_name]["size_gb"]
+        for backend in self.router.ollama_backends():
+            if host is not None and backend.name != host:
+                continue
+            for model_name in backend.resident_models().keys():
+                if model_name in self.model_profiles:
+                    total_memory += self.model_profiles[model_name]["size_gb"]
         
         return total_memory
     
+    @property
+    def max_memory_gb(self) -> float:
+        """Model memory budget of the local host"""
+        return self.memory_budget.budget_gb()
+    
+    def host_memory_budgets(self) -> np.ndarray:
+        hosts = self.router.ollama_backends()
+        return np.array([self.memory_budget.budget_gb(b.name, self._is_local(b)) for b in hosts], dtype=np.float64)
+    
+    def total_memory_budget(self) -> float:
+        """Model memory budget summed over all Ollama hosts"""
+        budgets = self.host_memory_budgets()
+        return float(budgets.sum()) if len(budgets) else self.max_memory_gb
+    
+    def loadable_mask(self, models: List[str]) -> np.ndarray:
+        """can_load_model for many models at once: resident somewhere or fits on some host"""
+        hosts = self.router.ollama_backends()
+        used = np.array([self.estimate_memory_usage(backend.name) for backend in hosts], dtype=np.float64)
+        budgets = self.host_memory_budgets()
+        available = self.resource_monitor.available_gb() if self.resource_monitor is not None else None
+        if available is not None:
+            # What the machine can actually spare, not just what the profiles add up to
+            headroom = available - self.memory_reserve_gb
+            for i, backend in enumerate(hosts):
+                if self._is_local(backend):
+                    used[i] = max(used[i], budgets[i] - headroom)
+        resident = np.array(
+            [[model in backend.resident_models() for model in models] for backend in hosts], dtype=bool
+        ).reshape(len(hosts), len(models))
+        mask = self.scoring.memory_mask(models, used, budgets, resident)
+        
+        # Non-Ollama backends manage their own memory
+        external = set()
+        for backend in self.router.backends:
+            if backend.kind != "ollama":
+                external.update(backend.list_models())
+        if external:
+            mask |= np.array([model in external for model in models], dtype=bool)
+        return mask
+    
+    @staticmethod
+    def _is_local(backend) -> bool:
+        hostname = urlparse(getattr(backend, "host", "")).hostname or ""
+        return hostname in ("localhost", "127.0.0.1", "::1", "0.0.0.0", socket.gethostname())
+    
     def can_load_model(self, model_name: str) -> bool:
-        """Check if we have enough memory to load a model"""
-        if model_name not in self.model_profiles:
-            return True  # Unknown model, assume it's okay
+        """Check if the model is resident somewhere or some host has memory for it"""
+        return bool(self.loadable_mask([model_name])[0])
+    
+    def _handle_memory_error(self, backend, model: str, error: Exception) -> Optional[str]:
+        """
+        A host could not load `model` for lack of memory: shrink its budget
+        and name the model to retry with - the largest smaller quantization
+        that now fits, else the smallest smaller model, else None
+        """
+        size = self.model_profiles.get(model, {}).get("size_gb", 0.0)
+        self.memory_budget.record_memory_error(
+            backend.name, size, self.estimate_memory_usage(backend.name), self._is_local(backend)
+        )
         
-        current_usage = self.estimate_memory_usage()
-        needed_memory = self.model_profiles[model_name]["size_gb"]
+        available = self.get_available_models()
+        smaller = [m for m in available
+                   if m in self.model_profiles and self.model_profiles[m]["size_gb"] < size]
+        if not smaller:
+            return None
+        variants = [v for v in self.catalogue.current.smaller_variants.get(model, []) if v in smaller]
+        loadable = self.loadable_mask(variants + smaller)
+        fitting = [m for m, ok in zip(variants + smaller, loadable) if ok]
+        if fitting:
+            replacement = fitting[0] if fitting[0] in variants else max(
+                fitting, key=lambda m: self.model_profiles[m]["size_gb"])
+        else:
+            replacement = min(smaller, key=lambda m: self.model_profiles[m]["size_gb"])
+        self._log_downshift(model, replacement, f"out of memory on {backend.name}")
+        return replacement
+    
+    def rank_models(self,
+                    complexity: str,
+                    max_response_time: Optional[int] = None,
+                    context_length: Optional[int] = None,
+                    available_models: Optional[List[str]] = None) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
+        """
+        Score every available model in one vectorized pass
+        
+        Returns:
+            (tier candidates best first, every loadable model best first).
+            Candidates are the tier's preferred models when any of them can
+            run, otherwise all loadable models. A preferred model that can't
+            run is replaced by its largest smaller quantization that can.
+        """
+        if available_models is None:
+            available_models = self.get_available_models()
+        
+        # One snapshot for the whole decision, even if a reload lands meanwhile
+        catalogue = self.catalogue.current
+        scores = catalogue.scoring.score(available_models, complexity, max_response_time, context_length)
+        ranked = catalogue.scoring.rank(available_models, scores, self.loadable_mask(available_models))
         
-        return (current_usage + needed_memory) <= self.max_memory_gb
+        preference = catalogue.preferred_rank.get(complexity, catalogue.preferred_rank["standard"])
+        score_of = dict(ranked)
+        candidates = []
+        for model, rank in preference.items():
+            if model in score_of:
+                candidates.append((model, score_of[model], rank))
+                continue
+            # Downshift within the family before falling back to other families
+            variant = next((v for v in catalogue.smaller_variants.get(model, []) if v in score_of), None)
+            if variant is not None:
+                reason = "insufficient memory" if model in available_models else "not pulled"
+                self._log_downshift(model, variant, reason)
+                candidates.append((variant, score_of[variant], rank))
+        
+        # Ties between preferred models keep the tier's preference order
+        candidates.sort(key=lambda x: (-x[1], x[2]))
+        return ([(model, score) for model, score, _ in candidates] or ranked), ranked
+    
+    def _log_downshift(self, requested: str, selected: str, reason: str):
+        """Record a quantization downshift (printed when the choice for a model changes)"""
+        self.downshift_log.append({
+            "timestamp": datetime.now().isoformat(),
+            "requested": requested,
+            "selected": selected,
+            "reason": reason,
+            "memory_usage_gb": self.estimate_memory_usage()
+        })
+        key = f"{requested} -> {selected}"
+        self.downshift_counts[key] = self.downshift_counts.get(key, 0) + 1
+        if self._last_downshift.get(requested) != selected:
+            self._last_downshift[requested] = selected
+            print(f"⬇️ Downshifting {requested} to {selected} ({reason})")
+    
+    def _fallback_model(self, available_models: List[str]) -> str:
+        """Nothing fits the memory budget: the smallest available model has the best chance"""
+        sized = [m for m in available_models if m in self.model_profiles]
+        if not sized:
+            return available_models[0] if available_models else "llama3.1:8b"
+        
+        fallback = min(sized, key=lambda m: self.model_profiles[m]["size_gb"])
+        print(f"⚠️ No model fits the memory budget; using the smallest available model {fallback}")
+        return fallback
     
     def select_model(self, 
                     task_type: str, 
@@ -186,100 +277,66 @@ class ModelConductor:
         # Get available models
         available_models = self.get_available_models()
         
-        # If user has a preference and it's available, try to use it
+        # If user has a preference and it's available, try to use it (or a
+        # smaller quantization of it)
         if preferred_model and preferred_model in available_models:
             if self.can_load_model(preferred_model):
                 return preferred_model
+            for variant in self.catalogue.current.smaller_variants.get(preferred_model, []):
+                if variant in available_models and self.can_load_model(variant):
+                    self._log_downshift(preferred_model, variant, "insufficient memory")
+                    return variant
         
-        # Get candidate models based on complexity
-        complexity_config = self.task_complexity.get(complexity, self.task_complexity["standard"])
-        preferred_models = complexity_config["preferred_models"]
-        
-        # Filter candidates by availability and resource constraints
-        candidates = []
-        for model in preferred_models:
-            if model in available_models and self.can_load_model(model):
-                candidates.append(model)
-        
-        # If no preferred models available, consider all available models
-        if not candidates:
-            candidates = [m for m in available_models if self.can_load_model(m)]
+        # Score all candidates at once (availability and memory are masks)
+        candidates, _ = self.rank_models(complexity, max_response_time, context_length, available_models)
         
-        # If still no candidates, return the fastest small model
+        # Nothing can be loaded - pick the smallest model rather than a fixed one
         if not candidates:
-            return "llama3.1:8b"  # Your fastest model as fallback
+            return self._fallback_model(available_models)
         
-        # Score candidates based on task requirements
-        scored_candidates = []
-        for model in candidates:
-            score = self._score_model_for_task(model, complexity, max_response_time, context_length)
-            scored_candidates.append((model, score))
-        
-        # Sort by score and return the best
-        scored_candidates.sort(key=lambda x: x[1], reverse=True)
-        best_model = scored_candidates[0][0]
+        best_model = candidates[0][0]
         
         # Log the decision
-        self._log_model_selection(task_type, complexity, best_model, scored_candidates)
+        self._log_model_selection(task_type, complexity, best_model, candidates)
         
         return best_model
     
-    def _score_model_for_task(self, 
-                             model: str, 
-                             complexity: str, 
-                             max_response_time: Optional[int],
-                             context_length: Optional[int]) -> float:
-        """Score a model for a specific task"""
-        
-        if model not in self.model_profiles:
-            return 0.5  # Unknown model gets neutral score
+    def generation_options(self,
+                           complexity: str,
+                           model: Optional[str] = None,
+                           overrides: Optional[Dict[str, Any]] = None,
+                           prompt_tokens: Optional[int] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Ollama options and keep_alive for one request
         
-        profile = self.model_profiles[model]
-        complexity_config = self.task_complexity[complexity]
-        
-        score = 0.0
-        
-        # Speed scoring (higher is better)
-        if complexity_config["priority"] == "speed":
-            score += profile["speed_score"] * 0.4
-        elif complexity_config["priority"] == "balanced":
-            score += profile["speed_score"] * 0.2
-        else:  # quality priority
-            score += profile["speed_score"] * 0.1
-        
-        # Quality scoring (higher is better)
-        if complexity_config["priority"] == "quality":
-            score += profile["quality_score"] * 0.4
-        elif complexity_config["priority"] == "balanced":
-            score += profile["quality_score"] * 0.3
-        else:  # speed priority
-            score += profile["quality_score"] * 0.2
-        
-        # Cost scoring (always prefer free local models)
-        score += profile["cost_score"] * 0.2
-        
-        # Specialty bonus
-        specialty_bonus = 0.0
-        if complexity in ["simple"]:
-            if "fast_processing" in profile["specialties"]:
-                specialty_bonus += 0.1
-        elif complexity in ["complex", "critical"]:
-            if any(spec in profile["specialties"] for spec in ["reasoning", "analysis", "writing"]):
-                specialty_bonus += 0.1
-        
-        score += specialty_bonus
-        
-        # Response time penalty
-        if max_response_time:
-            estimated_time = 30 / profile["speed_score"]  # Rough estimate
-            if estimated_time > max_response_time:
-                score -= 0.2
-        
-        # Context length requirement
-        if context_length and context_length > profile["max_context"]:
-            score -= 0.3
-        
-        return score
+        Tier defaults from the catalogue, then per-request overrides. num_predict
+        is capped at the tier's num_predict_cap; num_ctx grows to fit
+        prompt_tokens plus the reply and is clamped to the model's max_context.
+        """
+        catalogue = self.catalogue.current
+        options = dict(catalogue.tier_options.get(complexity) or catalogue.tier_options["standard"])
+        keep_alive = options.pop("keep_alive", None)
+        cap = options.pop("num_predict_cap", None)
+        
+        for key, value in (overrides or {}).items():
+            if value is None:
+                continue
+            if key == "keep_alive":
+                keep_alive = value
+            else:
+                options[key] = value
+        
+        # num_predict -1 means "until done", which the cap also forbids
+        if cap is not None and "num_predict" in options and not 0 <= options["num_predict"] <= cap:
+            options["num_predict"] = cap
+        
+        if prompt_tokens is not None and "num_ctx" in options:
+            options["num_ctx"] = max(options["num_ctx"], prompt_tokens + max(options.get("num_predict", 0), 0))
+        profile = catalogue.model_profiles.get(model)
+        if profile is not None and "num_ctx" in options:
+            options["num_ctx"] = min(options["num_ctx"], profile["max_context"])
+        
+        return options, keep_alive
     
     def _log_model_selection(self, task_type: str, complexity: str, selected_model: str, candidates: List[Tuple[str, float]]):
         """Log model selection decision for analysis"""
@@ -303,6 +360,15 @@ class ModelConductor:
         # Keep only last 100 entries per model
         if len(self.usage_stats[selected_model]) > 100:
             self.usage_stats[selected_model] = self.usage_stats[selected_model][-100:]
+        
+        if self.shared_state is not None:
+            self.shared_state.incr("model_usage", selected_model)
+    
+    def _model_usage_counts(self) -> Dict[str, int]:
+        """Selections per model (across all workers when state is shared)"""
+        if self.shared_state is not None:
+            return {model: int(count) for model, count in self.shared_state.get_all("model_usage").items()}
+        return {model: len(requests) for model, requests in self.usage_stats.items()}
     
     def get_model_recommendations(self, task_description: str) -> Dict[str, str]:
         """Get model recommendations for a task description"""
@@ -327,12 +393,15 @@ class ModelConductor:
             task_type = "general"
             complexity = "standard"
         
-        # Get recommendations
-        primary = self.select_model(task_type, complexity)
-        
-        # Get alternatives
+        # Primary recommendation and ranked alternatives from a single scoring pass
         available = self.get_available_models()
-        alternatives = [m for m in available if m != primary and self.can_load_model(m)][:2]
+        candidates, ranked = self.rank_models(complexity, available_models=available)
+        if candidates:
+            primary = candidates[0][0]
+            self._log_model_selection(task_type, complexity, primary, candidates)
+        else:
+            primary = self._fallback_model(available)
+        alternatives = [model for model, _ in ranked if model != primary][:2]
         
         return {
             "primary_recommendation": primary,
@@ -374,16 +443,14 @@ class ModelConductor:
     
     def get_usage_analytics(self) -> Dict[str, any]:
         """Get usage analytics and recommendations"""
-        total_requests = sum(len(requests) for requests in self.usage_stats.values())
+        # Model usage frequency
+        model_usage = self._model_usage_counts()
+        total_requests = sum(model_usage.values())
         
         if total_requests == 0:
             return {"message": "No usage data available yet"}
         
-        # Model usage frequency
-        model_usage = {
-            model: len(requests) 
-            for model, requests in self.usage_stats.items()
-        }
+        self.cost_meter.refresh()
         
         # Most used model
         most_used = max(model_usage.keys(), key=lambda k: model_usage[k]) if model_usage else None
@@ -394,10 +461,17 @@ class ModelConductor:
             "most_used_model": most_used,
             "memory_usage": {
                 "current_estimated": f"{self.estimate_memory_usage():.1f}GB",
-                "max_allocated": f"{self.max_memory_gb}GB",
-                "utilization": f"{(self.estimate_memory_usage() / self.max_memory_gb) * 100:.1f}%"
+                "max_allocated": f"{self.total_memory_budget():.1f}GB",
+                "budget": self.memory_budget.get_stats(),
+                "utilization": f"{(self.estimate_memory_usage() / self.total_memory_budget()) * 100:.1f}%"
             },
             "cost_tracking": self.cost_tracking,
+            "backends": self.router.get_stats(),
+            "catalogue": self.catalogue.get_status(),
+            "quantization_downshifts": {
+                "counts": self.downshift_counts,
+                "recent": list(self.downshift_log)[-10:]
+            },
             "recommendations": self._get_optimization_recommendations()
         }
     
@@ -406,20 +480,22 @@ class ModelConductor:
         recommendations = []
         
         current_memory = self.estimate_memory_usage()
+        memory_budget = self.total_memory_budget()
         
-        if current_memory > self.max_memory_gb * 0.8:
+        if current_memory > memory_budget * 0.8:
             recommendations.append("Consider unloading unused models to free memory")
         
-        if current_memory < self.max_memory_gb * 0.3:
+        if current_memory < memory_budget * 0.3:
             recommendations.append("You have plenty of memory - consider loading larger models for better quality")
         
         # Check for model usage patterns
-        if self.usage_stats:
-            total_requests = sum(len(requests) for requests in self.usage_stats.values())
+        model_usage = self._model_usage_counts()
+        if model_usage:
+            total_requests = sum(model_usage.values())
             if total_requests > 10:
                 # Find underused models
-                for model, requests in self.usage_stats.items():
-                    if len(requests) / total_requests < 0.05:  # Used less than 5%
+                for model, count in model_usage.items():
+                    if count / total_requests < 0.05:  # Used less than 5%
                         recommendations.append(f"Model {model} is rarely used - consider unloading")
         
         return recommendations
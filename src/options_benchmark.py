@@ -0,0 +1,89 @@
+# src/options_benchmark.py
+"""
+Generation options benchmark
+Runs the same prompts with Ollama's defaults and with each tier's catalogue
+options, reporting latency, tokens generated and tokens/s, so num_ctx,
+num_predict and num_thread can be tuned from measurements
+
+Usage (from src/):
+    python options_benchmark.py llama3.1:8b --runs 3
+"""
+
+import argparse
+from typing import Any, Dict, List, Optional
+
+from hello_agent import HelloAgent
+from model_conductor import ModelConductor
+
+PROMPTS: List[str] = [
+    "Summarize the benefits of renewable energy in three sentences.",
+    "Explain how a hash map works to a junior developer.",
+    "List five factors to consider when choosing a database for a new product.",
+]
+
+
+def run_config(agent: HelloAgent,
+               options: Optional[Dict[str, Any]],
+               keep_alive: Optional[str],
+               runs: int) -> Dict[str, Any]:
+    """Latency and token counts for one option set over the prompts"""
+    latencies = []
+    eval_tokens = 0
+    eval_ms = 0.0
+    prompt_tokens = 0
+
+    for _ in range(runs):
+        for prompt in PROMPTS:
+            result = agent.chat([{'role': 'user', 'content': prompt}], options=options, keep_alive=keep_alive)
+            if not result['success']:
+                return {"success": False, "error": result.get('error')}
+            latencies.append(result['response_time'])
+            eval_tokens += result.get('eval_count') or 0
+            eval_ms += result.get('eval_ms', 0.0)
+            prompt_tokens += result.get('prompt_eval_count') or 0
+
+    latencies.sort()
+    calls = len(latencies)
+    return {
+        "success": True,
+        "median_latency": latencies[calls // 2],
+        "p95_latency": latencies[min(calls - 1, int(calls * 0.95))],
+        "eval_tokens": eval_tokens / calls,
+        "prompt_tokens": prompt_tokens / calls,
+        "tokens_per_second": eval_tokens / (eval_ms / 1000) if eval_ms else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama generation options benchmark")
+    parser.add_argument("model", nargs="?", default="llama3.1:8b")
+    parser.add_argument("--runs", type=int, default=3, help="Passes over the prompt set per configuration")
+    args = parser.parse_args()
+
+    conductor = ModelConductor()
+    agent = HelloAgent(model_name=args.model, router=conductor.router)
+
+    configs = [("ollama defaults", None, None)]
+    for tier in conductor.task_complexity:
+        options, keep_alive = conductor.generation_options(tier, args.model)
+        configs.append((tier, options, keep_alive))
+
+    print(f"⚙️  Generation options benchmark for {args.model}")
+    print("=" * 50)
+
+    # Warm up so the first configuration doesn't pay the model load
+    agent.chat([{'role': 'user', 'content': "Hello"}], options={"num_predict": 1})
+
+    for name, options, keep_alive in configs:
+        print(f"\n🔄 {name}: {options or '{}'} keep_alive={keep_alive}")
+        result = run_config(agent, options, keep_alive, args.runs)
+        if not result["success"]:
+            print(f"   ❌ {result['error']}")
+            continue
+        print(f"   ✅ median {result['median_latency']:.2f}s, p95 {result['p95_latency']:.2f}s, "
+              f"{result['eval_tokens']:.0f} tokens out / {result['prompt_tokens']:.0f} in, "
+              f"{result['tokens_per_second'] or 0:.1f} tok/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# src/profiling.py
+"""
+Opt-in profiling for the API process (PROFILING=1)
+- SamplingProfiler: samples every thread's stack for N seconds and returns
+  collapsed stacks (flamegraph.pl, speedscope, inferno)
+- RequestProfilerMiddleware: cProfile for single requests sent with an
+  X-Profile header, kept in a small ring for download
+- AllocationTracker: tracemalloc snapshot diffs against a baseline
+Nothing runs until asked for, and the middleware is only installed when
+profiling is enabled, so the default cost is zero
+"""
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get("PROFILING") == "1"
+
+
+def _frame_label(code) -> str:
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Wall-clock stack sampler over sys._current_frames() - runs only during a capture"""
+
+    def __init__(self, max_seconds: float = 60.0):
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+
+    def capture(self,
+                seconds: float,
+                interval: float = 0.005,
+                thread_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        Sample stacks for `seconds` (blocking - call it from a worker thread).
+        thread_ids limits sampling to those threads (e.g. the event loop's).
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile capture is already running")
+        try:
+            seconds = min(max(seconds, 0.1), self.max_seconds)
+            sampler = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            counts: Counter = Counter()
+            samples = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == sampler or (thread_ids is not None and thread_id not in thread_ids):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    thread_name = names.get(thread_id, str(thread_id)).replace(";", ":")
+                    counts[thread_name + ";" + ";".join(reversed(stack))] += 1
+                samples += 1
+                time.sleep(interval)
+
+            collapsed = "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+            return {"samples": samples, "seconds": seconds, "stacks": len(counts), "collapsed": collapsed + "\n"}
+        finally:
+            self._lock.release()
+
+
+class ProfileStore:
+    """The last `keep` request profiles, by id"""
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile_id: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._profiles[profile_id] = entry
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"id": pid, **{k: v for k, v in entry.items() if k not in ("stats", "text")}}
+                    for pid, entry in reversed(self._profiles.items())]
+
+
+class RequestProfilerMiddleware:
+    """
+    Pure ASGI middleware: a request with `X-Profile: 1` runs under cProfile and
+    the response carries X-Profile-Id (fetch it from /debug/profile/requests/{id}).
+    cProfile follows the event loop thread, so work of other requests that
+    interleaves with this one is included; only one request is profiled at a time.
+    """
+
+    def __init__(self, app, store: ProfileStore, header: str = "x-profile", top: int = 40):
+        self.app = app
+        self.store = store
+        self.header = header.encode()
+        self.top = top
+        self._active = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(name == self.header and value.strip() == b"1"
+                                              for name, value in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        if self._active:
+            async def send_busy(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", b"busy")]}
+                await send(message)
+            await self.app(scope, receive, send_busy)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        self._active = True
+        profile = cProfile.Profile()
+        start_time = time.perf_counter()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.disable()
+            self._active = False
+            elapsed = time.perf_counter() - start_time
+            text = io.StringIO()
+            pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(self.top)
+            profile.create_stats()
+            self.store.add(profile_id, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "elapsed_ms": round(elapsed * 1000, 1),
+                "captured_at": time.time(),
+                "text": text.getvalue(),
+                "stats": marshal.dumps(profile.stats)  # pstats/snakeviz-loadable dump
+            })
+
+
+class AllocationTracker:
+    """tracemalloc between start() and stop(): top allocation growth since the baseline"""
+
+    IGNORED = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+    def __init__(self):
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in self.IGNORED]
+        )
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self.started_at = time.time()
+            self.baseline = self._snapshot()
+        return self.status()
+
+    def reset(self) -> Dict[str, Any]:
+        """Move the baseline to now"""
+        return self.start()
+
+    def stop(self) -> Dict[str, Any]:
+        with self._lock:
+            tracemalloc.stop()
+            self.baseline = None
+            self.started_at = None
+        return self.status()
+
+    def diff(self, top: int = 25, group_by: str = "lineno") -> Dict[str, Any]:
+        """Largest allocation changes since the baseline (group_by: lineno, filename or traceback)"""
+        with self._lock:
+            if not tracemalloc.is_tracing() or self.baseline is None:
+                raise RuntimeError("Allocation tracking is not running")
+            changes = self._snapshot().compare_to(self.baseline, group_by)
+        return {
+            **self.status(),
+            "top": [
+                {
+                    "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback][:10],
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff
+                }
+                for stat in changes[:top]
+            ]
+        }
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            "tracing": tracing,
+            "started_at": self.started_at,
+            "traced_mb": round(current / 1e6, 2),
+            "peak_mb": round(peak / 1e6, 2),
+            "overhead_mb": round(tracemalloc.get_tracemalloc_memory() / 1e6, 2) if tracing else 0.0
+        }
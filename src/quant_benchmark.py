@@ -0,0 +1,115 @@
+# src/quant_benchmark.py
+"""
+Quality/latency benchmark per quantization variant
+Runs a small fixed question set against every pulled variant of a model
+family and reports accuracy, load time, tokens/s and memory, so the
+catalogue's quantization deltas can be set from measurements
+
+Usage (from src/):
+    python quant_benchmark.py llama3.1:8b
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List, Tuple
+
+from hello_agent import HelloAgent
+from model_catalogue import ModelCatalogue
+from model_conductor import ModelConductor
+
+# (question, any of these substrings counts as correct)
+QUESTIONS: List[Tuple[str, List[str]]] = [
+    ("What is 17 * 23? Answer with the number only.", ["391"]),
+    ("What is the capital of Australia? One word.", ["canberra"]),
+    ("Which planet is known as the Red Planet? One word.", ["mars"]),
+    ("If a train travels 120 km in 1.5 hours, what is its average speed in km/h? Number only.", ["80"]),
+    ("What is the chemical symbol for gold?", ["au"]),
+    ("Reverse the word 'stream'. Answer with the word only.", ["maerts"]),
+    ("How many days are in a leap year? Number only.", ["366"]),
+    ("Who wrote 'Pride and Prejudice'? Name only.", ["austen"]),
+    ("Is 97 a prime number? Answer yes or no.", ["yes"]),
+    ("What is the square root of 144? Number only.", ["12"]),
+]
+
+
+def benchmark_variant(conductor: ModelConductor, model: str) -> Dict[str, Any]:
+    """Accuracy and latency of one variant over the question set"""
+    agent = HelloAgent(model_name=model, router=conductor.router)
+    correct = 0
+    latencies = []
+    eval_tokens = 0
+    eval_ms = 0.0
+    load_ms = 0.0
+
+    for i, (question, answers) in enumerate(QUESTIONS):
+        result = agent.chat(
+            [{'role': 'user', 'content': question}],
+            options={"temperature": 0, "num_predict": 32}
+        )
+        if not result['success']:
+            return {"model": model, "success": False, "error": result.get('error')}
+
+        if i == 0:
+            load_ms = result.get('load_ms', 0.0)  # First call pays the model load
+        latencies.append(result['response_time'])
+        eval_tokens += result.get('eval_count', 0)
+        eval_ms += result.get('eval_ms', 0.0)
+        if any(answer in result['response'].lower() for answer in answers):
+            correct += 1
+
+    warm = sorted(latencies[1:]) or latencies
+    return {
+        "model": model,
+        "success": True,
+        "accuracy": correct / len(QUESTIONS),
+        "load_ms": load_ms,
+        "median_latency": warm[len(warm) // 2],
+        "tokens_per_second": eval_tokens / (eval_ms / 1000) if eval_ms else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantization variant benchmark")
+    parser.add_argument("family", help="Base model of the family, e.g. llama3.1:8b")
+    args = parser.parse_args()
+
+    catalogue = ModelCatalogue()
+    conductor = ModelConductor(catalogue=catalogue)
+    profiles = catalogue.current.model_profiles
+    members = catalogue.current.families.get(args.family)
+    if not members:
+        print(f"❌ {args.family} is not in the catalogue")
+        return
+
+    available = set(conductor.get_available_models())
+    pulled = [m for m in members if m in available]
+    skipped = [m for m in members if m not in available]
+
+    print(f"🧪 Quantization benchmark for {args.family}")
+    print("=" * 50)
+    if skipped:
+        print(f"⏭️  Not pulled (ollama pull <tag> to include): {', '.join(skipped)}")
+
+    results = []
+    for model in pulled:
+        print(f"\n🔄 {model} ({profiles[model].get('quant', '?')}, ~{profiles[model]['size_gb']}GB)")
+        start_time = time.time()
+        result = benchmark_variant(conductor, model)
+        if not result["success"]:
+            print(f"   ❌ {result['error']}")
+            continue
+        print(f"   ✅ accuracy {result['accuracy']:.0%}, median {result['median_latency']:.2f}s, "
+              f"load {result['load_ms']:.0f}ms, {result['tokens_per_second'] or 0:.1f} tok/s "
+              f"({time.time() - start_time:.1f}s total)")
+        results.append(result)
+
+    if results:
+        print("\n📊 Summary (catalogue quality/speed in brackets)")
+        for result in results:
+            profile = profiles[result["model"]]
+            print(f"   {profile.get('quant', '?'):7s} {result['accuracy']:5.0%} [{profile['quality_score']}]  "
+                  f"{result['median_latency']:6.2f}s [{profile['speed_score']}]  {result['model']}")
+
+
+if __name__ == "__main__":
+    main()
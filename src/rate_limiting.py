@@ -0,0 +1,236 @@
+# src/rate_limiting.py
+"""
+Rate limiting and backpressure for the API
+Token buckets per client/API key, plus per-tier in-flight caps that reject
+early (429 + Retry-After) when the predicted queue wait would blow the tier's
+max_response_time
+"""
+
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+
+
+class RateLimitExceeded(Exception):
+    """Request rejected by rate limiting or backpressure"""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second, up to `burst` stored"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self, tokens: float = 1.0) -> Tuple[bool, float]:
+        """Take tokens if available; otherwise return seconds until they would be"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True, 0.0
+        return False, (tokens - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """
+    One token bucket per client key (API key, or client address).
+
+    With a SharedState the buckets live in SQLite so the limit holds across
+    all API worker processes.
+    """
+
+    def __init__(self, requests_per_minute: float = 60, burst: int = 20, max_clients: int = 10000,
+                 shared_state=None):
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self.shared_state = shared_state
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.rejected = 0
+        self.shared_busy = 0
+        self._lock = threading.Lock()
+
+    def check(self, client_key: str):
+        """Consume one token for `client_key` or raise RateLimitExceeded"""
+        if self.shared_state is not None:
+            try:
+                allowed, retry_after = self.shared_state.take_token(f"client:{client_key}", self.rate, self.burst)
+            except sqlite3.OperationalError:
+                # Shared file busy: fall back to this process's own bucket
+                # rather than stall the request on the lock
+                self.shared_busy += 1
+            else:
+                if not allowed:
+                    self.rejected += 1
+                    raise RateLimitExceeded(f"Rate limit exceeded for client {client_key}", retry_after)
+                return
+
+        with self._lock:
+            bucket = self.buckets.get(client_key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_clients:
+                    self._evict_full_buckets()
+                bucket = TokenBucket(self.rate, self.burst)
+                self.buckets[client_key] = bucket
+
+            allowed, retry_after = bucket.try_acquire()
+            if not allowed:
+                self.rejected += 1
+                raise RateLimitExceeded(f"Rate limit exceeded for client {client_key}", retry_after)
+
+    def _evict_full_buckets(self):
+        """Drop buckets that have refilled completely - they carry no state"""
+        now = time.monotonic()
+        full = [key for key, b in self.buckets.items()
+                if b.tokens + (now - b.updated_at) * b.rate >= b.burst]
+        for key in full:
+            del self.buckets[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "shared": self.shared_state is not None,
+            "tracked_clients": len(self.buckets),
+            "rejected": self.rejected,
+            "shared_busy_fallbacks": self.shared_busy
+        }
+
+
+class TierState:
+    """In-flight accounting and observed service time for one complexity tier"""
+
+    def __init__(self, max_in_flight: int, max_response_time: float, max_queue: int):
+        self.max_in_flight = max_in_flight
+        self.max_response_time = max_response_time
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time: Optional[float] = None  # EWMA seconds, None until observed
+        self.completed = 0
+        self.rejected = 0
+
+    def predicted_wait(self, load: Optional[Tuple[int, int]] = None) -> float:
+        """Seconds a new arrival would wait in the queue before starting"""
+        if self.service_time is None:
+            return 0.0
+        waiting, in_flight = load if load is not None else (self.waiting, self.in_flight)
+        ahead = waiting + in_flight - self.max_in_flight + 1
+        if ahead <= 0:
+            return 0.0
+        # Each "round" of max_in_flight completions takes one service time
+        return math.ceil(ahead / self.max_in_flight) * self.service_time
+
+    def record(self, elapsed: float):
+        self.completed += 1
+        if self.service_time is None:
+            self.service_time = elapsed
+        else:
+            self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+
+
+class TierAdmissionController:
+    """
+    In-flight caps per tier with queue-time-aware early rejection.
+
+    The counters live in this process. The configured max_in_flight and
+    max_queue are totals for the deployment, so with several API workers
+    each one gets an equal share (at least one slot). For work that runs
+    in other processes (jobs on research workers) admit() takes the load
+    counted in shared storage instead.
+    """
+
+    def __init__(self, task_complexity: Dict[str, Dict[str, Any]], workers: int = 1):
+        self.workers = max(1, workers)
+        self.tiers: Dict[str, TierState] = {}
+        for tier, config in task_complexity.items():
+            max_in_flight = config.get("max_in_flight", 2)
+            max_queue = config.get("max_queue", max_in_flight * 4)
+            self.tiers[tier] = TierState(
+                max_in_flight=max(1, max_in_flight // self.workers),
+                max_response_time=config["max_response_time"],
+                max_queue=max(1, max_queue // self.workers)
+            )
+
+    def admit(self,
+              tier: str,
+              include_service_time: bool = True,
+              load: Optional[Tuple[int, int]] = None) -> TierState:
+        """
+        Reject now if the queue is full or the predicted wait is too long.
+
+        For interactive requests the budget covers queue wait plus service
+        time; background jobs only bound the queue wait. `load` is
+        (waiting, running) counted outside this process, replacing the
+        local counters.
+        """
+        state = self.tiers.get(tier) or self.tiers["standard"]
+        waiting = load[0] if load is not None else state.waiting
+
+        if waiting >= state.max_queue:
+            state.rejected += 1
+            raise RateLimitExceeded(
+                f"Too many queued '{tier}' requests",
+                state.predicted_wait(load) or state.max_response_time
+            )
+
+        wait = state.predicted_wait(load)
+        expected = wait + (state.service_time or 0.0) if include_service_time else wait
+        if expected > state.max_response_time:
+            state.rejected += 1
+            raise RateLimitExceeded(
+                f"Predicted time {expected:.1f}s exceeds the '{tier}' tier limit of {state.max_response_time}s",
+                wait
+            )
+        return state
+
+    @asynccontextmanager
+    async def slot(self, tier: str, state: Optional[TierState] = None):
+        """Hold one in-flight slot for the duration of the block"""
+        if state is None:
+            state = self.admit(tier)
+
+        state.waiting += 1
+        try:
+            await state.semaphore.acquire()
+        finally:
+            state.waiting -= 1
+
+        state.in_flight += 1
+        start_time = time.monotonic()
+        try:
+            yield state
+        finally:
+            state.in_flight -= 1
+            state.semaphore.release()
+            state.record(time.monotonic() - start_time)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            tier: {
+                "in_flight": state.in_flight,
+                "max_in_flight": state.max_in_flight,
+                "waiting": state.waiting,
+                "service_time": round(state.service_time, 3) if state.service_time else None,
+                "predicted_wait": round(state.predicted_wait(), 3),
+                "max_response_time": state.max_response_time,
+                "completed": state.completed,
+                "rejected": state.rejected
+            }
+            for tier, state in self.tiers.items()
+        }
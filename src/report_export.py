@@ -0,0 +1,326 @@
+# src/report_export.py
+"""
+Research report exports (Markdown, HTML, PDF, JSON)
+Each completed job is rendered once - by the pipeline, in whichever process
+ran the job - into files with gzip siblings. The API serves them as files
+with Range and gzip support instead of re-serializing the report per request
+"""
+
+import gzip
+import html
+import json
+import os
+import re
+import zlib
+from email.utils import formatdate
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+
+EXPORT_FORMATS = {
+    "md": "text/markdown; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+    "pdf": "application/pdf",
+    "json": "application/json"
+}
+
+INLINE_RE = [
+    (re.compile(r"`([^`]+)`"), r"<code>\1</code>"),
+    (re.compile(r"\*\*(.+?)\*\*"), r"<strong>\1</strong>"),
+    (re.compile(r"(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?!\w)"), r"<em>\1</em>"),
+]
+LIST_ITEM_RE = re.compile(r"^\s*(?:[-*+]|(\d+)[.)])\s+(.*)$")
+
+
+def render_markdown(topic: str, results: Dict[str, Any]) -> str:
+    """Report with a title, generation details and the fetched sources"""
+    lines = [f"# {topic}", "", f"*Model: {results.get('model_used')} · Generated: {results.get('timestamp')}*", "",
+             (results.get("report") or "").strip(), ""]
+    sources = [s for s in results.get("sources") or [] if not s.get("error")]
+    if sources:
+        lines += ["## Sources", ""] + [f"- {s.get('title') or s['url']} <{s['url']}>" for s in sources] + [""]
+    return "\n".join(lines)
+
+
+def _inline(text: str) -> str:
+    text = html.escape(text, quote=False)
+    for pattern, replacement in INLINE_RE:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def markdown_to_html(markdown: str, title: str) -> str:
+    """Headings, lists, code blocks, emphasis and paragraphs - what the models write"""
+    body: List[str] = []
+    paragraph: List[str] = []
+    list_tag: Optional[str] = None
+    in_code = False
+
+    def flush():
+        nonlocal list_tag
+        if paragraph:
+            body.append(f"<p>{_inline(' '.join(paragraph))}</p>")
+            paragraph.clear()
+        if list_tag:
+            body.append(f"</{list_tag}>")
+            list_tag = None
+
+    for line in markdown.splitlines():
+        if line.strip().startswith("```"):
+            flush()
+            body.append("</code></pre>" if in_code else "<pre><code>")
+            in_code = not in_code
+            continue
+        if in_code:
+            body.append(html.escape(line))
+            continue
+
+        heading = re.match(r"^(#{1,6})\s+(.*)$", line)
+        item = LIST_ITEM_RE.match(line)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            body.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif item:
+            if paragraph:
+                body.append(f"<p>{_inline(' '.join(paragraph))}</p>")
+                paragraph.clear()
+            tag = "ol" if item.group(1) else "ul"
+            if list_tag != tag:
+                if list_tag:
+                    body.append(f"</{list_tag}>")
+                body.append(f"<{tag}>")
+                list_tag = tag
+            body.append(f"<li>{_inline(item.group(2))}</li>")
+        elif not line.strip():
+            flush()
+        else:
+            if list_tag:
+                flush()
+            paragraph.append(line.strip())
+    flush()
+    if in_code:
+        body.append("</code></pre>")
+
+    return (
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(title)}</title>"
+        "<style>body{font-family:-apple-system,Helvetica,sans-serif;max-width:46em;margin:2em auto;"
+        "padding:0 1em;line-height:1.5}pre{background:#f5f5f5;padding:1em;overflow-x:auto}</style>"
+        "</head><body>\n" + "\n".join(body) + "\n</body></html>\n"
+    )
+
+
+def _pdf_escape(text: str) -> str:
+    text = text.encode("latin-1", errors="replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    return lines + [current] if current else lines or [""]
+
+
+def markdown_to_pdf(markdown: str) -> bytes:
+    """Plain-text PDF (Helvetica, A4, headings in bold) - no PDF library needed"""
+    rows: List[Tuple[str, int, str]] = []  # (font, size, text)
+    for line in markdown.splitlines():
+        heading = re.match(r"^(#{1,6})\s+(.*)$", line)
+        if heading:
+            size = max(11, 18 - 2 * len(heading.group(1)))
+            rows.append(("F1", 10, ""))
+            rows += [("F2", size, part) for part in _wrap(heading.group(2), 60)]
+        else:
+            plain = re.sub(r"\*\*(.+?)\*\*|`([^`]+)`", lambda m: m.group(1) or m.group(2), line)
+            item = LIST_ITEM_RE.match(plain)
+            indent = ""
+            if item:
+                plain, indent = ("- " if not item.group(1) else f"{item.group(1)}. ") + item.group(2), "   "
+            wrapped = _wrap(plain, 95)
+            rows += [("F1", 10, (indent if i else "") + part) for i, part in enumerate(wrapped)]
+
+    pages: List[bytes] = []
+    commands: List[str] = []
+    y = 800
+    for font, size, text in rows:
+        if y < 50:
+            pages.append("\n".join(commands).encode("latin-1"))
+            commands, y = [], 800
+        y -= size + 4
+        if text:
+            commands.append(f"BT /{font} {size} Tf 50 {y} Td ({_pdf_escape(text)}) Tj ET")
+    pages.append("\n".join(commands).encode("latin-1"))
+
+    # Objects: 1 catalog, 2 page tree, 3-4 fonts, then a (page, content) pair per page
+    objects: List[bytes] = [b"", b"",
+                            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+                            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"]
+    page_ids = []
+    for content in pages:
+        stream = zlib.compress(content)
+        page_ids.append(len(objects) + 1)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {len(objects) + 2} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>".encode())
+        objects.append(f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode() + stream + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte of a single "bytes=" range, None to send the whole file.
+    Raises ValueError for an unsatisfiable range.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None  # Multi-range requests get the full file
+    start, _, end = header[6:].strip().partition("-")
+    try:
+        if not start:
+            first, last = max(0, size - int(end)), size - 1
+        else:
+            first = int(start)
+            last = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if first >= size or first > last:
+        raise ValueError("unsatisfiable range")
+    return first, last
+
+
+class RangeFileResponse(Response):
+    """
+    Streams (part of) a file off the event loop. Uses the ASGI zero-copy
+    extension (sendfile) when the server offers it, else reads in chunks
+    through anyio's worker threads.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, status_code: int, headers: Dict[str, str], byte_range: Tuple[int, int]):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.byte_range = byte_range
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        first, last = self.byte_range
+        remaining = last - first + 1
+        if scope.get("method") == "HEAD" or remaining <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopy" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopy", "file": f.fileno(),
+                            "offset": first, "count": remaining, "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(first)
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class ReportExporter:
+    """Renders job reports to files under REPORT_EXPORT_DIR and serves them"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.environ.get("REPORT_EXPORT_DIR", os.path.join("data", "reports"))
+        os.makedirs(self.directory, exist_ok=True)
+        self.stats = {"exports": 0, "served": 0, "served_gzip": 0, "served_ranges": 0, "not_modified": 0}
+
+    def path(self, job_id: str, fmt: str) -> str:
+        return os.path.join(self.directory, job_id, f"report.{fmt}")
+
+    def exists(self, job_id: str) -> bool:
+        return all(os.path.exists(self.path(job_id, fmt)) for fmt in EXPORT_FORMATS)
+
+    def export(self, job_id: str, topic: str, results: Dict[str, Any]) -> Dict[str, int]:
+        """Render every format (plus a .gz of each) and return their sizes"""
+        markdown = render_markdown(topic, results)
+        rendered = {
+            "md": markdown.encode("utf-8"),
+            "html": markdown_to_html(markdown, topic).encode("utf-8"),
+            "pdf": markdown_to_pdf(markdown),
+            "json": json.dumps({"job_id": job_id, "topic": topic, **results}, default=str, indent=2).encode("utf-8")
+        }
+
+        os.makedirs(os.path.join(self.directory, job_id), exist_ok=True)
+        for fmt, data in rendered.items():
+            path = self.path(job_id, fmt)
+            # Renamed into place, so a request never serves a half-written file
+            for target, content in ((path + ".gz", gzip.compress(data, compresslevel=9, mtime=0)), (path, data)):
+                with open(target + ".tmp", "wb") as f:
+                    f.write(content)
+                os.replace(target + ".tmp", target)
+        self.stats["exports"] += 1
+        return {fmt: len(data) for fmt, data in rendered.items()}
+
+    def response(self, job_id: str, fmt: str, request_headers: Mapping[str, str]) -> Response:
+        """File response honouring If-None-Match, Range and Accept-Encoding: gzip"""
+        path = self.path(job_id, fmt)
+        range_header = request_headers.get("range")
+        # Ranges are always of the identity encoding
+        use_gzip = (not range_header and "gzip" in request_headers.get("accept-encoding", "")
+                    and os.path.exists(path + ".gz"))
+        if use_gzip:
+            path += ".gz"
+        stat = os.stat(path)
+        etag = f'"{job_id}-{fmt}-{int(stat.st_mtime)}{"-gz" if use_gzip else ""}"'
+        if request_headers.get("if-none-match") == etag:
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers={"ETag": etag})
+
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{stat.st_size}"})
+
+        headers = {
+            "Content-Type": EXPORT_FORMATS[fmt],
+            "ETag": etag,
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Vary": "Accept-Encoding",
+            "Content-Disposition": f'inline; filename="report-{job_id}.{fmt}"'
+        }
+        self.stats["served"] += 1
+        status_code = 200
+        if use_gzip:
+            self.stats["served_gzip"] += 1
+            headers["Content-Encoding"] = "gzip"
+        if byte_range is not None:
+            self.stats["served_ranges"] += 1
+            status_code = 206
+            headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{stat.st_size}"
+        else:
+            byte_range = (0, stat.st_size - 1)
+        headers["Content-Length"] = str(byte_range[1] - byte_range[0] + 1)
+        return RangeFileResponse(path, status_code, headers, byte_range)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
@@ -0,0 +1,164 @@
+# src/reranker.py
+"""
+Cross-encoder reranking between retrieval and generation
+A small local cross-encoder re-scores the retrieved candidates (batched, on
+CPU, cached by query and chunk hash), then only the best chunks are packed
+into the selected model's context window
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def pack_chunks(chunks: List[Dict[str, Any]], token_budget: int) -> List[Dict[str, Any]]:
+    """Take chunks best first until the token budget is spent (a chunk that doesn't fit is skipped)"""
+    packed = []
+    used = 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk["text"])
+        if used + tokens > token_budget:
+            continue
+        packed.append(chunk)
+        used += tokens
+    return packed
+
+
+class CrossEncoderReranker:
+    """sentence-transformers CrossEncoder loaded on first use, with an LRU score cache"""
+
+    def __init__(self,
+                 model_name: Optional[str] = None,
+                 device: Optional[str] = None,
+                 batch_size: int = 32,
+                 cache_size: int = 20000):
+        self.model_name = model_name or os.environ.get("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        # CPU keeps the GPU/unified memory for the generation models
+        self.device = device or os.environ.get("RERANKER_DEVICE", "cpu")
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.load_time: Optional[float] = None
+        self.error: Optional[str] = None
+        self._model = None
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"reranks": 0, "pairs_scored": 0, "cache_hits": 0, "rerank_ms": 0.0,
+                      "candidate_tokens": 0, "packed_tokens": 0, "prefill_saved_ms": 0.0}
+        # Measured prompt processing speed, used to price the tokens reranking saves
+        self.prefill_tokens_per_second: Optional[float] = None
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start_time = time.time()
+                    try:
+                        from sentence_transformers import CrossEncoder
+                        self._model = CrossEncoder(self.model_name, device=self.device)
+                    except Exception as e:
+                        self.error = str(e)
+                        raise
+                    self.load_time = time.time() - start_time
+                    self.error = None
+                    print(f"🧠 Loaded reranker {self.model_name} in {self.load_time:.2f}s")
+        return self._model
+
+    @staticmethod
+    def _cache_key(query: str, text: str) -> Tuple[str, str]:
+        return query, hashlib.sha1(text.encode()).hexdigest()
+
+    def rerank(self, query: str, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Chunks sorted by cross-encoder relevance, each with a rerank_score.
+        If the model can't be loaded the retrieval order is kept.
+        """
+        start_time = time.perf_counter()
+        keys = [self._cache_key(query, chunk["text"]) for chunk in chunks]
+
+        with self._lock:
+            scores = [self._cache.get(key) for key in keys]
+            for key, score in zip(keys, scores):
+                if score is not None:
+                    self._cache.move_to_end(key)
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            try:
+                model = self._get_model()
+            except Exception as e:
+                print(f"⚠️ Reranker unavailable, keeping retrieval order: {e}")
+                return chunks
+            predicted = model.predict(
+                [(query, chunks[i]["text"]) for i in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            with self._lock:
+                for i, score in zip(missing, predicted):
+                    scores[i] = float(score)
+                    self._cache[keys[i]] = float(score)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        with self._lock:
+            self.stats["reranks"] += 1
+            self.stats["pairs_scored"] += len(missing)
+            self.stats["cache_hits"] += len(chunks) - len(missing)
+            self.stats["rerank_ms"] += elapsed_ms
+
+        order = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+        return [{**chunks[i], "rerank_score": round(scores[i], 4)} for i in order]
+
+    def record_prefill(self, prompt_tokens: Optional[int], prompt_ms: Optional[float]):
+        """Feed the prompt-processing speed of a generation (EWMA)"""
+        if not prompt_tokens or not prompt_ms:
+            return
+        rate = prompt_tokens / (prompt_ms / 1000)
+        with self._lock:
+            current = self.prefill_tokens_per_second
+            self.prefill_tokens_per_second = rate if current is None else 0.7 * current + 0.3 * rate
+
+    def tradeoff(self, candidate_tokens: int, packed_tokens: int, rerank_ms: float) -> Dict[str, Any]:
+        """Prefill time the dropped tokens would have cost vs the time spent reranking"""
+        saved_ms = None
+        if self.prefill_tokens_per_second:
+            saved_ms = (candidate_tokens - packed_tokens) / self.prefill_tokens_per_second * 1000
+        with self._lock:
+            self.stats["candidate_tokens"] += candidate_tokens
+            self.stats["packed_tokens"] += packed_tokens
+            self.stats["prefill_saved_ms"] += saved_ms or 0.0
+        return {
+            "candidate_tokens": candidate_tokens,
+            "packed_tokens": packed_tokens,
+            "rerank_ms": round(rerank_ms, 1),
+            "estimated_prefill_saved_ms": round(saved_ms, 1) if saved_ms is not None else None,
+            "net_ms": round(saved_ms - rerank_ms, 1) if saved_ms is not None else None
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            cache_entries = len(self._cache)
+        lookups = stats["pairs_scored"] + stats["cache_hits"]
+        return {
+            "model": self.model_name,
+            "device": self.device,
+            "loaded": self._model is not None,
+            "error": self.error,
+            **stats,
+            "rerank_ms": round(stats["rerank_ms"], 1),
+            "prefill_saved_ms": round(stats["prefill_saved_ms"], 1),
+            "cache_entries": cache_entries,
+            "cache_hit_rate": round(stats["cache_hits"] / lookups, 3) if lookups else 0.0,
+            "prefill_tokens_per_second": round(self.prefill_tokens_per_second, 1)
+                                         if self.prefill_tokens_per_second else None
+        }
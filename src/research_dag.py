@@ -0,0 +1,233 @@
+# src/research_dag.py
+"""
+Dependency-graph executor for research sub-tasks
+Nodes are async handlers that receive their dependencies' results; every
+node whose inputs are ready runs concurrently (up to a limit), and a
+running node may add further nodes (the planner adds one per sub-question).
+Timing of each node and the critical path through the finished graph are
+reported with the results
+"""
+
+import asyncio
+import json
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+DONE_STATES = ("done", "failed", "skipped")
+
+PLAN_PROMPT = """
+Break the research topic below into at most {limit} focused sub-questions that
+together cover it. A sub-question that needs the answer of an earlier one lists
+that one's index (0-based) in depends_on; keep independent questions independent
+so they can be researched in parallel.
+
+Topic: {topic}
+"""
+
+
+def plan_schema(limit: int) -> Dict[str, Any]:
+    """JSON schema the planner answers in (Ollama structured output)"""
+    return {
+        "type": "object",
+        "properties": {
+            "subquestions": {
+                "type": "array",
+                "minItems": 1,
+                "maxItems": limit,
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "question": {"type": "string", "minLength": 8},
+                        "depends_on": {"type": "array", "items": {"type": "integer"}}
+                    },
+                    "required": ["question", "depends_on"]
+                }
+            }
+        },
+        "required": ["subquestions"]
+    }
+
+
+def parse_subquestions(text: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Planner output as [{"question", "depends_on"}], deduplicated, at most
+    `limit`, with dependencies only on earlier questions (so no cycles).
+    Falls back to question lines when the output is not JSON.
+    """
+    try:
+        items = json.loads(text)
+        items = items.get("subquestions", []) if isinstance(items, dict) else items
+    except ValueError:
+        items = [re.sub(r"^[\s\-*\d.)]+", "", line).strip() for line in text.splitlines() if line.strip().endswith("?")]
+
+    questions: List[Dict[str, Any]] = []
+    index_of: Dict[int, int] = {}
+    seen: Dict[str, int] = {}
+    for position, item in enumerate(items if isinstance(items, list) else []):
+        if isinstance(item, str):
+            item = {"question": item, "depends_on": []}
+        if not isinstance(item, dict):
+            continue
+        question = str(item.get("question") or "").strip()
+        if question.lower() in seen:
+            # Dependencies on a repeated question point at its first occurrence
+            index_of[position] = seen[question.lower()]
+            continue
+        if not question or len(questions) >= limit:
+            continue
+        seen[question.lower()] = len(questions)
+        depends_on = item.get("depends_on") if isinstance(item.get("depends_on"), list) else []
+        index_of[position] = len(questions)
+        questions.append({
+            "question": question,
+            "depends_on": sorted({index_of[d] for d in depends_on if isinstance(d, int) and d in index_of})
+        })
+    return questions
+
+
+def critical_path(nodes: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Longest dependency chain as it actually ran: start from the node that
+    finished last and walk back through whichever input finished last.
+    `nodes` maps id -> {"deps", "started", "finished"} (seconds from the
+    graph start). `wall_seconds - seconds` is time spent queued for a slot.
+    """
+    finished = {node_id: node for node_id, node in nodes.items() if node.get("finished") is not None}
+    if not finished:
+        return {"nodes": [], "seconds": 0.0, "wall_seconds": 0.0, "work_seconds": 0.0, "parallelism": 0.0}
+
+    path = []
+    current: Optional[str] = max(finished, key=lambda n: finished[n]["finished"])
+    while current is not None:
+        path.append(current)
+        deps = [d for d in finished[current].get("deps", []) if d in finished]
+        current = max(deps, key=lambda d: finished[d]["finished"]) if deps else None
+    path.reverse()
+
+    work = sum(node["finished"] - node["started"] for node in finished.values())
+    wall = max(node["finished"] for node in finished.values())
+    return {
+        "nodes": path,
+        "seconds": round(sum(finished[n]["finished"] - finished[n]["started"] for n in path), 3),
+        "wall_seconds": round(wall, 3),
+        "work_seconds": round(work, 3),
+        "parallelism": round(work / wall, 2) if wall > 0 else 0.0
+    }
+
+
+class DagExecutor:
+    """Runs node handlers once their dependencies have finished"""
+
+    def __init__(self, concurrency: int = 3):
+        self.concurrency = max(1, concurrency)
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self._start = 0.0
+
+    def add(self,
+            node_id: str,
+            handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+            deps: Iterable[str] = (),
+            allow_partial: bool = False,
+            **meta: Any):
+        """
+        Add a node. Dependencies must already exist, so the graph stays
+        acyclic. The handler gets {dep id: result} of the dependencies that
+        succeeded; with allow_partial the node still runs when some failed,
+        otherwise it is skipped.
+        """
+        deps = list(deps)
+        if node_id in self.nodes:
+            raise ValueError(f"Duplicate node {node_id}")
+        missing = [d for d in deps if d not in self.nodes]
+        if missing:
+            raise ValueError(f"Node {node_id} depends on unknown nodes {missing}")
+        self.nodes[node_id] = {
+            "handler": handler,
+            "deps": deps,
+            "allow_partial": allow_partial,
+            "status": "waiting",
+            "started": None,
+            "finished": None,
+            "result": None,
+            "error": None,
+            "meta": meta
+        }
+
+    def annotate(self, node_id: str, **meta: Any):
+        """Attach details (model used, memoized...) reported with the node's timing"""
+        self.nodes[node_id]["meta"].update(meta)
+
+    def _ready(self) -> List[str]:
+        """Waiting nodes whose inputs are all settled (skipping those with failed inputs, transitively)"""
+        skipped = True
+        while skipped:
+            skipped = False
+            ready = []
+            for node_id, node in self.nodes.items():
+                if node["status"] != "waiting":
+                    continue
+                states = [self.nodes[d]["status"] for d in node["deps"]]
+                if not all(state in DONE_STATES for state in states):
+                    continue
+                if any(state != "done" for state in states) and not node["allow_partial"]:
+                    node["status"] = "skipped"
+                    skipped = True
+                    continue
+                ready.append(node_id)
+        return ready
+
+    async def _run_node(self, node_id: str, semaphore: asyncio.Semaphore) -> Any:
+        node = self.nodes[node_id]
+        inputs = {d: self.nodes[d]["result"] for d in node["deps"] if self.nodes[d]["status"] == "done"}
+        async with semaphore:
+            node["started"] = time.perf_counter() - self._start
+            try:
+                return await node["handler"](inputs)
+            finally:
+                node["finished"] = time.perf_counter() - self._start
+
+    async def run(self) -> Dict[str, Any]:
+        """Run until every node is done, failed or skipped; returns results of the nodes that succeeded"""
+        self._start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while True:
+                for node_id in self._ready():
+                    self.nodes[node_id]["status"] = "running"
+                    running[asyncio.create_task(self._run_node(node_id, semaphore))] = node_id
+                if not running:
+                    break
+
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    node = self.nodes[running.pop(task)]
+                    if task.exception() is not None:
+                        node["status"] = "failed"
+                        node["error"] = str(task.exception())
+                    else:
+                        node["status"] = "done"
+                        node["result"] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return {node_id: node["result"] for node_id, node in self.nodes.items() if node["status"] == "done"}
+
+    def timing(self) -> Dict[str, Any]:
+        """Per-node status and timing plus the critical path"""
+        nodes = {
+            node_id: {
+                "deps": node["deps"],
+                "status": node["status"],
+                "started": round(node["started"], 3) if node["started"] is not None else None,
+                "finished": round(node["finished"], 3) if node["finished"] is not None else None,
+                **({"error": node["error"]} if node["error"] else {}),
+                **node["meta"]
+            }
+            for node_id, node in self.nodes.items()
+        }
+        return {"nodes": nodes, "critical_path": critical_path(nodes)}
@@ -0,0 +1,455 @@
+# src/research_pipeline.py
+"""
+Research job pipeline shared by the API server (inline mode) and the
+out-of-process research workers
+Runs the stages in order, checkpointing each one in the JobStore; the
+synthesis stage of decomposed jobs is a graph of parallel sub-questions
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from artifact_store import memo_key
+from hello_agent import HelloAgent
+from inference_backends import iterate_in_thread
+from job_events import ReportSectionTracker
+from job_store import JobStore
+from reranker import estimate_tokens, pack_chunks
+from research_dag import PLAN_PROMPT, DagExecutor, critical_path, parse_subquestions, plan_schema
+
+
+class ResearchPipeline:
+    """Runs the research stages for a job, skipping checkpointed stages"""
+
+    def __init__(self,
+                 conductor,
+                 store: JobStore,
+                 update_job: Callable[..., None],
+                 publish: Callable[[str, str, Any], None],
+                 on_results: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 retriever=None,
+                 reranker=None,
+                 fetcher=None,
+                 artifacts=None,
+                 exporter=None):
+        self.conductor = conductor
+        # HybridRetriever for include_rag jobs (None disables retrieval)
+        self.retriever = retriever
+        # Optional CrossEncoderReranker between retrieval and generation
+        self.reranker = reranker
+        self.rerank_candidates = int(os.environ.get("RERANK_CANDIDATES", "50"))
+        # SourceFetcher for the request's source URLs (None skips fetching)
+        self.fetcher = fetcher
+        # ArtifactStore for reports and source text, and for reusing results
+        # across jobs (None keeps everything inline in the job results)
+        self.artifacts = artifacts
+        # ReportExporter rendering md/html/pdf/json files of finished jobs (None skips)
+        self.exporter = exporter
+        self.store = store
+        self.update_job = update_job
+        self.publish = publish
+        self.on_results = on_results
+        # Characters of each fetched page quoted in the report prompt
+        self.source_summary_chars = int(os.environ.get("SOURCE_SUMMARY_CHARS", "400"))
+        # Sub-question nodes generating at once in decomposed jobs
+        self.dag_concurrency = int(os.environ.get("DAG_CONCURRENCY", "3"))
+
+        # (stage name, progress when the stage starts, handler)
+        self.stages = [
+            ("web_research", 10, self._stage_web_research),
+            ("document_analysis", 30, self._stage_document_analysis),
+            ("synthesis", 60, self._stage_synthesis),
+            ("report_generation", 90, self._stage_report_generation),
+        ]
+
+    def job_timeout(self, complexity: Optional[str]) -> float:
+        """Wall-clock limit for a job of this complexity tier"""
+        tier = self.conductor.task_complexity.get(complexity) or self.conductor.task_complexity["standard"]
+        return tier.get("job_timeout", 600)
+
+    async def execute(self, job_id: str, request: Dict[str, Any]):
+        """
+        Run a job to a terminal state (completed, failed, timed_out, cancelled).
+
+        CancelledError is re-raised. If the cancellation was not requested by
+        a client (server or worker shutdown), the job is left "processing" so
+        it resumes from its checkpoints.
+        """
+        complexity = request.get("complexity") or "standard"
+        timeout = self.job_timeout(complexity)
+
+        try:
+            results = await asyncio.wait_for(self.run(job_id, request), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.finish_job(job_id, status="timed_out", completed_at=datetime.now(),
+                            error=f"Job exceeded the {timeout}s limit for '{complexity}' jobs")
+            return
+        except asyncio.CancelledError:
+            if self.store.is_cancel_requested(job_id):
+                self.finish_job(job_id, status="cancelled", completed_at=datetime.now())
+            raise
+        except Exception as e:
+            self.finish_job(job_id, status="failed", error=str(e))
+            return
+
+        self.store.save_results(job_id, results)
+        if self.exporter is not None:
+            # Render the downloadable reports here, once, rather than per request
+            try:
+                await asyncio.to_thread(self.exporter.export, job_id, request["topic"], self.expand_results(results))
+            except Exception as e:
+                print(f"⚠️ Report export failed for job {job_id}: {e}")
+        if self.on_results is not None:
+            self.on_results(job_id, results)
+
+        # Mark job as completed
+        self.finish_job(job_id, status="completed", stage=None, progress=100, completed_at=datetime.now())
+
+    def finish_job(self, job_id: str, **fields):
+        """Record a terminal state; the job will not resume, so its checkpoints go"""
+        self.update_job(job_id, **fields)
+        self.store.clear_checkpoints(job_id)
+
+    async def run(self, job_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the remaining stages and build the job results"""
+        checkpoints = await asyncio.to_thread(self.store.load_checkpoints, job_id)
+
+        for stage, progress, handler in self.stages:
+            if stage in checkpoints:
+                continue
+            self.update_job(job_id, status="processing", stage=stage, progress=progress)
+            checkpoints[stage] = await handler(job_id, request, checkpoints)
+            await asyncio.to_thread(self.store.save_checkpoint, job_id, stage, checkpoints[stage])
+
+        report = checkpoints["report_generation"]
+        results = {
+            "model_used": report["model_used"],
+            "sources": checkpoints["web_research"]["sources"],
+            "processing_time": report["processing_time"],
+            "retrieval": report.get("retrieval"),
+            "timestamp": datetime.now(),
+            "complexity": request.get("complexity"),
+            "config": {
+                "max_sources": request.get("max_sources"),
+                "include_rag": request.get("include_rag"),
+                "complexity": request.get("complexity")
+            }
+        }
+        # Jobs hold the report by hash; expand_results() loads it back
+        if "report_artifact" in report:
+            results["report_artifact"] = report["report_artifact"]
+            results["reused"] = report.get("reused", False)
+            hashes = [report["report_artifact"]] + [source.get("artifact") for source in results["sources"]]
+            await asyncio.to_thread(self.artifacts.add_refs, job_id, hashes)
+        else:
+            results["report"] = report["report"]
+
+        synthesis = checkpoints["synthesis"]
+        if synthesis.get("dag"):
+            results["subquestions"] = synthesis["subquestions"]
+            results["dag"] = self._dag_timing(synthesis, report)
+        return results
+
+    @staticmethod
+    def _dag_timing(synthesis: Dict[str, Any], report: Dict[str, Any]) -> Dict[str, Any]:
+        """The synthesis graph's timing with report generation as its final node"""
+        nodes = dict(synthesis["dag"]["nodes"])
+        # The report stage starts when the graph is finished and waits on every answer
+        start = max((node["finished"] for node in nodes.values() if node["finished"] is not None), default=0.0)
+        answered = [node_id for node_id, node in nodes.items() if node_id != "plan" and node["status"] == "done"]
+        nodes["report"] = {
+            "deps": answered or ["plan"],
+            "status": "done",
+            "started": start,
+            "finished": round(start + report["processing_time"], 3),
+            "model": report["model_used"],
+            "memoized": report.get("reused", False)
+        }
+        return {"nodes": nodes, "critical_path": critical_path(nodes)}
+
+    def expand_results(self, results: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Job results with the report text loaded from the artifact store"""
+        if results is None or "report" in results or "report_artifact" not in results or self.artifacts is None:
+            return results
+        return {**results, "report": self.artifacts.get_text(results["report_artifact"])}
+
+    async def _stage_web_research(self, job_id: str, request: Dict[str, Any], checkpoints: Dict[str, Any]) -> Dict[str, Any]:
+        urls = (request.get("sources") or [])[:request.get("max_sources") or 10]
+        if not urls or self.fetcher is None:
+            return {"sources": []}
+
+        pages = await self.fetcher.fetch_all(urls)
+        sources = []
+        for page in pages:
+            source = {key: page[key] for key in ("url", "title", "status", "cache", "error")}
+            if page["text"]:
+                source["artifact"] = await asyncio.to_thread(self._ingest, page)
+                # Opening of the page for the report prompt
+                source["summary"] = " ".join(page["text"].split())[:self.source_summary_chars]
+            sources.append(source)
+            self.publish(job_id, "source", source)
+        return {"sources": sources}
+
+    def _ingest(self, page: Dict[str, Any]) -> Optional[str]:
+        """Store a page's text and add it to the RAG index unless that exact text is already there"""
+        if self.artifacts is None:
+            # Without the store only newly fetched pages are indexed; cached ones already are
+            if page["cache"] == "miss" and self.retriever is not None:
+                self.retriever.add_document(page["text"], page["url"], {"title": page["title"]})
+            return None
+
+        digest = self.artifacts.put_text(page["text"], "source")
+        if self.retriever is not None:
+            key = memo_key("ingested", self.retriever.path, page["url"], digest)
+            if self.artifacts.memo_get(key) is None:
+                self.retriever.add_document(page["text"], page["url"], {"title": page["title"]})
+                self.artifacts.memo_put(key, digest)
+        return digest
+
+    async def _stage_document_analysis(self, job_id: str, request: Dict[str, Any], checkpoints: Dict[str, Any]) -> Dict[str, Any]:
+        if not request.get("include_rag") or self.retriever is None:
+            return {"chunks": []}
+        rerank = self.reranker is not None and request.get("rerank") is not False
+        if not rerank:
+            # Hybrid retrieval over the ingested documents
+            chunks = await asyncio.to_thread(self.retriever.search, request["topic"], request.get("max_sources") or 10)
+            return {"chunks": chunks}
+
+        # Retrieve a wider candidate set and let the cross-encoder order it
+        candidates = await asyncio.to_thread(self.retriever.search, request["topic"], self.rerank_candidates)
+        start_time = time.perf_counter()
+        chunks = await asyncio.to_thread(self.reranker.rerank, request["topic"], candidates)
+        return {
+            "chunks": chunks,
+            "reranked": any("rerank_score" in chunk for chunk in chunks),
+            "rerank_ms": (time.perf_counter() - start_time) * 1000
+        }
+
+    def _decompose(self, request: Dict[str, Any]) -> bool:
+        """Whether the job plans sub-questions first (by default complex and critical jobs do)"""
+        decompose = request.get("decompose")
+        if decompose is None:
+            decompose = (request.get("complexity") or "standard") in ("complex", "critical")
+        return bool(decompose) and (request.get("max_subquestions") or 4) > 0
+
+    async def _generate_node(self,
+                             dag: DagExecutor,
+                             node_id: str,
+                             task_type: str,
+                             complexity: str,
+                             prompt: str,
+                             request: Dict[str, Any],
+                             output_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """One graph node's generation, routed to its own model and reused across jobs"""
+        model = await asyncio.to_thread(self.conductor.select_model, task_type=task_type, complexity=complexity)
+        options, keep_alive = self.conductor.generation_options(complexity, model, prompt_tokens=estimate_tokens(prompt))
+
+        node_key = None
+        if self.artifacts is not None:
+            node_key = memo_key("dag_node", model, prompt, options, output_format)
+            if request.get("reuse_cached", True):
+                digest = await asyncio.to_thread(self.artifacts.memo_get, node_key)
+                text = await asyncio.to_thread(self.artifacts.get_text, digest) if digest else None
+                if text is not None:
+                    dag.annotate(node_id, model=model, memoized=True)
+                    return {"text": text, "model": model, "memoized": True}
+
+        agent = HelloAgent(model_name=model, router=self.conductor.router)
+        messages = [{'role': 'user', 'content': prompt}]
+        parts = []
+        final_chunk: Dict[str, Any] = {}
+        async for chunk in iterate_in_thread(lambda: agent.stream_chat(messages, options, keep_alive, format=output_format)):
+            parts.append(chunk['content'])
+            if chunk.get('done'):
+                final_chunk = chunk
+        text = "".join(parts)
+        model = final_chunk.get("model") or model
+
+        if node_key is not None and not final_chunk.get("downshifted_from"):
+            digest = await asyncio.to_thread(self.artifacts.put_text, text, "dag_node")
+            await asyncio.to_thread(self.artifacts.memo_put, node_key, digest)
+        dag.annotate(node_id, model=model, memoized=False)
+        return {"text": text, "model": model, "memoized": False}
+
+    async def _stage_synthesis(self, job_id: str, request: Dict[str, Any], checkpoints: Dict[str, Any]) -> Dict[str, Any]:
+        if not self._decompose(request):
+            return {}
+
+        topic = request["topic"]
+        limit = request.get("max_subquestions") or 4
+        complexity = request.get("complexity") or "standard"
+        dag = DagExecutor(self.dag_concurrency)
+
+        async def answer(index: int, question: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+            context = ""
+            if request.get("include_rag") and self.retriever is not None:
+                chunks = await asyncio.to_thread(self.retriever.search, question, 4)
+                context = "\n\n".join(f"({chunk.get('source') or 'document'}) {chunk['text']}" for chunk in chunks)
+            earlier = [finding for node_id, finding in inputs.items() if node_id != "plan"]
+            background = "\n\n".join(f"Q: {finding['question']}\nA: {finding['answer']}" for finding in earlier)
+            sections = [f"Research topic: {topic}", f"Answer this sub-question concisely, with the key facts only: {question}"]
+            if background:
+                sections.append("Answers to the questions it builds on:\n" + background)
+            if context:
+                sections.append("Context from our documents:\n" + context)
+            prompt = "\n\n".join(sections)
+            # Questions that combine earlier answers get the job's tier, independent ones a standard model
+            node = await self._generate_node(
+                dag, f"q{index}", "analysis" if earlier else "rag_query",
+                complexity if earlier else "standard", prompt, request
+            )
+            finding = {"question": question, "answer": node["text"], "model": node["model"], "memoized": node["memoized"]}
+            self.publish(job_id, "subquestion", {"index": index, **finding})
+            return finding
+
+        async def plan(inputs: Dict[str, Any]) -> Dict[str, Any]:
+            node = await self._generate_node(
+                dag, "plan", "research_planning", "standard",
+                PLAN_PROMPT.format(limit=limit, topic=topic), request, plan_schema(limit)
+            )
+            questions = parse_subquestions(node["text"], limit)
+            for index, question in enumerate(questions):
+                dag.add(
+                    f"q{index}",
+                    lambda inputs, index=index, question=question["question"]: answer(index, question, inputs),
+                    deps=["plan"] + [f"q{d}" for d in question["depends_on"]],
+                    question=question["question"]
+                )
+            return {"subquestions": questions}
+
+        dag.add("plan", plan)
+        outputs = await dag.run()
+        return {
+            "subquestions": [outputs[node_id] for node_id in dag.nodes if node_id != "plan" and node_id in outputs],
+            "dag": dag.timing()
+        }
+
+    async def _stage_report_generation(self, job_id: str, request: Dict[str, Any], checkpoints: Dict[str, Any]) -> Dict[str, Any]:
+        # Generate research result using model conductor
+        selected_model = await asyncio.to_thread(
+            self.conductor.select_model,
+            task_type="research",
+            complexity=request.get("complexity")
+        )
+
+        agent = HelloAgent(model_name=selected_model, router=self.conductor.router)
+        options, keep_alive = self.conductor.generation_options(
+            request.get("complexity") or "standard", selected_model, request.get("options")
+        )
+        # Pack the best chunks into what the model's context leaves after the
+        # instructions and the reply
+        analysis = checkpoints["document_analysis"]
+        candidates = analysis.get("chunks") or []
+        # Answers to the planned sub-questions (decomposed jobs) go in first
+        findings = "\n\n".join(
+            f"Q: {finding['question']}\nA: {finding['answer']}"
+            for finding in checkpoints["synthesis"].get("subquestions") or []
+        )
+        # Pages fetched for this job, cited as [S1], [S2]...
+        sources = "\n".join(
+            f"[S{i}] {source.get('title') or source['url']} <{source['url']}>: {source['summary']}"
+            for i, source in enumerate(
+                [s for s in checkpoints["web_research"]["sources"] if s.get("summary")], start=1)
+        )
+        profile = self.conductor.model_profiles.get(selected_model, {})
+        budget = (profile.get("max_context", 4096) - options.get("num_predict", 1024) - 300
+                  - estimate_tokens(findings) - estimate_tokens(sources))
+        chunks = pack_chunks(candidates, max(budget, 0))
+
+        context = ""
+        if chunks:
+            context = "Use this context from our documents, citing it like [1]:\n" + "\n\n".join(
+                f"[{i}] ({chunk.get('source') or 'document'}) {chunk['text']}" for i, chunk in enumerate(chunks, start=1)
+            )
+        if findings:
+            context = "Findings for the sub-questions of this topic:\n" + findings + ("\n\n" + context if context else "")
+        if sources:
+            context = "Sources fetched for this topic, cite them like [S1]:\n" + sources + ("\n\n" + context if context else "")
+        research_prompt = f"""
+        Conduct research on the topic: {request["topic"]}
+        {context}
+
+        Please provide:
+        1. Executive Summary
+        2. Key Findings
+        3. Important Sources (only the sources and documents given above; say so if there are none)
+        4. Recommendations
+
+        Keep it concise but informative.
+        """
+        options, keep_alive = self.conductor.generation_options(
+            request.get("complexity") or "standard", selected_model, request.get("options"),
+            prompt_tokens=estimate_tokens(research_prompt)
+        )
+
+        retrieval = None
+        if candidates:
+            retrieval = {"candidates": len(candidates), "packed": len(chunks), "reranked": bool(analysis.get("reranked"))}
+
+        # An identical prompt for the same model and options was answered by an
+        # earlier job - reuse that report instead of generating it again
+        start_time = time.time()
+        tracker = ReportSectionTracker()
+        report_key = None
+        if self.artifacts is not None:
+            report_key = memo_key("report", selected_model, research_prompt, options)
+            if request.get("reuse_cached", True):
+                digest = await asyncio.to_thread(self.artifacts.memo_get, report_key)
+                cached = await asyncio.to_thread(self.artifacts.get_text, digest) if digest else None
+                if cached is not None:
+                    for section in tracker.feed(cached) + tracker.finish():
+                        self.publish(job_id, "section", section)
+                    return {
+                        "report_artifact": digest,
+                        "model_used": selected_model,
+                        "processing_time": time.time() - start_time,
+                        "retrieval": retrieval,
+                        "reused": True
+                    }
+
+        # Stream the report, publishing sections as they are written. Cancelling
+        # the job closes the stream, which aborts the generation in Ollama.
+        report_parts = []
+        messages = [{'role': 'user', 'content': research_prompt}]
+
+        final_chunk: Dict[str, Any] = {}
+        async for chunk in iterate_in_thread(lambda: agent.stream_chat(messages, options, keep_alive)):
+            report_parts.append(chunk['content'])
+            if chunk.get('done'):
+                final_chunk = chunk
+            for section in tracker.feed(chunk['content']):
+                self.publish(job_id, "section", section)
+
+        for section in tracker.finish():
+            self.publish(job_id, "section", section)
+
+        if candidates:
+            if analysis.get("reranked") and self.reranker is not None:
+                # Report whether reranking paid for itself in prefill time
+                self.reranker.record_prefill(final_chunk.get('prompt_eval_count'), final_chunk.get('prompt_eval_ms'))
+                retrieval.update(self.reranker.tradeoff(
+                    sum(estimate_tokens(chunk["text"]) for chunk in candidates),
+                    sum(estimate_tokens(chunk["text"]) for chunk in chunks),
+                    analysis.get("rerank_ms", 0.0)
+                ))
+
+        result = {
+            "model_used": final_chunk.get("model") or selected_model,
+            "processing_time": time.time() - start_time,
+            "retrieval": retrieval
+        }
+        if final_chunk.get("downshifted_from"):
+            # The selected model ran out of memory and a smaller one wrote the report
+            result["downshifted_from"] = final_chunk["downshifted_from"]
+        report = "".join(report_parts)
+        if self.artifacts is None:
+            result["report"] = report
+            return result
+
+        result["report_artifact"] = await asyncio.to_thread(self.artifacts.put_text, report, "report")
+        if "downshifted_from" not in result:
+            await asyncio.to_thread(self.artifacts.memo_put, report_key, result["report_artifact"])
+        return result
@@ -0,0 +1,223 @@
+# src/research_worker.py
+"""
+Out-of-process research workers
+Pull jobs from the durable SQLite queue in the JobStore and run the research
+pipeline outside the API process, so heavy stages never steal cycles from
+request handling and API reloads don't kill jobs.
+
+Usage (from src/):
+    python -m research_worker --workers 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Any, Dict, Optional, Set
+
+from artifact_store import ArtifactStore
+from embeddings import EmbeddingModel
+from job_events import job_status_event
+from job_store import JobStore
+from model_conductor import ModelConductor
+from reranker import CrossEncoderReranker
+from report_export import ReportExporter
+from research_pipeline import ResearchPipeline
+from resource_monitor import ResourceMonitor
+from retrieval import HybridRetriever
+from shared_state import SharedState
+from source_fetcher import SourceFetcher
+
+
+class ResearchWorker:
+    """Claims queued jobs and runs them, heartbeating the lease while they run"""
+
+    def __init__(self,
+                 worker_id: str,
+                 store: Optional[JobStore] = None,
+                 concurrency: int = 1,
+                 lease_seconds: float = 60.0,
+                 poll_interval: float = 1.0):
+        self.worker_id = worker_id
+        self.store = store or JobStore()
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        # Workers always run beside the API process, so usage and spend are shared
+        self.resources = ResourceMonitor() if os.environ.get("RESOURCE_MONITOR", "1") != "0" else None
+        self.conductor = ModelConductor(shared_state=SharedState(), resource_monitor=self.resources)
+        artifacts = ArtifactStore()
+        self.pipeline = ResearchPipeline(
+            self.conductor,
+            self.store,
+            update_job=self.update_job,
+            publish=self.store.append_event,
+            on_results=self._remember_results,
+            retriever=HybridRetriever(EmbeddingModel(), artifacts=artifacts),
+            reranker=CrossEncoderReranker() if os.environ.get("RERANK") == "1" else None,
+            fetcher=SourceFetcher(artifacts=artifacts),
+            artifacts=artifacts,
+            exporter=ReportExporter()
+        )
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._active: Set[asyncio.Task] = set()
+        self._stopping = False
+        # Relayed events are only needed until the API has read them
+        self.event_retention = float(os.environ.get("JOB_EVENT_RETENTION", "3600"))
+        self._pruned_at = 0.0
+
+    def _remember_results(self, job_id: str, results: Dict[str, Any]):
+        # The completion event carries the full report for SSE clients
+        self._results[job_id] = self.pipeline.expand_results(results)
+
+    def update_job(self, job_id: str, **fields):
+        """Persist a job update and append its event for the API to relay"""
+        stored = self.store.get_job(job_id)
+        if stored is None:
+            return
+        job = stored["record"]
+        job.update(fields)
+        job["version"] = job.get("version", 0) + 1
+        self.store.save_job(job)
+
+        event, data = job_status_event(job_id, job, self._results.pop(job_id, None))
+        self.store.append_event(job_id, event, data)
+
+    async def run_job(self, job_id: str, request: Dict[str, Any]):
+        """Run one claimed job; watch for cancellation and keep the lease alive"""
+        print(f"🔧 [{self.worker_id}] Running research job {job_id}")
+        task = asyncio.create_task(self.pipeline.execute(job_id, request))
+        since_heartbeat = 0.0
+        lost_lease = False
+
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.poll_interval)
+                if task.done():
+                    break
+
+                if await asyncio.to_thread(self.store.is_cancel_requested, job_id):
+                    task.cancel()
+
+                since_heartbeat += self.poll_interval
+                if since_heartbeat >= self.lease_seconds / 3:
+                    since_heartbeat = 0.0
+                    if not await asyncio.to_thread(self.store.extend_lease, job_id, self.worker_id, self.lease_seconds):
+                        # Our lease expired and another worker took over the job
+                        lost_lease = True
+                        task.cancel()
+
+            await task
+        except asyncio.CancelledError:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            if lost_lease:
+                return
+            if self._stopping and not self.store.is_cancel_requested(job_id):
+                # Shutting down - hand the job back; it resumes from its checkpoints
+                self.store.release(job_id, self.worker_id)
+                return
+
+        self.store.finish(job_id)
+
+    async def run(self):
+        """Claim and run jobs until stopped"""
+        print(f"🚀 Research worker {self.worker_id} started (concurrency {self.concurrency})")
+        if self.resources is not None:
+            self.resources.start()
+        while not self._stopping:
+            # Pick up catalogue edits (throttled to one stat() per reload interval)
+            self.conductor.catalogue.maybe_reload()
+
+            if time.time() - self._pruned_at >= 300:
+                self._pruned_at = time.time()
+                await asyncio.to_thread(self.store.prune_events, self.event_retention)
+
+            if len(self._active) >= self.concurrency:
+                await asyncio.wait(self._active, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            claimed = await asyncio.to_thread(self.store.claim, self.worker_id, self.lease_seconds)
+            if claimed is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            job_id, request = claimed
+            task = asyncio.create_task(self.run_job(job_id, request))
+            self._active.add(task)
+            task.add_done_callback(self._active.discard)
+
+        await self.shutdown()
+
+    async def shutdown(self):
+        """Stop claiming and cancel running jobs (they are released back to the queue)"""
+        self._stopping = True
+        for task in list(self._active):
+            task.cancel()
+        if self._active:
+            await asyncio.gather(*self._active, return_exceptions=True)
+        if self.resources is not None:
+            self.resources.stop()
+
+    def stop(self):
+        self._stopping = True
+
+
+def worker_main(index: int, concurrency: int):
+    """Entry point for one worker process"""
+    worker = ResearchWorker(
+        worker_id=f"{socket.gethostname()}-{os.getpid()}-{index}",
+        concurrency=concurrency
+    )
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        main_task = asyncio.current_task()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, lambda: (worker.stop(), main_task.cancel()))
+        try:
+            await worker.run()
+        except asyncio.CancelledError:
+            await worker.shutdown()
+
+    asyncio.run(run())
+    print(f"👋 Research worker {worker.worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Research Agent background workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Jobs each worker process runs at once")
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        worker_main(0, args.concurrency)
+        return
+
+    processes = [
+        multiprocessing.Process(target=worker_main, args=(i, args.concurrency), name=f"research-worker-{i}")
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Forward Ctrl+C / SIGTERM to the children and wait for them to release their jobs
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+# src/resource_monitor.py
+"""
+Host resource monitor
+Samples CPU, memory availability (cgroup limits included), this process's
+RSS, Ollama process RSS and Docker container (Milvus) memory/CPU from procfs
+and cgroups on Linux, with a vm_stat/ps fallback on macOS. A background
+thread keeps a ring buffer of samples for /status, /analytics and the
+conductor's memory checks
+
+Usage (from src/):
+    python resource_monitor.py            # one report
+    python resource_monitor.py --watch 5  # every 5 seconds
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from lazy_imports import lazy_import
+
+httpx = lazy_import("httpx")
+
+GB = 1024 ** 3
+CGROUP_ROOT = "/sys/fs/cgroup"
+DOCKER_SOCKET = "/var/run/docker.sock"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _read_int(path: str) -> Optional[int]:
+    text = _read(path)
+    if text is None:
+        return None
+    text = text.strip()
+    return None if text in ("", "max") else int(text)
+
+
+def read_meminfo() -> Dict[str, int]:
+    """/proc/meminfo in bytes"""
+    info = {}
+    for line in (_read("/proc/meminfo") or "").splitlines():
+        name, _, value = line.partition(":")
+        parts = value.split()
+        if parts:
+            info[name] = int(parts[0]) * (1024 if len(parts) > 1 else 1)
+    return info
+
+
+def cgroup_memory() -> Tuple[Optional[int], Optional[int]]:
+    """(limit, usage) in bytes of this process's cgroup (v2, then v1); None when unlimited/unknown"""
+    relative = ""
+    for line in (_read("/proc/self/cgroup") or "").splitlines():
+        if line.startswith("0::"):
+            relative = line[3:].strip()
+    v2 = os.path.join(CGROUP_ROOT, relative.lstrip("/"))
+    limit = _read_int(os.path.join(v2, "memory.max"))
+    if limit is not None:
+        return limit, _read_int(os.path.join(v2, "memory.current"))
+
+    limit = _read_int(os.path.join(CGROUP_ROOT, "memory", "memory.limit_in_bytes"))
+    if limit is not None and limit < 1 << 60:  # v1 reports "unlimited" as a huge number
+        return limit, _read_int(os.path.join(CGROUP_ROOT, "memory", "memory.usage_in_bytes"))
+    return None, None
+
+
+def read_cpu_times() -> Optional[Tuple[int, int]]:
+    """(busy, total) jiffies over all CPUs from /proc/stat"""
+    line = (_read("/proc/stat") or "").split("\n", 1)[0]
+    if not line.startswith("cpu "):
+        return None
+    values = [int(v) for v in line.split()[1:]]
+    idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+    return sum(values) - idle, sum(values)
+
+
+def process_rss(pid: str = "self") -> Optional[int]:
+    """Resident set size in bytes from /proc/<pid>/statm"""
+    text = _read(f"/proc/{pid}/statm")
+    return int(text.split()[1]) * os.sysconf("SC_PAGE_SIZE") if text else None
+
+
+def process_cpu_seconds(pid: str = "self") -> Optional[float]:
+    text = _read(f"/proc/{pid}/stat")
+    if not text:
+        return None
+    fields = text.rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")  # utime + stime
+
+
+def find_processes(prefix: str) -> List[str]:
+    """PIDs whose command name starts with `prefix` (ollama, ollama_llama_server runners...)"""
+    pids = []
+    for pid in os.listdir("/proc"):
+        if pid.isdigit() and (_read(f"/proc/{pid}/comm") or "").startswith(prefix):
+            pids.append(pid)
+    return pids
+
+
+def container_cgroup(container_id: str) -> Optional[str]:
+    """cgroup directory of a Docker container (systemd or cgroupfs driver, v2 or v1)"""
+    for path in (
+        os.path.join(CGROUP_ROOT, "system.slice", f"docker-{container_id}.scope"),
+        os.path.join(CGROUP_ROOT, "docker", container_id),
+        os.path.join(CGROUP_ROOT, "memory", "docker", container_id),
+        os.path.join(CGROUP_ROOT, "memory", "system.slice", f"docker-{container_id}.scope"),
+    ):
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def container_usage(cgroup: str) -> Tuple[Optional[int], Optional[float]]:
+    """(memory bytes, CPU seconds) of a container cgroup"""
+    memory = _read_int(os.path.join(cgroup, "memory.current")) or _read_int(os.path.join(cgroup, "memory.usage_in_bytes"))
+    for line in (_read(os.path.join(cgroup, "cpu.stat")) or "").splitlines():
+        if line.startswith("usage_usec"):
+            return memory, int(line.split()[1]) / 1e6
+    cpuacct = _read_int(cgroup.replace("/memory/", "/cpuacct/") + "/cpuacct.usage")
+    return memory, cpuacct / 1e9 if cpuacct is not None else None
+
+
+class ResourceMonitor:
+    """Low-overhead background sampler with a ring buffer of recent samples"""
+
+    def __init__(self,
+                 interval: Optional[float] = None,
+                 history: Optional[int] = None,
+                 container_filter: Optional[str] = None,
+                 ollama_process: str = "ollama"):
+        self.interval = interval or float(os.environ.get("RESOURCE_SAMPLE_INTERVAL", "5"))
+        self.samples: deque = deque(maxlen=history or int(os.environ.get("RESOURCE_HISTORY", "720")))
+        # Containers whose name contains this (the compose file names them research-*)
+        self.container_filter = container_filter or os.environ.get("RESOURCE_CONTAINERS", "research-")
+        self.ollama_process = ollama_process
+        self.linux = os.path.exists("/proc/meminfo")
+        self.cpu_count = os.cpu_count() or 1
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Previous counters for CPU percentages
+        self._last_cpu: Optional[Tuple[int, int]] = None
+        self._last_process_cpu: Optional[Tuple[float, float]] = None
+        self._last_container_cpu: Dict[str, Tuple[float, float]] = {}
+        # Container list from the Docker API, refreshed every minute
+        self._containers: List[Dict[str, str]] = []
+        self._containers_at = 0.0
+        self.sample_ms = 0.0
+
+    # Sampling
+
+    def _docker_containers(self) -> List[Dict[str, str]]:
+        if time.time() - self._containers_at < 60:
+            return self._containers
+        self._containers_at = time.time()
+        if not os.path.exists(DOCKER_SOCKET):
+            self._containers = []
+            return self._containers
+        try:
+            transport = httpx.HTTPTransport(uds=DOCKER_SOCKET)
+            with httpx.Client(transport=transport, base_url="http://docker", timeout=2) as client:
+                listed = client.get("/containers/json").json()
+            self._containers = [
+                {"id": c["Id"], "name": c["Names"][0].lstrip("/")}
+                for c in listed if any(self.container_filter in name for name in c.get("Names", []))
+            ]
+        except Exception:
+            self._containers = []
+        return self._containers
+
+    def _sample_containers(self, now: float) -> List[Dict[str, Any]]:
+        containers = []
+        for container in self._docker_containers():
+            cgroup = container_cgroup(container["id"])
+            if cgroup is None:
+                containers.append({"name": container["name"], "memory_gb": None, "cpu_percent": None})
+                continue
+            memory, cpu_seconds = container_usage(cgroup)
+            cpu_percent = None
+            previous = self._last_container_cpu.get(container["id"])
+            if cpu_seconds is not None:
+                if previous is not None and now > previous[0]:
+                    cpu_percent = (cpu_seconds - previous[1]) / (now - previous[0]) * 100
+                self._last_container_cpu[container["id"]] = (now, cpu_seconds)
+            containers.append({
+                "name": container["name"],
+                "memory_gb": round(memory / GB, 3) if memory is not None else None,
+                "cpu_percent": round(cpu_percent, 1) if cpu_percent is not None else None
+            })
+        return containers
+
+    def _sample_linux(self, now: float) -> Dict[str, Any]:
+        meminfo = read_meminfo()
+        total = meminfo.get("MemTotal", 0)
+        available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0))
+        limit, usage = cgroup_memory()
+        if limit is not None and limit < total:
+            # Inside a memory-limited container the limit is what matters
+            total = limit
+            available = min(available, limit - (usage or 0))
+
+        cpu_percent = None
+        cpu = read_cpu_times()
+        if cpu is not None:
+            if self._last_cpu is not None and cpu[1] > self._last_cpu[1]:
+                cpu_percent = (cpu[0] - self._last_cpu[0]) / (cpu[1] - self._last_cpu[1]) * 100
+            self._last_cpu = cpu
+
+        process_cpu = None
+        cpu_seconds = process_cpu_seconds()
+        if cpu_seconds is not None:
+            if self._last_process_cpu is not None and now > self._last_process_cpu[0]:
+                process_cpu = (cpu_seconds - self._last_process_cpu[1]) / (now - self._last_process_cpu[0]) * 100
+            self._last_process_cpu = (now, cpu_seconds)
+
+        ollama_pids = find_processes(self.ollama_process)
+        return {
+            "cpu_percent": round(cpu_percent, 1) if cpu_percent is not None else None,
+            "process_cpu_percent": round(process_cpu, 1) if process_cpu is not None else None,
+            "memory_total_gb": round(total / GB, 2),
+            "memory_available_gb": round(max(available, 0) / GB, 2),
+            "swap_used_gb": round((meminfo.get("SwapTotal", 0) - meminfo.get("SwapFree", 0)) / GB, 2),
+            "process_rss_gb": round((process_rss() or 0) / GB, 3),
+            "ollama_processes": len(ollama_pids),
+            "ollama_rss_gb": round(sum(process_rss(pid) or 0 for pid in ollama_pids) / GB, 2),
+            "containers": self._sample_containers(now)
+        }
+
+    def _sample_macos(self, now: float) -> Dict[str, Any]:
+        """vm_stat/sysctl/ps - slower than procfs, for development Macs"""
+        def run(*command: str) -> str:
+            try:
+                return subprocess.run(command, capture_output=True, text=True, timeout=5).stdout
+            except (OSError, subprocess.SubprocessError):
+                return ""
+
+        total = int(run("sysctl", "-n", "hw.memsize").strip() or 0)
+        vm_stat = run("vm_stat")
+        page_size = int(vm_stat.split("page size of ")[1].split()[0]) if "page size of " in vm_stat else 4096
+        pages = {}
+        for line in vm_stat.splitlines()[1:]:
+            name, _, value = line.partition(":")
+            if value.strip().rstrip(".").isdigit():
+                pages[name.strip()] = int(value.strip().rstrip("."))
+        available = sum(pages.get(k, 0) for k in ("Pages free", "Pages inactive", "Pages speculative")) * page_size
+
+        ollama_rss = 0
+        ollama_count = 0
+        process_rss_kb = 0
+        for line in run("ps", "-axo", "pid=,rss=,comm=").splitlines():
+            parts = line.split(None, 2)
+            if len(parts) < 3:
+                continue
+            if os.path.basename(parts[2]).startswith(self.ollama_process):
+                ollama_rss += int(parts[1]) * 1024
+                ollama_count += 1
+            if parts[0] == str(os.getpid()):
+                process_rss_kb = int(parts[1])
+
+        load = os.getloadavg()[0]
+        return {
+            "cpu_percent": round(min(100.0, load / self.cpu_count * 100), 1),  # 1-minute load as a proxy
+            "process_cpu_percent": None,
+            "memory_total_gb": round(total / GB, 2),
+            "memory_available_gb": round(available / GB, 2),
+            "swap_used_gb": None,
+            "process_rss_gb": round(process_rss_kb * 1024 / GB, 3),
+            "ollama_processes": ollama_count,
+            "ollama_rss_gb": round(ollama_rss / GB, 2),
+            "containers": []
+        }
+
+    def sample(self) -> Dict[str, Any]:
+        """Take one sample and append it to the ring buffer"""
+        start_time = time.perf_counter()
+        now = time.time()
+        sample = self._sample_linux(now) if self.linux else self._sample_macos(now)
+        sample["timestamp"] = now
+        sample["load_average"] = round(os.getloadavg()[0], 2) if hasattr(os, "getloadavg") else None
+        with self._lock:
+            self.samples.append(sample)
+            self.sample_ms = (time.perf_counter() - start_time) * 1000
+        return sample
+
+    # Background sampler
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"⚠️ Resource sampling failed: {e}")
+            self._stop.wait(self.interval)
+
+    # Views
+
+    def latest(self, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Most recent sample (None if there is none younger than max_age seconds)"""
+        with self._lock:
+            sample = self.samples[-1] if self.samples else None
+        if sample is None or (max_age is not None and time.time() - sample["timestamp"] > max_age):
+            return None
+        return sample
+
+    def available_gb(self) -> Optional[float]:
+        """Memory available right now (fresh sample), or None when unknown"""
+        sample = self.latest(max_age=self.interval * 3)
+        return sample["memory_available_gb"] if sample else None
+
+    def history(self, seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            samples = list(self.samples)
+        if seconds is not None:
+            samples = [s for s in samples if s["timestamp"] >= time.time() - seconds]
+        return samples
+
+    def get_stats(self, series_points: int = 120) -> Dict[str, Any]:
+        """Latest sample, min/avg/max over the buffer and a compact time series"""
+        samples = self.history()
+        summary = {}
+        for key in ("cpu_percent", "memory_available_gb", "process_rss_gb", "ollama_rss_gb"):
+            values = [s[key] for s in samples if s.get(key) is not None]
+            if values:
+                summary[key] = {"min": min(values), "avg": round(sum(values) / len(values), 3), "max": max(values)}
+        step = max(1, len(samples) // series_points)
+        return {
+            "platform": platform.system(),
+            "interval_seconds": self.interval,
+            "samples": len(samples),
+            "sample_ms": round(self.sample_ms, 2),
+            "latest": samples[-1] if samples else None,
+            "window": summary,
+            # [timestamp, cpu %, available GB, API RSS GB, Ollama RSS GB]
+            "series": [
+                [round(s["timestamp"], 1), s["cpu_percent"], s["memory_available_gb"], s["process_rss_gb"], s["ollama_rss_gb"]]
+                for s in samples[::step]
+            ]
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host resource monitor (Linux procfs/cgroups, macOS fallback)")
+    parser.add_argument("--watch", type=float, default=None, help="Repeat every N seconds")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    monitor = ResourceMonitor()
+    monitor.sample()  # Primes the CPU counters
+    time.sleep(0.5)
+    while True:
+        sample = monitor.sample()
+        if args.json:
+            print(json.dumps(sample))
+        else:
+            used = sample["memory_total_gb"] - sample["memory_available_gb"]
+            print(f"🖥️  {platform.node()} ({platform.system()}) - {time.strftime('%H:%M:%S')}")
+            print(f"💾 Memory: {used:.1f}GB used / {sample['memory_total_gb']:.1f}GB, "
+                  f"{sample['memory_available_gb']:.1f}GB available"
+                  + (f", swap {sample['swap_used_gb']:.1f}GB" if sample["swap_used_gb"] else ""))
+            print(f"🔥 CPU: {sample['cpu_percent']}% (load {sample['load_average']})")
+            if sample["ollama_processes"]:
+                print(f"🤖 Ollama: {sample['ollama_processes']} processes, {sample['ollama_rss_gb']:.1f}GB RSS")
+            else:
+                print("🤖 Ollama not running")
+            for container in sample["containers"]:
+                print(f"🐳 {container['name']}: {container['memory_gb']}GB, CPU {container['cpu_percent']}%")
+            if not sample["containers"]:
+                print(f"🐳 No containers matching '{monitor.container_filter}'")
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+        print()
+
+
+if __name__ == "__main__":
+    main()
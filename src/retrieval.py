@@ -0,0 +1,425 @@
+# src/retrieval.py
+"""
+Hybrid retrieval for RAG
+An in-process BM25 inverted index (exact entity/acronym matches) next to a
+dense vector index (sentence-transformers embeddings), queried in parallel
+and fused with reciprocal-rank fusion. Chunks and their embeddings are kept
+in SQLite so every process (API workers, research workers) rebuilds the same
+indexes and picks up new chunks incrementally
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from artifact_store import content_hash, memo_key
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "were", "with"
+}
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; hyphenated/dotted terms (gpt-4, u.s) stay whole"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> List[str]:
+    """Split text into ~chunk_size character chunks on whitespace, overlapping by `overlap`"""
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_size)
+        if end < len(text):
+            space = text.rfind(" ", start + chunk_size // 2, end)
+            end = space if space > start else end
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: score(d) = sum over lists of 1 / (k + rank)"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    if len(scores) <= k:
+        return np.argsort(-scores, kind="stable")
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index
+
+    Posting lists are compact typed arrays (uint32 doc ids, uint16 term
+    frequencies - 6 bytes per posting) appended as documents arrive, and
+    scored with NumPy on copies taken under the lock.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.postings: List[array] = []
+        self.frequencies: List[array] = []
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        # An array can't grow while a NumPy view of it exists, so readers copy
+        # what they need before releasing the lock
+        self._lock = threading.Lock()
+
+    @property
+    def doc_count(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, tokens: List[str]) -> int:
+        """Index one document; returns its doc id (ids are dense, in insertion order)"""
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        with self._lock:
+            doc_id = len(self.doc_lengths)
+            vocabulary_size = len(self.postings)
+            appended: List[int] = []
+            try:
+                for term, count in counts.items():
+                    term_id = self.vocabulary.get(term)
+                    if term_id is None:
+                        term_id = self.vocabulary[term] = len(self.postings)
+                        self.postings.append(array("I"))
+                        self.frequencies.append(array("H"))
+                    self.postings[term_id].append(doc_id)
+                    appended.append(term_id)
+                    self.frequencies[term_id].append(min(count, 65535))
+                self.doc_lengths.append(len(tokens))
+            except BaseException:
+                # All or nothing: a half-added document would misalign the postings
+                for term_id in appended:
+                    self.postings[term_id].pop()
+                    if len(self.frequencies[term_id]) > len(self.postings[term_id]):
+                        self.frequencies[term_id].pop()
+                for term in [t for t, i in self.vocabulary.items() if i >= vocabulary_size]:
+                    del self.vocabulary[term]
+                del self.postings[vocabulary_size:]
+                del self.frequencies[vocabulary_size:]
+                raise
+            self.total_length += len(tokens)
+        return doc_id
+
+    def search(self, query: str, k: int = 50) -> List[Tuple[int, float]]:
+        """(doc id, BM25 score) for the k best matching documents"""
+        terms = [t for t in dict.fromkeys(tokenize(query))]
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if n_docs == 0:
+                return []
+            doc_lengths = np.array(self.doc_lengths, dtype=np.uint32)
+            avg_length = self.total_length / n_docs
+            scores = np.zeros(n_docs, dtype=np.float32)
+            matched = False
+
+            for term in terms:
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    continue
+                matched = True
+                ids = np.array(self.postings[term_id], dtype=np.uint32)
+                tf = np.array(self.frequencies[term_id], dtype=np.float32)
+                idf = np.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_lengths[ids] / avg_length)
+                scores[ids] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if not matched:
+            return []
+        top = _top_k(scores, k)
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def memory_bytes(self) -> int:
+        """Approximate index size (posting arrays, doc lengths and vocabulary)"""
+        postings = sum(p.buffer_info()[1] * p.itemsize for p in self.postings)
+        frequencies = sum(f.buffer_info()[1] * f.itemsize for f in self.frequencies)
+        vocabulary = sum(len(term) + 60 for term in self.vocabulary)  # key + dict entry + int
+        return postings + frequencies + vocabulary + len(self.doc_lengths) * 4
+
+
+class VectorIndex:
+    """Dense vectors (normalized float32) searched by cosine similarity"""
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self.count = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def add(self, vectors: np.ndarray) -> int:
+        """Append a batch of vectors; returns the row of the first one"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        with self._lock:
+            if self._vectors is None:
+                self.dim = vectors.shape[1]
+                self._vectors = np.empty((max(1024, len(vectors)), self.dim), dtype=np.float32)
+            needed = self.count + len(vectors)
+            if needed > len(self._vectors):
+                # Double the capacity; readers keep their reference to the old buffer
+                grown = np.empty((max(needed, 2 * len(self._vectors)), self.dim), dtype=np.float32)
+                grown[:self.count] = self._vectors[:self.count]
+                self._vectors = grown
+            first = self.count
+            self._vectors[first:needed] = vectors
+            self.count = needed
+        return first
+
+    def search(self, query_vector: np.ndarray, k: int = 50) -> List[Tuple[int, float]]:
+        """(row, cosine similarity) for the k nearest vectors"""
+        with self._lock:
+            if self._vectors is None or self.count == 0:
+                return []
+            vectors = self._vectors[:self.count]
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = vectors @ query
+        return [(int(i), float(scores[i])) for i in _top_k(scores, k)]
+
+    def memory_bytes(self) -> int:
+        return 0 if self._vectors is None else self._vectors.nbytes
+
+
+class HybridRetriever:
+    """Chunk store plus BM25 and vector indexes, fused with RRF"""
+
+    def __init__(self, embedding_model=None, path: Optional[str] = None, rrf_k: int = RRF_K, artifacts=None):
+        self.path = path or os.environ.get("RAG_INDEX_PATH", os.path.join("data", "documents.db"))
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.embedding_model = embedding_model
+        # ArtifactStore: chunk embeddings are computed once per model and text
+        self.artifacts = artifacts
+        self.rrf_k = rrf_k
+
+        self.lexical = BM25Index()
+        self.vectors = VectorIndex()
+        # Index position -> chunk id (rowid in SQLite)
+        self.lexical_ids = array("q")
+        self.vector_ids = array("q")
+        self._last_chunk_id = 0
+        self._refresh_lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrieval")
+        self.dense_error: Optional[str] = None
+        self.stats = {"queries": 0, "lexical_ms": 0.0, "vector_ms": 0.0, "total_ms": 0.0, "embeddings_reused": 0}
+
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT,
+                text TEXT NOT NULL,
+                metadata TEXT,
+                embedding BLOB,
+                created_at REAL NOT NULL
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Embeddings for texts, or None when no embedding model can be loaded (lexical only)"""
+        if self.embedding_model is None:
+            return None
+        try:
+            vectors = self.embedding_model.encode(texts, batch_size=32, normalize_embeddings=True)
+            self.dense_error = None
+            return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        except Exception as e:
+            if self.dense_error is None:
+                print(f"⚠️ Embeddings unavailable, retrieval is lexical only: {e}")
+            self.dense_error = str(e)
+            return None
+
+    def _embed_chunks(self, chunks: List[str]) -> Optional[np.ndarray]:
+        """Embeddings for document chunks, reusing the ones stored for identical text"""
+        if self.artifacts is None or self.embedding_model is None:
+            return self._embed(chunks)
+
+        model_name = getattr(self.embedding_model, "model_name", type(self.embedding_model).__name__)
+        keys = [memo_key("embedding", model_name, content_hash(chunk.encode())) for chunk in chunks]
+        cached: List[Optional[np.ndarray]] = []
+        for key in keys:
+            digest = self.artifacts.memo_get(key)
+            data = self.artifacts.get(digest) if digest else None
+            cached.append(np.frombuffer(data, dtype=np.float32) if data is not None else None)
+
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            computed = self._embed([chunks[i] for i in missing])
+            if computed is None:
+                return None
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+                self.artifacts.memo_put(keys[i], self.artifacts.put(vector.tobytes(), "embedding"))
+        self.stats["embeddings_reused"] += len(chunks) - len(missing)
+
+        if len({len(vector) for vector in cached}) != 1:
+            # The model's dimension changed since some were stored - recompute all
+            return self._embed(chunks)
+        return np.vstack(cached)
+
+    def refresh(self) -> int:
+        """Index chunks added since the last refresh (by this or another process)"""
+        with self._refresh_lock:
+            rows = self._conn().execute(
+                "SELECT id, text, embedding FROM chunks WHERE id > ? ORDER BY id", (self._last_chunk_id,)
+            ).fetchall()
+            dense_ids, dense_rows = [], []
+            for chunk_id, text, embedding in rows:
+                self.lexical.add(tokenize(text))
+                self.lexical_ids.append(chunk_id)
+                if embedding is not None:
+                    dense_ids.append(chunk_id)
+                    dense_rows.append(np.frombuffer(embedding, dtype=np.float32))
+                self._last_chunk_id = chunk_id
+
+            if dense_rows and (self.vectors.dim is None or len(dense_rows[0]) == self.vectors.dim):
+                self.vectors.add(np.vstack(dense_rows))
+                self.vector_ids.extend(dense_ids)
+        return len(rows)
+
+    def add_document(self,
+                     text: str,
+                     source: Optional[str] = None,
+                     metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Chunk, embed and store a document, then index the new chunks"""
+        chunks = chunk_text(text)
+        if not chunks:
+            return {"chunks": 0, "embedded": False}
+
+        embeddings = self._embed_chunks(chunks)
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO chunks (source, text, metadata, embedding, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (source, chunk, json.dumps(metadata or {}),
+                     embeddings[i].tobytes() if embeddings is not None else None, now)
+                    for i, chunk in enumerate(chunks)
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.refresh()
+        return {"chunks": len(chunks), "embedded": embeddings is not None}
+
+    def _lexical_search(self, query: str, k: int) -> Tuple[List[int], float]:
+        start_time = time.perf_counter()
+        hits = self.lexical.search(query, k)
+        return [self.lexical_ids[i] for i, _ in hits], (time.perf_counter() - start_time) * 1000
+
+    def _vector_search(self, query: str, k: int) -> Tuple[List[int], float]:
+        start_time = time.perf_counter()
+        if self.vectors.count == 0:
+            return [], 0.0
+        query_vector = self._embed([query])
+        if query_vector is None:
+            return [], 0.0
+        hits = self.vectors.search(query_vector[0], k)
+        return [self.vector_ids[i] for i, _ in hits], (time.perf_counter() - start_time) * 1000
+
+    def _fetch_chunks(self, chunk_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not chunk_ids:
+            return {}
+        placeholders = ",".join("?" * len(chunk_ids))
+        rows = self._conn().execute(
+            f"SELECT id, source, text, metadata FROM chunks WHERE id IN ({placeholders})", chunk_ids
+        ).fetchall()
+        return {
+            row[0]: {"chunk_id": row[0], "source": row[1], "text": row[2], "metadata": json.loads(row[3] or "{}")}
+            for row in rows
+        }
+
+    def search(self, query: str, k: int = 10, candidates: int = 50) -> List[Dict[str, Any]]:
+        """
+        Top-k chunks for a query: BM25 and vector search run in parallel on
+        `candidates` each, then reciprocal-rank fusion
+        """
+        start_time = time.perf_counter()
+        self.refresh()
+
+        lexical = self._executor.submit(self._lexical_search, query, candidates)
+        dense = self._executor.submit(self._vector_search, query, candidates)
+        lexical_ids, lexical_ms = lexical.result()
+        vector_ids, vector_ms = dense.result()
+
+        fused = reciprocal_rank_fusion([lexical_ids, vector_ids], self.rrf_k)[:k]
+        chunks = self._fetch_chunks([chunk_id for chunk_id, _ in fused])
+        lexical_rank = {chunk_id: rank for rank, chunk_id in enumerate(lexical_ids, start=1)}
+        vector_rank = {chunk_id: rank for rank, chunk_id in enumerate(vector_ids, start=1)}
+
+        results = []
+        for chunk_id, score in fused:
+            if chunk_id in chunks:
+                results.append({
+                    **chunks[chunk_id],
+                    "score": round(score, 6),
+                    "lexical_rank": lexical_rank.get(chunk_id),
+                    "vector_rank": vector_rank.get(chunk_id)
+                })
+
+        self.stats["queries"] += 1
+        self.stats["lexical_ms"] += lexical_ms
+        self.stats["vector_ms"] += vector_ms
+        self.stats["total_ms"] += (time.perf_counter() - start_time) * 1000
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        queries = self.stats["queries"] or 1
+        return {
+            "chunks": self.lexical.doc_count,
+            "embedded_chunks": self.vectors.count,
+            "vocabulary": len(self.lexical.vocabulary),
+            "lexical_index_bytes": self.lexical.memory_bytes(),
+            "vector_index_bytes": self.vectors.memory_bytes(),
+            "queries": self.stats["queries"],
+            "avg_lexical_ms": round(self.stats["lexical_ms"] / queries, 2),
+            "avg_vector_ms": round(self.stats["vector_ms"] / queries, 2),
+            "avg_total_ms": round(self.stats["total_ms"] / queries, 2),
+            "embeddings_reused": self.stats["embeddings_reused"],
+            "dense_error": self.dense_error
+        }
@@ -0,0 +1,108 @@
+# src/retrieval_benchmark.py
+"""
+Hybrid retrieval benchmark
+Builds the BM25 and vector indexes over a synthetic corpus (Zipf-distributed
+vocabulary, random embeddings) and reports index size, build time and query
+latency for lexical, dense and fused retrieval
+
+Usage (from src/):
+    python retrieval_benchmark.py --sizes 100000 1000000
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+from retrieval import BM25Index, VectorIndex, reciprocal_rank_fusion
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def benchmark_size(chunks: int, dim: int, queries: int, vocabulary: int = 50000,
+                   chunk_tokens: int = 120, seed: int = 0) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocabulary)])
+
+    lexical = BM25Index()
+    start = time.perf_counter()
+    for _ in range(chunks):
+        # Zipf-distributed term ids, like natural text
+        ids = np.minimum(rng.zipf(1.2, chunk_tokens), vocabulary) - 1
+        lexical.add(words[ids].tolist())
+    lexical_build = time.perf_counter() - start
+
+    vectors = VectorIndex()
+    start = time.perf_counter()
+    for first in range(0, chunks, 10000):
+        vectors.add(rng.standard_normal((min(10000, chunks - first), dim), dtype=np.float32))
+    vector_build = time.perf_counter() - start
+
+    # Queries mix frequent and rare terms (rare ones stand in for entities/acronyms)
+    query_texts = [
+        " ".join(words[np.minimum(rng.zipf(1.2, 4), vocabulary) - 1].tolist() + [f"w{rng.integers(1000, vocabulary)}"])
+        for _ in range(queries)
+    ]
+    query_vectors = rng.standard_normal((queries, dim), dtype=np.float32)
+
+    lexical_ms, vector_ms, hybrid_ms = [], [], []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for text, vector in zip(query_texts, query_vectors):
+            start = time.perf_counter()
+            lexical_hits = lexical.search(text, 50)
+            lexical_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            vector_hits = vectors.search(vector, 50)
+            vector_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            lexical_future = executor.submit(lexical.search, text, 50)
+            vector_future = executor.submit(vectors.search, vector, 50)
+            reciprocal_rank_fusion([[i for i, _ in lexical_future.result()],
+                                    [i for i, _ in vector_future.result()]])
+            hybrid_ms.append((time.perf_counter() - start) * 1000)
+
+    postings = sum(len(p) for p in lexical.postings)
+    return {
+        "chunks": chunks,
+        "postings": postings,
+        "lexical_mb": lexical.memory_bytes() / 1e6,
+        "vector_mb": vectors.memory_bytes() / 1e6,
+        "lexical_build_s": lexical_build,
+        "vector_build_s": vector_build,
+        "lexical_p50": _percentile(lexical_ms, 0.5),
+        "lexical_p95": _percentile(lexical_ms, 0.95),
+        "vector_p50": _percentile(vector_ms, 0.5),
+        "vector_p95": _percentile(vector_ms, 0.95),
+        "hybrid_p50": _percentile(hybrid_ms, 0.5),
+        "hybrid_p95": _percentile(hybrid_ms, 0.95)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 + vector retrieval benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000], help="Corpus sizes in chunks")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print("🔎 Hybrid retrieval benchmark (BM25 + vector, RRF)")
+    print("=" * 50)
+    for size in args.sizes:
+        result = benchmark_size(size, args.dim, args.queries)
+        print(f"\n📊 {result['chunks']:,} chunks ({result['postings']:,} postings)")
+        print(f"   BM25:   {result['lexical_mb']:8.1f} MB, built in {result['lexical_build_s']:6.1f}s, "
+              f"query p50 {result['lexical_p50']:6.2f}ms p95 {result['lexical_p95']:6.2f}ms")
+        print(f"   Vector: {result['vector_mb']:8.1f} MB, built in {result['vector_build_s']:6.1f}s, "
+              f"query p50 {result['vector_p50']:6.2f}ms p95 {result['vector_p95']:6.2f}ms")
+        print(f"   Hybrid (parallel + RRF): p50 {result['hybrid_p50']:6.2f}ms p95 {result['hybrid_p95']:6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# src/shared_state.py
+"""
+State shared between API worker processes (SQLite)
+When the server runs with several workers, usage counters, premium spend,
+rate-limit buckets and chat sessions live here so every worker sees the same
+numbers
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+BUSY_TIMEOUT_MS = 30000
+
+
+def api_worker_count() -> int:
+    """Number of API worker processes (set by the production launcher)"""
+    return max(1, int(os.environ.get("API_WORKERS", "1")))
+
+
+def shared_state_enabled() -> bool:
+    """
+    Share state whenever more than one process serves the app: several API
+    workers, or research jobs running in separate worker processes.
+    SHARED_STATE=1/0 overrides.
+    """
+    setting = os.environ.get("SHARED_STATE")
+    if setting is not None:
+        return setting == "1"
+    return api_worker_count() > 1 or os.environ.get("RESEARCH_WORKER_MODE") == "external"
+
+
+class SharedState:
+    """Counters, token buckets and chat sessions in a SQLite file shared by all workers"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("SHARED_STATE_PATH", os.path.join("data", "shared_state.db"))
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS counters (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            );
+            CREATE TABLE IF NOT EXISTS token_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def incr(self, namespace: str, key: str, amount: float = 1.0) -> float:
+        """Atomically add `amount` to a counter and return the new value"""
+        row = self._conn().execute(
+            """
+            INSERT INTO counters (namespace, key, value) VALUES (?, ?, ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET value = value + excluded.value
+            RETURNING value
+            """,
+            (namespace, key, amount)
+        ).fetchone()
+        return row[0]
+
+    def add_within(self, namespace: str, limits: Dict[str, float], amount: float) -> bool:
+        """
+        Atomically add `amount` to every counter in `limits` if none would go
+        over its limit; returns whether it was added
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, limit in limits.items():
+                row = conn.execute(
+                    "SELECT value FROM counters WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                if (row[0] if row else 0.0) + amount > limit:
+                    conn.execute("ROLLBACK")
+                    return False
+            for key in limits:
+                conn.execute(
+                    """
+                    INSERT INTO counters (namespace, key, value) VALUES (?, ?, ?)
+                    ON CONFLICT (namespace, key) DO UPDATE SET value = value + excluded.value
+                    """,
+                    (namespace, key, amount)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def get(self, namespace: str, key: str, default: float = 0.0) -> float:
+        row = self._conn().execute(
+            "SELECT value FROM counters WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return row[0] if row else default
+
+    def get_all(self, namespace: str) -> Dict[str, float]:
+        rows = self._conn().execute(
+            "SELECT key, value FROM counters WHERE namespace = ?", (namespace,)
+        ).fetchall()
+        return {key: value for key, value in rows}
+
+    def take_token(self, key: str, rate: float, burst: int, timeout: float = 0.05) -> Tuple[bool, float]:
+        """
+        Token bucket shared across processes; same contract as
+        TokenBucket.try_acquire. Waits at most `timeout` seconds for the write
+        lock and raises sqlite3.OperationalError when it stays busy.
+        """
+        conn = self._conn()
+        conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        now = time.time()
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = float(burst) if row is None else min(burst, row[0] + (now - row[1]) * rate)
+
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return (True, 0.0) if allowed else (False, (1.0 - tokens) / rate)
+
+    def prune_buckets(self, older_than: float = 3600.0):
+        """Drop buckets idle long enough to have refilled"""
+        self._conn().execute("DELETE FROM token_buckets WHERE updated_at < ?", (time.time() - older_than,))
+
+
+    def save_session(self, session_id: str, data: Dict[str, Any], version: int, last_used: float) -> bool:
+        """
+        Write a chat session if the stored copy is still at `version` (0 for
+        a new session). Returns False when another worker saved it first.
+        """
+        payload = json.dumps(data, default=str)
+        if version == 0:
+            cursor = self._conn().execute(
+                "INSERT OR IGNORE INTO chat_sessions (session_id, data, version, last_used) VALUES (?, ?, 1, ?)",
+                (session_id, payload, last_used)
+            )
+        else:
+            cursor = self._conn().execute(
+                """
+                UPDATE chat_sessions SET data = ?, version = version + 1, last_used = ?
+                WHERE session_id = ? AND version = ?
+                """,
+                (payload, last_used, session_id, version)
+            )
+        return cursor.rowcount == 1
+
+    def load_session(self, session_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Stored session data and its version, refreshing its idle timer"""
+        conn = self._conn()
+        conn.execute("UPDATE chat_sessions SET last_used = ? WHERE session_id = ?", (time.time(), session_id))
+        row = conn.execute("SELECT data, version FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def delete_session(self, session_id: str) -> bool:
+        cursor = self._conn().execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount == 1
+
+    def expire_sessions(self, idle_timeout: float) -> int:
+        """Drop sessions idle for longer than `idle_timeout` seconds"""
+        cursor = self._conn().execute(
+            "DELETE FROM chat_sessions WHERE last_used < ?", (time.time() - idle_timeout,)
+        )
+        return cursor.rowcount
+
+    def evict_sessions(self, keep: int) -> int:
+        """Drop the least recently used sessions beyond the newest `keep`"""
+        cursor = self._conn().execute(
+            """
+            DELETE FROM chat_sessions WHERE session_id IN (
+                SELECT session_id FROM chat_sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (max(0, keep),)
+        )
+        return cursor.rowcount
+
+    def session_count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
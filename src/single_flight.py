@@ -0,0 +1,63 @@
+# src/single_flight.py
+"""
+Single-flight request coalescing
+Concurrent identical requests (same model, prompt and options) attach to the
+one generation already in flight and all receive its result, instead of
+running the same multi-second generation again
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+
+def request_key(*parts: Any) -> str:
+    """Stable key for a request (dict key order doesn't matter)"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    async def do(self, namespace: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() unless an identical call is in flight, in which case wait for
+        that one. Errors are shared too. The work runs as its own task, so a
+        disconnecting caller doesn't cancel it for the others.
+        """
+        stats = self.stats.setdefault(namespace, {"executed": 0, "coalesced": 0})
+        flight_key = f"{namespace}:{key}"
+
+        task = self._in_flight.get(flight_key)
+        if task is not None:
+            stats["coalesced"] += 1
+        else:
+            stats["executed"] += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[flight_key] = task
+            task.add_done_callback(lambda done: self._finished(flight_key, done))
+
+        return await asyncio.shield(task)
+
+    def _finished(self, flight_key: str, task: asyncio.Future):
+        self._in_flight.pop(flight_key, None)
+        # Mark the error as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Executed vs coalesced requests per endpoint"""
+        stats = {}
+        for namespace, counts in self.stats.items():
+            total = counts["executed"] + counts["coalesced"]
+            stats[namespace] = {
+                **counts,
+                "coalesced_ratio": round(counts["coalesced"] / total, 3) if total else 0.0
+            }
+        return {"in_flight": len(self._in_flight), "endpoints": stats}
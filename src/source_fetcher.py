@@ -0,0 +1,313 @@
+# src/source_fetcher.py
+"""
+Web source fetcher for research jobs
+A pooled async HTTP client with per-domain concurrency limits, robots.txt
+checks and an on-disk HTTP cache that revalidates with ETag/Last-Modified.
+HTML-to-text extraction runs in a process pool so parsing never blocks the
+event loop
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from artifact_store import content_hash, memo_key
+from lazy_imports import lazy_import
+
+httpx = lazy_import("httpx")
+
+USER_AGENT = "ResearchAgent/5.0 (+local research assistant)"
+SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "svg", "form", "template"}
+BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "pre", "blockquote"}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.title_parts: List[str] = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title_parts.append(data)
+        elif not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> Tuple[str, str]:
+    """(title, readable text) of an HTML page - runs in the process pool"""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    lines = (" ".join(line.split()) for line in "".join(parser.parts).splitlines())
+    text = "\n".join(line for line in lines if line)
+    return " ".join("".join(parser.title_parts).split()), text
+
+
+class HTTPCache:
+    """On-disk HTTP cache: gzip body plus validators (ETag, Last-Modified) per URL"""
+
+    def __init__(self, directory: Optional[str] = None, fresh_seconds: Optional[float] = None):
+        self.directory = directory or os.environ.get("FETCH_CACHE_DIR", os.path.join("data", "http_cache"))
+        # Entries younger than this are served without revalidating
+        self.fresh_seconds = fresh_seconds if fresh_seconds is not None else float(os.environ.get("FETCH_CACHE_FRESH_SECONDS", "300"))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".json", base + ".gz"
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with gzip.open(body_path, "rb") as f:
+                meta["body"] = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        meta = {
+            "url": url,
+            "status": status,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "content_type": headers.get("content-type", ""),
+            "fetched_at": time.time()
+        }
+        # Write the body first and rename, so readers never see a half-written entry
+        with gzip.open(body_path + ".tmp", "wb", compresslevel=6) as f:
+            f.write(body)
+        os.replace(body_path + ".tmp", body_path)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def touch(self, url: str, entry: Dict[str, Any]):
+        """A 304 revalidated the entry - restart its freshness window"""
+        meta_path, _ = self._paths(url)
+        meta = {key: value for key, value in entry.items() if key != "body"}
+        meta["fetched_at"] = time.time()
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get("fetched_at", 0) < self.fresh_seconds
+
+
+class SourceFetcher:
+    """Fetches research sources concurrently, politely and through the HTTP cache"""
+
+    def __init__(self,
+                 cache: Optional[HTTPCache] = None,
+                 max_connections: int = 20,
+                 per_domain: Optional[int] = None,
+                 timeout: float = 15.0,
+                 max_bytes: int = 5_000_000,
+                 respect_robots: bool = True,
+                 parse_workers: Optional[int] = None,
+                 artifacts=None):
+        self.cache = cache or HTTPCache()
+        self.max_connections = max_connections
+        self.per_domain = per_domain or int(os.environ.get("FETCH_PER_DOMAIN", "2"))
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.respect_robots = respect_robots
+        self.parse_workers = parse_workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        # ArtifactStore: extracted text is reused for bodies parsed before
+        self.artifacts = artifacts
+
+        self._client = None
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+        self._domain_limits: Dict[str, asyncio.Semaphore] = {}
+        self._robots: Dict[str, "asyncio.Future[Optional[RobotFileParser]]"] = {}
+        self.stats = {"requests": 0, "fresh_hits": 0, "revalidated": 0, "misses": 0,
+                      "robots_blocked": 0, "errors": 0, "bytes": 0, "pages": 0, "extractions_reused": 0,
+                      "truncated": 0, "fetch_seconds": 0.0}
+
+    @property
+    def client(self):
+        """Shared connection pool, created on first use"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    @property
+    def parse_pool(self) -> ProcessPoolExecutor:
+        if self._parse_pool is None:
+            self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        return self._parse_pool
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
+
+    def _domain_limit(self, netloc: str) -> asyncio.Semaphore:
+        if netloc not in self._domain_limits:
+            self._domain_limits[netloc] = asyncio.Semaphore(self.per_domain)
+        return self._domain_limits[netloc]
+
+    async def _load_robots(self, origin: str) -> Optional[RobotFileParser]:
+        try:
+            response = await self.client.get(f"{origin}/robots.txt")
+        except Exception:
+            return None
+        if response.status_code != 200:
+            return None
+        parser = RobotFileParser()
+        parser.parse(response.text.splitlines())
+        return parser
+
+    async def _allowed(self, url: str) -> bool:
+        """robots.txt check (fetched once per domain; a missing robots.txt allows everything)"""
+        if not self.respect_robots:
+            return True
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        # Concurrent fetches for a new domain share one robots.txt request
+        if origin not in self._robots:
+            self._robots[origin] = asyncio.ensure_future(self._load_robots(origin))
+        parser = await self._robots[origin]
+        return parser is None or parser.can_fetch(USER_AGENT, url)
+
+    async def _get(self, url: str) -> Tuple[int, bytes, str, str]:
+        """(status, body, content type, cache outcome) through the HTTP cache"""
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.stats["fresh_hits"] += 1
+            return entry["status"], entry["body"], entry["content_type"], "fresh"
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        self.stats["requests"] += 1
+        async with self.client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and entry is not None:
+                self.stats["revalidated"] += 1
+                await asyncio.to_thread(self.cache.touch, url, entry)
+                return entry["status"], entry["body"], entry["content_type"], "revalidated"
+
+            # Stop reading at max_bytes instead of downloading the whole body
+            chunks: List[bytes] = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > self.max_bytes:
+                    self.stats["truncated"] += 1
+                    break
+            body = b"".join(chunks)[:self.max_bytes]
+
+        self.stats["misses"] += 1
+        self.stats["bytes"] += len(body)
+        if response.status_code == 200:
+            await asyncio.to_thread(self.cache.put, url, 200, dict(response.headers), body)
+        return response.status_code, body, response.headers.get("content-type", ""), "miss"
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """Fetch one source as {url, status, title, text, cache, error}"""
+        start_time = time.time()
+        result: Dict[str, Any] = {"url": url, "status": None, "title": None, "text": "", "cache": None, "error": None}
+        try:
+            if not await self._allowed(url):
+                self.stats["robots_blocked"] += 1
+                result["error"] = "disallowed by robots.txt"
+                return result
+
+            async with self._domain_limit(urlsplit(url).netloc):
+                status, body, content_type, outcome = await self._get(url)
+            result.update(status=status, cache=outcome)
+            if status != 200:
+                result["error"] = f"HTTP {status}"
+                return result
+
+            result["title"], result["text"] = await self._extract(body, content_type)
+            self.stats["pages"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            result["error"] = str(e) or type(e).__name__
+        finally:
+            result["elapsed"] = round(time.time() - start_time, 3)
+        return result
+
+    async def _extract(self, body: bytes, content_type: str) -> Tuple[Optional[str], str]:
+        """(title, text) of a body, parsed in the process pool unless this exact body was parsed before"""
+        html = body.decode("utf-8", errors="replace")
+        if "html" not in content_type and not html.lstrip().startswith("<"):
+            return None, html
+
+        key = memo_key("html_to_text", content_hash(body)) if self.artifacts is not None else None
+        if key is not None:
+            digest = await asyncio.to_thread(self.artifacts.memo_get, key)
+            extracted = await asyncio.to_thread(self.artifacts.get_json, digest) if digest else None
+            if extracted is not None:
+                self.stats["extractions_reused"] += 1
+                return extracted["title"], extracted["text"]
+
+        loop = asyncio.get_running_loop()
+        title, text = await loop.run_in_executor(self.parse_pool, html_to_text, html)
+        if key is not None:
+            digest = await asyncio.to_thread(self.artifacts.put_json, {"title": title, "text": text}, "extracted")
+            await asyncio.to_thread(self.artifacts.memo_put, key, digest)
+        return title, text
+
+    async def fetch_all(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """Fetch sources concurrently (bounded by the pool and per-domain limits)"""
+        start_time = time.time()
+        results = await asyncio.gather(*(self.fetch(url) for url in dict.fromkeys(urls)))
+        self.stats["fetch_seconds"] += time.time() - start_time
+        return list(results)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        lookups = stats["fresh_hits"] + stats["revalidated"] + stats["misses"]
+        stats["cache_hit_rate"] = round((stats["fresh_hits"] + stats["revalidated"]) / lookups, 3) if lookups else 0.0
+        stats["pages_per_second"] = round(stats["pages"] / stats["fetch_seconds"], 2) if stats["fetch_seconds"] else 0.0
+        stats["fetch_seconds"] = round(stats["fetch_seconds"], 2)
+        return stats
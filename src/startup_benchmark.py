@@ -0,0 +1,121 @@
+# src/startup_benchmark.py
+"""
+Startup-time benchmark for the API server
+Reports the slowest imports (python -X importtime) and measures the time from
+launching uvicorn to the first successful HTTP response, failing when it
+exceeds the target
+
+Usage (from src/):
+    python startup_benchmark.py --target 2.0
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List
+
+
+def measure_import_time(module: str = "api_server", top: int = 15) -> Dict[str, Any]:
+    """Import `module` in a fresh interpreter with -X importtime and rank the modules"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {"success": False, "error": result.stderr.strip().splitlines()[-1:]}
+
+    # Lines look like: "import time:  self [us] | cumulative | imported package"
+    imports: List[Dict[str, Any]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+
+    total = next((i["cumulative_ms"] for i in imports if i["module"] == module), 0.0)
+    # Top-level packages only, so a package isn't counted again through its submodules
+    top_level = [i for i in imports if i["module"].split(".")[0] == i["module"] and i["module"] != module]
+    return {
+        "success": True,
+        "total_ms": total,
+        "slowest": sorted(top_level, key=lambda i: i["cumulative_ms"], reverse=True)[:top]
+    }
+
+
+def measure_first_response(port: int = 8765, path: str = "/", timeout: float = 60.0) -> Dict[str, Any]:
+    """Launch uvicorn and poll until `path` answers"""
+    url = f"http://127.0.0.1:{port}{path}"
+    start_time = time.time()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+
+    try:
+        while time.time() - start_time < timeout:
+            if process.poll() is not None:
+                return {"success": False, "error": process.stderr.read().decode()[-500:]}
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    return {"success": True, "seconds": time.time() - start_time, "status": response.status}
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        return {"success": False, "error": f"No response within {timeout}s"}
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API server startup-time benchmark")
+    parser.add_argument("--target", type=float, default=float(os.environ.get("STARTUP_TARGET_SECONDS", "2.0")),
+                        help="Maximum acceptable time to first response in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/", help="Endpoint used as the first request")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print("⏱️  Startup benchmark for api_server")
+    print("=" * 50)
+
+    imports = measure_import_time()
+    if not imports["success"]:
+        print(f"❌ Importing api_server failed: {imports['error']}")
+        sys.exit(1)
+
+    print(f"\n📦 Import time: {imports['total_ms']:.0f}ms")
+    for entry in imports["slowest"]:
+        print(f"   {entry['cumulative_ms']:8.1f}ms  {entry['module']}")
+
+    timings = []
+    for run in range(args.runs):
+        result = measure_first_response(port=args.port, path=args.path)
+        if not result["success"]:
+            print(f"❌ Server did not answer: {result['error']}")
+            sys.exit(1)
+        timings.append(result["seconds"])
+        print(f"\n🚀 Run {run + 1}: first response from {args.path} after {result['seconds']:.2f}s")
+
+    best = min(timings)
+    print(f"\n📊 Time to first response: best {best:.2f}s, worst {max(timings):.2f}s (target {args.target:.2f}s)")
+    if best > args.target:
+        print("❌ Startup is slower than the target")
+        sys.exit(1)
+    print("✅ Startup within target")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,540 @@
+# src/structured_output.py
+"""
+Structured-output extraction
+Asks the model for JSON constrained by a JSON schema (Ollama format=<schema>),
+checks the stream against the schema as it arrives and aborts as soon as it
+diverges, then retries once with a repair prompt. Parse failures and retry
+costs are tracked per model
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Type, Union
+
+from pydantic import BaseModel, ValidationError
+
+from hello_agent import HelloAgent
+
+# Characters that can continue a number/true/false/null literal
+LITERAL_CHARS = set("0123456789+-.eEtrufalsn")
+
+SchemaLike = Union[Dict[str, Any], Type[BaseModel]]
+
+
+def _resolve(schema: Any, root: Dict[str, Any]) -> Dict[str, Any]:
+    """Follow local $refs (Pydantic puts nested models under #/$defs)"""
+    seen = 0
+    while isinstance(schema, dict) and "$ref" in schema and seen < 32:
+        ref = schema["$ref"]
+        if not ref.startswith("#/"):
+            return {}
+        node: Any = root
+        for part in ref[2:].split("/"):
+            node = node.get(part, {}) if isinstance(node, dict) else {}
+        schema = node
+        seen += 1
+    return schema if isinstance(schema, dict) else {}
+
+
+def _json_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    return "object"
+
+
+def _allowed_types(schema: Any, root: Dict[str, Any]) -> Optional[Set[str]]:
+    """JSON types a schema admits, or None when any type is fine"""
+    schema = _resolve(schema, root)
+    branches = schema.get("anyOf") or schema.get("oneOf")
+    if branches:
+        allowed: Set[str] = set()
+        for branch in branches:
+            types = _allowed_types(branch, root)
+            if types is None:
+                return None
+            allowed |= types
+        return allowed
+    if "enum" in schema:
+        return {_json_type(value) for value in schema["enum"]}
+    if "const" in schema:
+        return {_json_type(schema["const"])}
+    declared = schema.get("type")
+    if declared is None:
+        return None
+    return {declared} if isinstance(declared, str) else set(declared)
+
+
+def _type_matches(actual: str, allowed: Optional[Set[str]]) -> bool:
+    if allowed is None or actual in allowed:
+        return True
+    # Streaming can't tell 3 from 3.5 up front; the final check can
+    return actual in ("integer", "number") and bool(allowed & {"integer", "number"})
+
+
+def _branch_for(schema: Any, root: Dict[str, Any], json_type: str) -> Dict[str, Any]:
+    """The anyOf/oneOf branch that a value of `json_type` will be checked against"""
+    schema = _resolve(schema, root)
+    for branch in schema.get("anyOf") or schema.get("oneOf") or []:
+        if _type_matches(json_type, _allowed_types(branch, root)):
+            return _resolve(branch, root)
+    return schema
+
+
+def validate_instance(value: Any, schema: Any, root: Optional[Dict[str, Any]] = None, path: str = "$") -> List[str]:
+    """
+    Check a parsed value against a JSON schema
+
+    Covers the subset extraction schemas use: type, enum/const, anyOf/oneOf,
+    properties/required/additionalProperties, items and min/maxItems, $ref.
+    """
+    root = root if root is not None else schema
+    schema = _resolve(schema, root)
+
+    branches = schema.get("anyOf") or schema.get("oneOf")
+    if branches:
+        if any(not validate_instance(value, branch, root, path) for branch in branches):
+            return []
+        return [f"{path}: does not match any allowed schema"]
+
+    if "enum" in schema and value not in schema["enum"]:
+        return [f"{path}: {value!r} is not one of {schema['enum']}"]
+    if "const" in schema and value != schema["const"]:
+        return [f"{path}: expected {schema['const']!r}"]
+
+    actual = _json_type(value)
+    allowed = _allowed_types(schema, root)
+    if allowed is not None and actual not in allowed:
+        integral_float = actual == "number" and "integer" in allowed and float(value).is_integer()
+        if not (actual == "integer" and "number" in allowed) and not integral_float:
+            return [f"{path}: expected {'/'.join(sorted(allowed))}, got {actual}"]
+
+    errors = []
+    if actual == "object":
+        properties = schema.get("properties") or {}
+        for key in schema.get("required") or []:
+            if key not in value:
+                errors.append(f"{path}: missing required field '{key}'")
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(validate_instance(item, properties[key], root, f"{path}.{key}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}: unexpected field '{key}'")
+            elif isinstance(schema.get("additionalProperties"), dict):
+                errors.extend(validate_instance(item, schema["additionalProperties"], root, f"{path}.{key}"))
+    elif actual == "array":
+        if "minItems" in schema and len(value) < schema["minItems"]:
+            errors.append(f"{path}: expected at least {schema['minItems']} items")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            errors.append(f"{path}: expected at most {schema['maxItems']} items")
+        if isinstance(schema.get("items"), dict):
+            for i, item in enumerate(value):
+                errors.extend(validate_instance(item, schema["items"], root, f"{path}[{i}]"))
+    return errors
+
+
+class StreamingJSONValidator:
+    """
+    Incremental JSON scanner that checks a document against a schema while
+    it streams in. feed() returns an error as soon as the output can no
+    longer become valid: malformed JSON, a value of the wrong type, an
+    unknown field where additionalProperties is false, or runaway whitespace
+    (JSON mode can pad forever instead of stopping).
+    """
+
+    MAX_WHITESPACE_RUN = 64
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.root = schema
+        self.stack: List[Dict[str, Any]] = []
+        self.in_string = False
+        self.escape = False
+        self.string_is_key = False
+        self.key_chars: List[str] = []
+        self.literal: List[str] = []
+        self.whitespace_run = 0
+        self.started = False
+        self.complete = False
+        self.error: Optional[str] = None
+
+    def feed(self, text: str) -> Optional[str]:
+        """Consume the next chunk; returns the divergence reason, if any"""
+        for ch in text:
+            if self.error:
+                break
+            self._step(ch)
+        return self.error
+
+    def finish(self) -> Optional[str]:
+        """Flush a trailing literal (a bare top-level number) and report truncation"""
+        if self.literal and not self.error:
+            self._end_literal()
+        if not self.error and not self.complete:
+            self.error = "output ended before the JSON value was complete"
+        return self.error
+
+    def _path(self) -> str:
+        path = "$"
+        for frame in self.stack:
+            if frame["kind"] == "object" and frame["key"] is not None:
+                path += f".{frame['key']}"
+            elif frame["kind"] == "array":
+                path += f"[{frame['index']}]"
+        return path
+
+    def _fail(self, reason: str):
+        self.error = f"{self._path()}: {reason}"
+
+    def _step(self, ch: str):
+        if self.in_string:
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                if self.string_is_key:
+                    self._end_key("".join(self.key_chars))
+                else:
+                    self._end_value()
+                return
+            if self.string_is_key:
+                self.key_chars.append(ch)
+            return
+
+        if self.literal:
+            if ch in LITERAL_CHARS:
+                self.literal.append(ch)
+                return
+            self._end_literal()
+            if self.error:
+                return
+
+        if ch.isspace():
+            self.whitespace_run += 1
+            if self.whitespace_run > self.MAX_WHITESPACE_RUN:
+                self._fail("runaway whitespace")
+            return
+        self.whitespace_run = 0
+
+        if self.complete:
+            self._fail(f"unexpected {ch!r} after the JSON value")
+            return
+
+        frame = self.stack[-1] if self.stack else None
+        expect = frame["expect"] if frame else "value"
+
+        if expect in ("key", "key_or_end"):
+            if ch == '"':
+                self.in_string, self.string_is_key, self.key_chars = True, True, []
+            elif ch == "}" and expect == "key_or_end":
+                self._close_object()
+            else:
+                self._fail(f"expected a field name, got {ch!r}")
+        elif expect == "colon":
+            if ch == ":":
+                frame["expect"] = "value"
+            else:
+                self._fail(f"expected ':', got {ch!r}")
+        elif expect == "comma_or_end":
+            if ch == ",":
+                if frame["kind"] == "object":
+                    frame["expect"], frame["key"] = "key", None
+                else:
+                    frame["expect"] = "value"
+                    frame["index"] += 1
+            elif ch == "}" and frame["kind"] == "object":
+                self._close_object()
+            elif ch == "]" and frame["kind"] == "array":
+                self.stack.pop()
+                self._end_value()
+            else:
+                self._fail(f"expected ',' or a closing bracket, got {ch!r}")
+        elif ch == "]" and expect == "value_or_end":
+            self.stack.pop()
+            self._end_value()
+        else:
+            self._start_value(ch, self._child_schema(frame))
+
+    def _child_schema(self, frame: Optional[Dict[str, Any]]) -> Any:
+        if frame is None:
+            return self.root
+        schema = frame["schema"]
+        if frame["kind"] == "array":
+            return schema.get("items") if isinstance(schema.get("items"), dict) else {}
+        properties = schema.get("properties") or {}
+        if frame["key"] in properties:
+            return properties[frame["key"]]
+        extra = schema.get("additionalProperties")
+        return extra if isinstance(extra, dict) else {}
+
+    def _start_value(self, ch: str, schema: Any):
+        if ch == "{":
+            json_type = "object"
+        elif ch == "[":
+            json_type = "array"
+        elif ch == '"':
+            json_type = "string"
+        elif ch == "-" or ch.isdigit():
+            json_type = "number"
+        elif ch in "tf":
+            json_type = "boolean"
+        elif ch == "n":
+            json_type = "null"
+        else:
+            self._fail(f"unexpected {ch!r}")
+            return
+
+        allowed = _allowed_types(schema, self.root)
+        if not _type_matches(json_type, allowed):
+            self._fail(f"expected {'/'.join(sorted(allowed))}, got {json_type}")
+            return
+
+        self.started = True
+        if json_type == "object":
+            branch = _branch_for(schema, self.root, "object")
+            self.stack.append({"kind": "object", "schema": branch, "expect": "key_or_end", "key": None, "seen": set()})
+        elif json_type == "array":
+            branch = _branch_for(schema, self.root, "array")
+            self.stack.append({"kind": "array", "schema": branch, "expect": "value_or_end", "index": 0})
+        elif json_type == "string":
+            self.in_string, self.string_is_key = True, False
+        else:
+            self.literal = [ch]
+
+    def _end_literal(self):
+        token = "".join(self.literal)
+        self.literal = []
+        try:
+            json.loads(token)
+        except ValueError:
+            self._fail(f"invalid literal {token!r}")
+            return
+        self._end_value()
+
+    def _end_key(self, key: str):
+        frame = self.stack[-1]
+        schema = frame["schema"]
+        if schema.get("additionalProperties") is False and key not in (schema.get("properties") or {}):
+            self._fail(f"unexpected field '{key}'")
+            return
+        frame["key"] = key
+        frame["seen"].add(key)
+        frame["expect"] = "colon"
+
+    def _close_object(self):
+        frame = self.stack[-1]
+        missing = [key for key in frame["schema"].get("required") or [] if key not in frame["seen"]]
+        frame["key"] = None
+        if missing:
+            self._fail(f"missing required field(s) {', '.join(missing)}")
+            return
+        self.stack.pop()
+        self._end_value()
+
+    def _end_value(self):
+        if self.stack:
+            self.stack[-1]["expect"] = "comma_or_end"
+        else:
+            self.complete = True
+
+
+class StructuredExtractor:
+    """Schema-constrained extraction with streaming validation and one repair retry"""
+
+    STAT_FIELDS = ("requests", "successes", "parse_failures", "early_aborts", "repairs",
+                   "repair_successes", "failures", "retry_seconds", "retry_tokens")
+
+    def __init__(self, conductor, shared_state=None, format_mode: Optional[str] = None):
+        self.conductor = conductor
+        # "schema" passes the JSON schema as Ollama's format (Ollama >= 0.5);
+        # "json" only forces JSON and relies on the prompt plus streaming checks
+        self.format_mode = format_mode or os.environ.get("STRUCTURED_OUTPUT_FORMAT", "schema")
+        self.shared_state = shared_state
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, model: str, field: str, amount: float = 1):
+        if self.shared_state is not None:
+            self.shared_state.incr("extraction", f"{model}|{field}", amount)
+            return
+        with self._lock:
+            model_stats = self.stats.setdefault(model, {name: 0 for name in self.STAT_FIELDS})
+            model_stats[field] += amount
+
+    @staticmethod
+    def _system_prompt(schema: Dict[str, Any], instructions: Optional[str]) -> str:
+        prompt = (
+            "Extract the requested information from the user's text. Reply with a single JSON value "
+            "that matches this JSON schema, with no commentary or code fences. Use null for "
+            "information the text does not contain (when the schema allows it).\n\n"
+            f"Schema:\n{json.dumps(schema)}"
+        )
+        if instructions:
+            prompt += f"\n\nInstructions: {instructions}"
+        return prompt
+
+    def _attempt(self,
+                 agent: HelloAgent,
+                 messages: List[Dict[str, str]],
+                 schema: Dict[str, Any],
+                 options: Dict[str, Any],
+                 keep_alive: Optional[str]) -> Dict[str, Any]:
+        """One streamed generation, stopped early on divergence or completion"""
+        validator = StreamingJSONValidator(schema)
+        parts: List[str] = []
+        eval_count = 0
+        start_time = time.time()
+        output_format = schema if self.format_mode == "schema" else "json"
+
+        stream = agent.stream_chat(messages, options, keep_alive, format=output_format)
+        try:
+            for chunk in stream:
+                parts.append(chunk.get('content', ''))
+                eval_count = chunk.get('eval_count') or eval_count
+                # Stopping here closes the HTTP stream, which aborts generation
+                if validator.feed(chunk.get('content', '')) or validator.complete:
+                    break
+        finally:
+            stream.close()
+
+        raw = "".join(parts)
+        attempt = {
+            "raw": raw,
+            "elapsed": time.time() - start_time,
+            "eval_count": eval_count or len(raw) // 4,
+            "aborted": validator.error is not None
+        }
+        error = validator.error or validator.finish()
+        if error:
+            return {**attempt, "success": False, "error": error}
+
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            return {**attempt, "success": False, "error": f"invalid JSON: {e}"}
+        errors = validate_instance(data, schema)
+        if errors:
+            return {**attempt, "success": False, "error": "; ".join(errors[:5])}
+        return {**attempt, "success": True, "data": data}
+
+    def extract(self,
+                text: str,
+                schema: SchemaLike,
+                task_type: str = "document_processing",
+                model: Optional[str] = None,
+                instructions: Optional[str] = None,
+                options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Extract `schema`-shaped data from `text`
+
+        `schema` is a JSON schema or a Pydantic model class. Returns a dict
+        with success, data, model, attempts and the errors seen.
+        """
+        pydantic_model = schema if isinstance(schema, type) and issubclass(schema, BaseModel) else None
+        json_schema = pydantic_model.model_json_schema() if pydantic_model else schema
+
+        complexity = self.conductor.task_types.get(task_type, "simple")
+        selected_model = self.conductor.select_model(
+            task_type=task_type,
+            complexity=complexity,
+            preferred_model=model,
+            context_length=len(text) // 4 + 512
+        )
+        # Deterministic decoding unless the caller asks otherwise
+        gen_options, keep_alive = self.conductor.generation_options(
+            complexity, selected_model, {"temperature": 0, **(options or {})}, prompt_tokens=len(text) // 4
+        )
+
+        agent = HelloAgent(model_name=selected_model, router=self.conductor.router)
+        messages = [
+            {'role': 'system', 'content': self._system_prompt(json_schema, instructions)},
+            {'role': 'user', 'content': text}
+        ]
+        start_time = time.time()
+        self._record(selected_model, "requests")
+
+        errors = []
+        attempts = 0
+        result: Dict[str, Any] = {}
+        for attempts in (1, 2):
+            try:
+                result = self._attempt(agent, messages, json_schema, gen_options, keep_alive)
+            except Exception as e:
+                result = {"success": False, "error": str(e), "raw": "", "backend_error": True}
+
+            if result["success"] and pydantic_model is not None:
+                try:
+                    result["data"] = pydantic_model.model_validate(result["data"]).model_dump(mode="json")
+                except ValidationError as e:
+                    result = {**result, "success": False, "error": str(e)}
+
+            if attempts == 2:
+                self._record(selected_model, "retry_seconds", result.get("elapsed", 0.0))
+                self._record(selected_model, "retry_tokens", result.get("eval_count", 0))
+            if result["success"]:
+                break
+
+            errors.append(result["error"])
+            if result.get("backend_error"):
+                break  # Not a parse failure - repairing won't help
+            if attempts == 1:
+                self._record(selected_model, "parse_failures")
+                if result["aborted"]:
+                    self._record(selected_model, "early_aborts")
+                self._record(selected_model, "repairs")
+                print(f"🔧 Extraction output from {selected_model} invalid ({result['error']}), retrying with repair prompt")
+                messages = messages + [
+                    {'role': 'assistant', 'content': result["raw"] or "(empty)"},
+                    {'role': 'user', 'content': (
+                        f"That output is invalid: {result['error']}. Reply again with only the corrected "
+                        "JSON value matching the schema."
+                    )}
+                ]
+
+        if result["success"]:
+            self._record(selected_model, "successes")
+            if attempts == 2:
+                self._record(selected_model, "repair_successes")
+        else:
+            self._record(selected_model, "failures")
+
+        return {
+            "success": result["success"],
+            "data": result.get("data"),
+            "model": selected_model,
+            "attempts": attempts,
+            "repaired": result["success"] and attempts == 2,
+            "errors": errors,
+            "raw": None if result["success"] else result.get("raw"),
+            "response_time": time.time() - start_time
+        }
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model parse-failure rate and retry cost"""
+        if self.shared_state is not None:
+            stats: Dict[str, Dict[str, float]] = {}
+            for key, value in self.shared_state.get_all("extraction").items():
+                model, _, field = key.rpartition("|")
+                stats.setdefault(model, {name: 0 for name in self.STAT_FIELDS})[field] = value
+        else:
+            with self._lock:
+                stats = {model: dict(values) for model, values in self.stats.items()}
+
+        for values in stats.values():
+            requests = values["requests"] or 1
+            values["parse_failure_rate"] = round(values["parse_failures"] / requests, 3)
+            values["failure_rate"] = round(values["failures"] / requests, 3)
+            values["retry_seconds"] = round(values["retry_seconds"], 2)
+        return stats
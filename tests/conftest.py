@@ -0,0 +1,7 @@
+# tests/conftest.py
+"""Put the flat src/ modules on the import path, as running from src/ does"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
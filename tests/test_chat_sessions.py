@@ -0,0 +1,73 @@
+# tests/test_chat_sessions.py
+"""Session history trimming and rollback of failed turns"""
+
+from chat_sessions import SessionManager
+
+
+class ScriptedRouter:
+    """Router stand-in that answers or fails on demand"""
+
+    def __init__(self):
+        self.fail = False
+        self.calls = []
+
+    def chat(self, model, messages, options=None, keep_alive=None, prefer_backend=None, format=None):
+        self.calls.append(list(messages))
+        if self.fail:
+            return {"success": False, "error": "backend down"}
+        return {"success": True, "response": "x" * 400, "response_time": 0.01, "backend": "local"}
+
+
+def test_turns_are_recorded_and_pinned_to_backend():
+    router = ScriptedRouter()
+    manager = SessionManager(router=router)
+    session = manager.create_session("m")
+    manager.send_message(session, "first")
+    manager.send_message(session, "second")
+    assert [m["role"] for m in session.history] == ["user", "assistant", "user", "assistant"]
+    assert session.backend == "local"
+    assert router.calls[-1][0] is session.system_message
+
+
+def test_failed_turn_restores_trimmed_history():
+    router = ScriptedRouter()
+    manager = SessionManager(router=router, default_token_budget=300)
+    session = manager.create_session("m")
+    manager.send_message(session, "first")
+    manager.send_message(session, "second")
+    before = [dict(m) for m in session.history]
+    trims = session.trim_count
+
+    router.fail = True
+    result = manager.send_message(session, "third " * 100)
+    assert not result["success"]
+    assert session.history == before
+    assert session.trim_count == trims
+    assert len(session.turns) == 2
+
+
+def test_sessions_in_shared_state_survive_a_worker_switch(tmp_path):
+    from shared_state import SharedState
+
+    state = SharedState(str(tmp_path / "shared.db"))
+    router = ScriptedRouter()
+    worker_a = SessionManager(router=router, shared_state=state)
+    worker_b = SessionManager(router=router, shared_state=SharedState(str(tmp_path / "shared.db")))
+
+    session = worker_a.create_session("m", system_prompt="be brief")
+    worker_a.send_message(session, "first")
+
+    other = worker_b.get_session(session.session_id)
+    assert other.model == "m" and other.backend == "local"
+    assert [m["content"] for m in other.history][:1] == ["first"]
+    assert worker_b.send_message(other, "second")["success"]
+    assert other.turn_count() == 2
+
+    # worker A still holds the old copy: its turn is refused, then a fresh lookup catches up
+    stale = worker_a.send_message(session, "third")
+    assert stale["conflict"] and not stale["success"]
+    session = worker_a.get_session(session.session_id)
+    assert len(session.history) == 4
+
+    assert worker_b.delete_session(session.session_id)
+    assert worker_a.get_session(session.session_id) is None
@@ -0,0 +1,89 @@
+# tests/test_cost_meter.py
+"""Premium spend caps: reservations under concurrency, settling, routing"""
+
+import threading
+import time
+
+import pytest
+
+from inference_backends import BackendRouter, BudgetExceededError, CostMeter, InferenceBackend
+from shared_state import SharedState
+
+
+def make_meter(shared_state=None, daily=1.0, monthly=10.0) -> CostMeter:
+    return CostMeter({"daily_limit": daily, "monthly_limit": monthly, "current_spend": 0.0, "daily_spend": 0.0},
+                     shared_state)
+
+
+@pytest.fixture(params=["local", "shared"])
+def meter(request, tmp_path):
+    shared = SharedState(str(tmp_path / "shared.db")) if request.param == "shared" else None
+    return make_meter(shared)
+
+
+def test_reserve_refuses_over_the_cap(meter):
+    assert meter.reserve(0.6) is not None
+    assert meter.reserve(0.6) is None
+    assert meter.remaining()["daily"] == pytest.approx(0.4)
+
+
+def test_settle_replaces_the_reservation_with_the_actual_cost(meter):
+    reservation = meter.reserve(0.5)
+    meter.settle(reservation, 0.1)
+    assert meter.cost_tracking["daily_spend"] == pytest.approx(0.1)
+    meter.settle(meter.reserve(0.2), 0.0)
+    assert meter.remaining()["daily"] == pytest.approx(0.9)
+
+
+def test_concurrent_reservations_never_exceed_the_cap(meter):
+    granted = []
+    barrier = threading.Barrier(20)
+
+    def worker():
+        barrier.wait()
+        if meter.reserve(0.15) is not None:
+            granted.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(granted) == 6  # 6 x 0.15 <= 1.0 < 7 x 0.15
+
+
+class SlowPremiumBackend(InferenceBackend):
+    kind = "openai"
+
+    def __init__(self):
+        super().__init__("premium", premium=True, input_cost_per_1k=0.0, output_cost_per_1k=1.0,
+                         max_concurrency=100, models=["gpt"])
+
+    def _chat(self, model, messages, options, keep_alive, format=None):
+        time.sleep(0.3)  # every request reserves before any of them settles
+        return {"success": True, "response": "ok", "model": model, "eval_count": 100}
+
+
+def test_router_holds_the_cap_for_concurrent_premium_requests():
+    meter = make_meter(daily=1.0)
+    router = BackendRouter([SlowPremiumBackend()], meter)
+    outcomes = []
+    barrier = threading.Barrier(10)
+
+    def request():
+        barrier.wait()
+        try:
+            router.chat("gpt", [{"role": "user", "content": "hi"}], {"num_predict": 250})
+            outcomes.append("ok")
+        except BudgetExceededError:
+            outcomes.append("over budget")
+
+    # Each request may cost up to $0.25 but actually costs $0.10
+    threads = [threading.Thread(target=request) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count("ok") == 4
+    assert meter.cost_tracking["daily_spend"] == pytest.approx(0.4)
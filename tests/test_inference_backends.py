@@ -0,0 +1,56 @@
+# tests/test_inference_backends.py
+"""Backend probing: reachability comes from asking the host, not the optimistic routing flag"""
+
+from inference_backends import BackendRouter, CostMeter, InferenceBackend
+
+
+class ProbedBackend(InferenceBackend):
+    kind = "ollama"
+
+    def __init__(self, name, reachable=True):
+        super().__init__(name)
+        self.reachable = reachable
+        self.probes = 0
+
+    def _fetch_models(self):
+        self.probes += 1
+        if not self.reachable:
+            raise ConnectionError("connection refused")
+        return ["llama3.1:8b"]
+
+
+def make_router(*backends) -> BackendRouter:
+    return BackendRouter(list(backends), CostMeter({"daily_limit": 1.0, "monthly_limit": 1.0}))
+
+
+def test_unprobed_host_is_not_reported_online():
+    down = ProbedBackend("down", reachable=False)
+    assert down.healthy and down.last_probe is None
+
+    assert make_router(down).probe() == {"down": False}
+    assert down.last_probe["error"] == "connection refused"
+
+
+def test_probe_results_are_reused_within_max_age():
+    up = ProbedBackend("up")
+    router = make_router(up)
+    assert router.probe(max_age=60) == {"up": True}
+    assert router.probe(max_age=60) == {"up": True}
+    assert up.probes == 1
+    router.probe(max_age=0)
+    assert up.probes == 2
+
+
+def test_model_listing_records_the_probe():
+    down = ProbedBackend("down", reachable=False)
+    assert down.list_models() == []
+    assert down.last_probe["ok"] is False
+    assert make_router(down).probe(max_age=60) == {"down": False}
+    assert down.probes == 1
+
+
+def test_failed_probe_takes_the_host_out_of_rotation():
+    hung = ProbedBackend("hung", reachable=False)
+    assert make_router(hung).probe() == {"hung": False}
+    assert hung.healthy is False
+    assert hung.is_available() is False
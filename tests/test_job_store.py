@@ -0,0 +1,90 @@
+# tests/test_job_store.py
+"""Work queue claims, leases and attempts; checkpoints and the event log"""
+
+import time
+
+import pytest
+
+from job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def add_job(store: JobStore, job_id: str):
+    store.save_job({"job_id": job_id, "status": "pending", "progress": 0}, {"topic": job_id})
+    store.enqueue(job_id)
+
+
+def test_claim_takes_oldest_job_once(store):
+    add_job(store, "a")
+    add_job(store, "b")
+    assert store.claim("w1") == ("a", {"topic": "a"})
+    assert store.claim("w2") == ("b", {"topic": "b"})
+    assert store.claim("w3") is None
+
+
+def test_expired_lease_is_reclaimed(store):
+    add_job(store, "a")
+    assert store.claim("w1", lease_seconds=0.01)[0] == "a"
+    time.sleep(0.02)
+    assert store.claim("w2")[0] == "a"
+    assert not store.extend_lease("a", "w1")
+    assert store.extend_lease("a", "w2")
+
+
+def test_released_job_is_claimable_again(store):
+    add_job(store, "a")
+    store.claim("w1")
+    store.release("a", "w1")
+    assert store.claim("w2")[0] == "a"
+
+
+def test_tier_load_counts_waiting_and_running_jobs(store):
+    for job_id, complexity in (("a", "complex"), ("b", "complex"), ("c", None)):
+        store.save_job({"job_id": job_id, "status": "pending"}, {"topic": job_id, "complexity": complexity})
+        store.enqueue(job_id)
+    store.claim("w1")
+    assert store.tier_load() == {"complex": (1, 1), "standard": (1, 0)}
+
+
+def test_job_out_of_attempts_is_failed(store):
+    add_job(store, "a")
+    for _ in range(2):
+        assert store.claim("w", lease_seconds=0.0, max_attempts=2)[0] == "a"
+        time.sleep(0.01)
+
+    assert store.claim("w", max_attempts=2) is None
+    job = store.get_job("a")["record"]
+    assert job["status"] == "failed"
+    assert "2 attempts" in job["error"]
+    assert store.queue_stats() == {}
+    assert [event[2] for event in store.events_since(0)] == ["failed"]
+
+
+def test_cancelled_job_stays_cancelled_when_abandoned(store):
+    add_job(store, "a")
+    store.claim("w", lease_seconds=0.0, max_attempts=1)
+    store.save_job({"job_id": "a", "status": "cancelled", "progress": 0})
+    time.sleep(0.01)
+    store.claim("w", max_attempts=1)
+    assert store.get_job("a")["record"]["status"] == "cancelled"
+    assert store.events_since(0) == []
+
+
+def test_checkpoints_round_trip_and_clear(store):
+    add_job(store, "a")
+    store.save_checkpoint("a", "web_research", {"sources": []})
+    assert store.load_checkpoints("a") == {"web_research": {"sources": []}}
+    store.clear_checkpoints("a")
+    assert store.load_checkpoints("a") == {}
+
+
+def test_prune_events_drops_old_events(store):
+    store.append_event("a", "status", {"progress": 10})
+    time.sleep(0.02)
+    store.append_event("a", "status", {"progress": 20})
+    store.prune_events(older_than=0.01)
+    assert [event[3]["progress"] for event in store.events_since(0)] == [20]
@@ -0,0 +1,31 @@
+# tests/test_profiling.py
+"""Per-request profiling is opt-in with X-Profile: 1"""
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from profiling import ProfileStore, RequestProfilerMiddleware
+
+
+def make_client():
+    store = ProfileStore()
+    app = Starlette(routes=[Route("/", lambda request: PlainTextResponse("ok"))])
+    app.add_middleware(RequestProfilerMiddleware, store=store)
+    return TestClient(app), store
+
+
+def test_profile_header_must_be_one():
+    client, store = make_client()
+    for value in ("0", "false", ""):
+        response = client.get("/", headers={"X-Profile": value})
+        assert "x-profile-id" not in response.headers
+    assert store.list() == []
+
+
+def test_profiled_request_is_stored():
+    client, store = make_client()
+    response = client.get("/", headers={"X-Profile": "1"})
+    assert response.text == "ok"
+    assert store.get(response.headers["x-profile-id"]) is not None
@@ -0,0 +1,104 @@
+# tests/test_rate_limiting.py
+"""Token buckets, per-client limits, the shared SQLite bucket and tier admission"""
+
+import sqlite3
+import time
+
+import pytest
+
+from rate_limiting import ClientRateLimiter, RateLimitExceeded, TierAdmissionController, TokenBucket
+from shared_state import SharedState
+
+
+def test_token_bucket_burst_then_retry_after():
+    bucket = TokenBucket(rate=2.0, burst=3)
+    assert [bucket.try_acquire()[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = bucket.try_acquire()
+    assert not allowed
+    assert 0 < retry_after <= 0.5
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=100.0, burst=2)
+    bucket.try_acquire()
+    bucket.try_acquire()
+    time.sleep(0.05)
+    assert bucket.try_acquire()[0]
+    assert bucket.tokens <= 1.0
+
+
+def test_client_limiter_is_per_client():
+    limiter = ClientRateLimiter(requests_per_minute=60, burst=1)
+    limiter.check("a")
+    limiter.check("b")
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.check("a")
+    assert exc.value.retry_after >= 1
+    assert limiter.get_stats()["rejected"] == 1
+
+
+def test_shared_buckets_hold_across_instances(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = ClientRateLimiter(requests_per_minute=60, burst=2, shared_state=SharedState(path))
+    second = ClientRateLimiter(requests_per_minute=60, burst=2, shared_state=SharedState(path))
+    first.check("a")
+    second.check("a")
+    with pytest.raises(RateLimitExceeded):
+        first.check("a")
+
+
+def test_busy_shared_state_falls_back_to_local_bucket(tmp_path):
+    path = str(tmp_path / "state.db")
+    state = SharedState(path)
+    limiter = ClientRateLimiter(requests_per_minute=60, burst=1, shared_state=state)
+
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            state.take_token("client:a", 1.0, 1, timeout=0.01)
+        started = time.perf_counter()
+        limiter.check("a")
+        assert time.perf_counter() - started < 1.0
+        with pytest.raises(RateLimitExceeded):
+            limiter.check("a")
+    finally:
+        blocker.execute("ROLLBACK")
+    assert limiter.get_stats()["shared_busy_fallbacks"] == 2
+
+
+def test_prune_buckets_drops_idle_entries(tmp_path):
+    state = SharedState(str(tmp_path / "state.db"))
+    state.take_token("client:a", 1.0, 5)
+    state.prune_buckets(older_than=3600)
+    assert state._conn().execute("SELECT COUNT(*) FROM token_buckets").fetchone()[0] == 1
+    state.prune_buckets(older_than=-1)
+    assert state._conn().execute("SELECT COUNT(*) FROM token_buckets").fetchone()[0] == 0
+
+
+TIERS = {
+    "standard": {"max_in_flight": 4, "max_queue": 8, "max_response_time": 60},
+    "simple": {"max_in_flight": 1, "max_response_time": 10}
+}
+
+
+def test_tier_caps_are_split_across_workers():
+    controller = TierAdmissionController(TIERS, workers=3)
+    assert controller.tiers["standard"].max_in_flight == 1
+    assert controller.tiers["standard"].max_queue == 2
+    # Never below one slot per worker
+    assert controller.tiers["simple"].max_in_flight == 1
+
+
+def test_admission_counts_load_from_other_processes():
+    controller = TierAdmissionController(TIERS)
+    controller.admit("standard", include_service_time=False, load=(7, 4))
+    with pytest.raises(RateLimitExceeded):
+        controller.admit("standard", include_service_time=False, load=(8, 4))
+
+    # Queue wait predicted from the shared counts once a service time is known
+    controller.tiers["standard"].service_time = 100.0
+    with pytest.raises(RateLimitExceeded) as exc:
+        controller.admit("standard", include_service_time=False, load=(0, 4))
+    assert exc.value.retry_after == 100
+    controller.admit("standard", include_service_time=False, load=(0, 3))
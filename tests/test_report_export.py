@@ -0,0 +1,55 @@
+# tests/test_report_export.py
+"""Byte ranges, conditional requests and gzip for exported reports"""
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from report_export import ReportExporter, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes=0-1,5-9", None),
+    ("items=0-9", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=20-10", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+@pytest.fixture
+def client(tmp_path):
+    exporter = ReportExporter(str(tmp_path))
+    exporter.export("job", "Topic", {"report": "## Findings\n\n" + "Some *text*. " * 200, "model_used": "m"})
+    app = Starlette(routes=[Route("/{fmt}", lambda request: exporter.response(
+        "job", request.path_params["fmt"], request.headers))])
+    return TestClient(app)
+
+
+def test_range_request_returns_partial_content(client):
+    full = client.get("/md", headers={"Accept-Encoding": "identity"})
+    part = client.get("/md", headers={"Range": "bytes=2-6"})
+    assert part.status_code == 206
+    assert part.content == full.content[2:7]
+    assert part.headers["content-range"] == f"bytes 2-6/{len(full.content)}"
+    assert client.get("/md", headers={"Range": "bytes=999999-"}).status_code == 416
+
+
+def test_gzip_and_not_modified(client):
+    response = client.get("/html", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert b"<h2>Findings</h2>" in response.content
+    assert client.get("/html", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
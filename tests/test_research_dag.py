@@ -0,0 +1,118 @@
+# tests/test_research_dag.py
+"""Sub-question parsing, the DAG executor and critical path accounting"""
+
+import asyncio
+import json
+
+import pytest
+
+from research_dag import DagExecutor, critical_path, parse_subquestions
+
+
+def test_parse_subquestions_keeps_only_backward_dependencies():
+    text = json.dumps({"subquestions": [
+        {"question": "What is RAG?", "depends_on": []},
+        {"question": "How is retrieval evaluated?", "depends_on": [0, 2, 7]},
+        {"question": "Which metric is cheapest to compute?", "depends_on": [1]}
+    ]})
+    assert parse_subquestions(text, limit=4) == [
+        {"question": "What is RAG?", "depends_on": []},
+        {"question": "How is retrieval evaluated?", "depends_on": [0]},
+        {"question": "Which metric is cheapest to compute?", "depends_on": [1]}
+    ]
+
+
+def test_parse_subquestions_dedupes_and_limits():
+    text = json.dumps([
+        {"question": "What is RAG?", "depends_on": []},
+        {"question": "what is rag?", "depends_on": []},
+        {"question": "Why does it fail?", "depends_on": [1]},
+        {"question": "What should I read next?", "depends_on": []}
+    ])
+    questions = parse_subquestions(text, limit=2)
+    assert [q["question"] for q in questions] == ["What is RAG?", "Why does it fail?"]
+    # The dependency on the duplicate points at its first occurrence
+    assert questions[1]["depends_on"] == [0]
+
+
+def test_parse_subquestions_falls_back_to_question_lines():
+    text = "Plan:\n1. What is RAG?\n- How is it evaluated?\nThat is all."
+    assert [q["question"] for q in parse_subquestions(text, limit=4)] == ["What is RAG?", "How is it evaluated?"]
+
+
+def test_critical_path_follows_the_latest_finishing_inputs():
+    nodes = {
+        "plan": {"deps": [], "started": 0.0, "finished": 1.0},
+        "a": {"deps": ["plan"], "started": 1.0, "finished": 2.0},
+        "b": {"deps": ["plan"], "started": 1.0, "finished": 4.0},
+        "report": {"deps": ["a", "b"], "started": 4.0, "finished": 5.0}
+    }
+    path = critical_path(nodes)
+    assert path["nodes"] == ["plan", "b", "report"]
+    assert path["seconds"] == 5.0
+    assert path["work_seconds"] == 6.0
+    assert path["parallelism"] == 1.2
+
+
+def test_critical_path_of_empty_graph():
+    assert critical_path({})["nodes"] == []
+
+
+def sleeper(seconds, result=None, error=None):
+    async def handler(inputs):
+        await asyncio.sleep(seconds)
+        if error:
+            raise RuntimeError(error)
+        return result if result is not None else sorted(inputs)
+    return handler
+
+
+def test_independent_nodes_run_in_parallel():
+    dag = DagExecutor(concurrency=3)
+    dag.add("plan", sleeper(0.01))
+    for i in range(3):
+        dag.add(f"q{i}", sleeper(0.2, result=i), deps=["plan"])
+    dag.add("report", sleeper(0.01), deps=["q0", "q1", "q2"])
+
+    results = asyncio.run(dag.run())
+    assert results["report"] == ["q0", "q1", "q2"]
+    timing = dag.timing()
+    assert timing["critical_path"]["nodes"][0] == "plan"
+    assert timing["critical_path"]["wall_seconds"] < 0.45
+    assert timing["critical_path"]["parallelism"] > 1.5
+
+
+def test_failed_node_skips_dependents_transitively_unless_partial():
+    dag = DagExecutor()
+    dag.add("a", sleeper(0, error="boom"))
+    dag.add("b", sleeper(0), deps=["a"])
+    dag.add("c", sleeper(0), deps=["b"])
+    dag.add("ok", sleeper(0, result="fine"))
+    dag.add("sink", sleeper(0), deps=["c", "ok"], allow_partial=True)
+
+    results = asyncio.run(dag.run())
+    statuses = {node_id: node["status"] for node_id, node in dag.timing()["nodes"].items()}
+    assert statuses == {"a": "failed", "b": "skipped", "c": "skipped", "ok": "done", "sink": "done"}
+    assert results["sink"] == ["ok"]
+    assert dag.timing()["nodes"]["a"]["error"] == "boom"
+
+
+def test_running_node_can_add_nodes():
+    dag = DagExecutor()
+
+    async def plan(inputs):
+        for i in range(2):
+            dag.add(f"q{i}", sleeper(0, result=i), deps=["plan"])
+        return "planned"
+
+    dag.add("plan", plan)
+    assert asyncio.run(dag.run()) == {"plan": "planned", "q0": 0, "q1": 1}
+
+
+def test_add_rejects_unknown_and_duplicate_nodes():
+    dag = DagExecutor()
+    dag.add("a", sleeper(0))
+    with pytest.raises(ValueError):
+        dag.add("a", sleeper(0))
+    with pytest.raises(ValueError):
+        dag.add("b", sleeper(0), deps=["missing"])
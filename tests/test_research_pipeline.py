@@ -0,0 +1,49 @@
+# tests/test_research_pipeline.py
+"""Terminal job states and checkpoint cleanup"""
+
+import asyncio
+
+from job_store import JobStore
+from research_pipeline import ResearchPipeline
+
+
+class Conductor:
+    task_complexity = {"standard": {"job_timeout": 0.5}}
+
+
+def make_pipeline(tmp_path, run):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    updates = []
+    pipeline = ResearchPipeline(Conductor(), store, lambda job_id, **fields: updates.append(fields),
+                                lambda *args: None)
+
+    async def fake_run(job_id, request):
+        store.save_checkpoint(job_id, "web_research", {"sources": []})
+        return await run()
+
+    pipeline.run = fake_run
+    return pipeline, store, updates
+
+
+def test_completed_job_clears_checkpoints(tmp_path):
+    async def run():
+        return {"report": "done"}
+
+    pipeline, store, updates = make_pipeline(tmp_path, run)
+    asyncio.run(pipeline.execute("job", {"topic": "t"}))
+    assert updates[-1]["status"] == "completed"
+    assert store.load_checkpoints("job") == {}
+
+
+def test_failed_and_timed_out_jobs_clear_checkpoints(tmp_path):
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def hang():
+        await asyncio.sleep(5)
+
+    for run, status in ((fail, "failed"), (hang, "timed_out")):
+        pipeline, store, updates = make_pipeline(tmp_path, run)
+        asyncio.run(pipeline.execute(status, {"topic": "t"}))
+        assert updates[-1]["status"] == status
+        assert store.load_checkpoints(status) == {}
@@ -0,0 +1,90 @@
+# tests/test_retrieval.py
+"""BM25 index, tokenizer and reciprocal-rank fusion"""
+
+import threading
+from array import array
+
+import pytest
+
+from retrieval import BM25Index, chunk_text, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_compound_terms():
+    assert tokenize("The GPT-4 model and U.S. data") == ["gpt-4", "model", "u.s", "data"]
+
+
+def test_chunk_text_overlaps_and_covers_text():
+    text = " ".join(f"word{i}" for i in range(400))
+    chunks = chunk_text(text, chunk_size=200, overlap=50)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert chunks[0].startswith("word0") and chunks[-1].endswith("word399")
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 1, 4]])
+    assert [doc for doc, _ in fused][:2] in ([1, 2], [2, 1])
+    assert dict(fused)[1] == dict(fused)[2] > dict(fused)[3]
+
+
+def test_bm25_ranks_exact_term_matches():
+    index = BM25Index()
+    index.add(tokenize("milvus vector database for embeddings"))
+    index.add(tokenize("ollama runs llama models locally"))
+    index.add(tokenize("bm25 ranks documents by term frequency"))
+    results = index.search("ollama llama")
+    assert results[0][0] == 1
+    assert index.search("nothing matches this") == []
+
+
+def test_bm25_add_is_all_or_nothing(monkeypatch):
+    index = BM25Index()
+    index.add(["alpha", "beta"])
+
+    class FailingArray(array):
+        def append(self, value):
+            raise BufferError("cannot resize")
+
+    # The second term's posting list refuses to grow
+    index.postings[index.vocabulary["beta"]] = FailingArray("I", index.postings[index.vocabulary["beta"]])
+    with pytest.raises(BufferError):
+        index.add(["alpha", "beta", "gamma"])
+
+    assert index.doc_count == 1
+    assert "gamma" not in index.vocabulary
+    assert [len(p) for p in index.postings] == [len(f) for f in index.frequencies] == [1, 1]
+
+
+def test_bm25_concurrent_add_and_search():
+    index = BM25Index()
+    for i in range(200):
+        index.add(tokenize(f"document {i} about topic{i % 7} shared"))
+    errors = []
+    stop = threading.Event()
+
+    def writer():
+        try:
+            for i in range(3000):
+                index.add(tokenize(f"new document {i} topic{i % 7} shared"))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop.set()
+
+    def reader():
+        try:
+            while not stop.is_set():
+                for doc_id, _ in index.search("shared topic3 document", k=20):
+                    assert doc_id < index.doc_count
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert index.doc_count == 3200
+    assert all(len(p) == len(f) for p, f in zip(index.postings, index.frequencies))
@@ -0,0 +1,57 @@
+# tests/test_source_fetcher.py
+"""Body size limit and HTTP cache revalidation of the source fetcher"""
+
+import asyncio
+
+import httpx
+
+from source_fetcher import HTTPCache, SourceFetcher
+
+
+class ChunkedBody(httpx.AsyncByteStream):
+    """Response body that records how much of it was read"""
+
+    def __init__(self, chunks: int, size: int = 1000):
+        self.chunks = chunks
+        self.size = size
+        self.sent = 0
+
+    async def __aiter__(self):
+        for _ in range(self.chunks):
+            self.sent += 1
+            yield b"a" * self.size
+
+
+def make_fetcher(tmp_path, handler, max_bytes=5000) -> SourceFetcher:
+    fetcher = SourceFetcher(HTTPCache(str(tmp_path / "cache"), fresh_seconds=0), max_bytes=max_bytes,
+                            respect_robots=False)
+    fetcher._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return fetcher
+
+
+def test_body_reading_stops_at_max_bytes(tmp_path):
+    body = ChunkedBody(chunks=100)
+    fetcher = make_fetcher(tmp_path, lambda request: httpx.Response(
+        200, headers={"content-type": "text/plain"}, stream=body))
+
+    result = asyncio.run(fetcher.fetch("http://example.test/big"))
+    assert result["status"] == 200
+    assert len(result["text"]) == 5000
+    assert body.sent <= 6
+    assert fetcher.get_stats()["truncated"] == 1
+
+
+def test_not_modified_reuses_cached_body(tmp_path):
+    def handler(request):
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"content-type": "text/plain", "etag": '"v1"'}, content=b"hello")
+
+    fetcher = make_fetcher(tmp_path, handler)
+
+    async def fetch_twice():
+        return await fetcher.fetch("http://example.test/page"), await fetcher.fetch("http://example.test/page")
+
+    first, second = asyncio.run(fetch_twice())
+    assert (first["cache"], second["cache"]) == ("miss", "revalidated")
+    assert second["text"] == "hello"